@@ -0,0 +1,213 @@
+"""
+🚦 admission.py
+Control de admisión para el trabajo pesado de la API (chat y recargas).
+
+Cada petición de /api/chat puede ocupar una consulta Prolog y varias
+llamadas HTTP bloqueantes; sin límite, una ráfaga hace que todas se
+vuelvan lentas a la vez hasta que empiezan los timeouts. El controlador:
+
+- Deja correr como mucho `limit` peticiones a la vez, con un límite
+  propio por endpoint (p. ej. una sola recarga del catálogo, dos
+  cohortes de /cohort/recommendations).
+- Las demás esperan en una cola acotada ordenada por prioridad: saludos y
+  ayuda primero, después recomendaciones y al final las recargas de
+  administración. Dentro de la misma prioridad, por orden de llegada.
+- Si la cola está llena, la petición nueva desplaza a la de menor
+  prioridad que espera (o se rechaza si no hay ninguna peor). Quien espera
+  más de `queue_timeout` también se rechaza.
+
+Rechazar es rápido: el endpoint atrapa `Overloaded` y responde una versión
+degradada (recomendaciones en cache o un texto genérico) en vez de encolar
+para siempre.
+
+El controlador vive en el event loop de cada worker (no usa locks); el
+trabajo bloqueante se hace fuera del loop con asyncio.to_thread mientras
+se tiene el turno.
+
+Configuración: ADMISSION_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from metrics import ADMISSION_SHED, ADMISSION_WAIT_SECONDS
+
+ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", "16"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+
+# Prioridades (menor = se atiende antes)
+PRIORITY_CHEAP = 0
+PRIORITY_RECOMMENDATION = 1
+PRIORITY_ADMIN = 2
+
+# Límites por endpoint dentro del total
+ENDPOINT_LIMITS = {"reload": 1, "cohort": 2}
+
+# Motivos de rechazo
+SHED_QUEUE_FULL = "queue_full"
+SHED_EVICTED = "evicted"
+SHED_TIMEOUT = "timeout"
+
+
+class Overloaded(RuntimeError):
+    """La petición no fue admitida (cola llena, desplazada o espera vencida)"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Servidor saturado ({reason})")
+        self.reason = reason
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    endpoint: str = field(compare=False)
+    future: "asyncio.Future[bool]" = field(compare=False)
+
+
+class AdmissionController:
+    """
+    Semáforo con prioridades, límites por endpoint y cola acotada.
+
+    Args:
+        limit: Peticiones en curso como máximo (todos los endpoints)
+        queue_size: Peticiones esperando como máximo
+        queue_timeout: Segundos que puede esperar una petición en la cola
+        endpoint_limits: Máximo en curso por endpoint (sin entrada = `limit`)
+    """
+
+    def __init__(
+        self,
+        limit: int = ADMISSION_LIMIT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.endpoint_limits = dict(ENDPOINT_LIMITS if endpoint_limits is None else endpoint_limits)
+        self.active = 0
+        self._active_by: Counter = Counter()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+
+    def _can_run(self, endpoint: str) -> bool:
+        return (self.active < self.limit
+                and self._active_by[endpoint] < self.endpoint_limits.get(endpoint, self.limit))
+
+    def _grant(self, endpoint: str):
+        self.active += 1
+        self._active_by[endpoint] += 1
+        self.admitted[endpoint] += 1
+
+    def _release(self, endpoint: str):
+        self.active -= 1
+        self._active_by[endpoint] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Da el turno a los que esperan, de mayor a menor prioridad"""
+        for waiter in sorted(self._waiters):
+            if self.active >= self.limit:
+                break
+            if waiter.future.done() or not self._can_run(waiter.endpoint):
+                continue
+            self._waiters.remove(waiter)
+            self._grant(waiter.endpoint)
+            waiter.future.set_result(True)
+
+    def _reject(self, endpoint: str, reason: str) -> Overloaded:
+        self.shed[(endpoint, reason)] += 1
+        ADMISSION_SHED.labels(endpoint=endpoint, reason=reason).inc()
+        return Overloaded(reason)
+
+    async def _acquire(self, endpoint: str, priority: int, timeout: float):
+        # Tras cada liberación ningún waiter queda con turno disponible, así
+        # que si hay lugar para este endpoint nadie de él está esperando
+        if self._can_run(endpoint):
+            self._grant(endpoint)
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            worst = max(self._waiters, default=None)
+            if worst is None or worst.priority <= priority:
+                raise self._reject(endpoint, SHED_QUEUE_FULL)
+            self._waiters.remove(worst)
+            worst.future.set_exception(self._reject(worst.endpoint, SHED_EVICTED))
+
+        waiter = _Waiter(priority, next(self._seq), endpoint, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                raise self._reject(endpoint, SHED_TIMEOUT)
+        except asyncio.CancelledError:
+            # El cliente se fue mientras esperaba
+            if not self._abandon(waiter):
+                self._release(endpoint)
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Saca al waiter de la cola. Devuelve False si ya tenía el turno (el
+        despacho y el vencimiento pueden coincidir en la misma vuelta del loop).
+        """
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            return True
+        future = waiter.future
+        if future.done() and not future.cancelled() and future.exception() is None:
+            return False
+        return True
+
+    @asynccontextmanager
+    async def admit(self, endpoint: str, priority: int, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Espera el turno del endpoint y lo libera al salir.
+
+        Raises:
+            Overloaded: Si la petición se descarta en vez de esperar
+        """
+        await self._acquire(endpoint, priority, self.queue_timeout if timeout is None else timeout)
+        try:
+            yield
+        finally:
+            self._release(endpoint)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "active_by_endpoint": {name: count for name, count in self._active_by.items() if count},
+            "queued": len(self._waiters),
+            "admitted": dict(self.admitted),
+            "shed": {f"{endpoint}:{reason}": count for (endpoint, reason), count in self.shed.items()},
+        }
+
+
+# Instancia global (se crea bajo demanda)
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Obtiene o crea el controlador compartido por el chat y las recargas"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
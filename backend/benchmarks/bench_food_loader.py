@@ -0,0 +1,79 @@
+"""
+Benchmark de la etapa de categorización de food_loader.py.
+
+Mide el throughput (comidas/s) de FoodLoader.process_foods según el
+número de procesos, con comidas sintéticas en el formato de search_food
+generadas a partir del catálogo real. Con --write también incluye la
+escritura del catálogo (CatalogWriter) en un directorio temporal.
+
+Uso:
+    poetry run python benchmarks/bench_food_loader.py
+    poetry run python benchmarks/bench_food_loader.py --foods 500000 --workers 1 2 4 8
+    poetry run python benchmarks/bench_food_loader.py --write
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterator
+
+from catalog import CatalogWriter, load_catalog_foods
+from prolog.food_loader import PROCESS_CHUNK_SIZE, FoodLoader
+
+
+def synthetic_foods(n_foods: int) -> Iterator[Dict[str, Any]]:
+    """Genera n_foods comidas en el formato de search_food (sin guardarlas en memoria)"""
+    base = load_catalog_foods()
+    for i in range(n_foods):
+        food = base[i % len(base)]
+        yield {
+            "nombre": f"{food['display_name']} {i}",
+            "fdcId": i + 1,
+            "nutrientes": food["nutrients"],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de la categorización de comidas")
+    parser.add_argument("--foods", type=int, default=100000, help="Comidas a procesar")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help="Número de procesos a probar")
+    parser.add_argument("--chunk-size", type=int, default=PROCESS_CHUNK_SIZE)
+    parser.add_argument("--write", action="store_true", help="Incluir la escritura del catálogo")
+    args = parser.parse_args()
+
+    if not load_catalog_foods():
+        print("❌ No hay catálogo. Ejecuta primero prolog/food_loader.py")
+        return
+
+    loader = FoodLoader()
+    print(f"🍽️  {args.foods} comidas, bloques de {args.chunk_size} ({os.cpu_count()} CPUs)")
+
+    baseline = None
+    for workers in args.workers:
+        foods = loader.process_foods(synthetic_foods(args.foods), workers=workers, chunk_size=args.chunk_size)
+        start = time.perf_counter()
+        if args.write:
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp = Path(tmp)
+                with CatalogWriter(tmp / "comidas.pl", tmp / "cache.jsonl", tmp / "manifest.json") as writer:
+                    writer.add_all(foods)
+                count = writer.total
+        else:
+            count = sum(1 for _ in foods)
+        elapsed = time.perf_counter() - start
+
+        throughput = count / elapsed
+        baseline = baseline or throughput
+        print(f"⚙️  workers={workers:<3d} {throughput:>10,.0f} comidas/s  "
+              f"({elapsed:.2f}s, x{throughput / baseline:.2f})")
+
+
+if __name__ == "__main__":
+    main()
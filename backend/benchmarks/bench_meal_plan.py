@@ -0,0 +1,125 @@
+"""
+Benchmark del optimizador de planes de comida (meal_plan.py).
+
+Genera un catálogo sintético (mismas categorías/estados/tiempos que el
+loader, con calorías y macronutrientes), mide la latencia de
+MealPlanner.plan() para metas variadas y la compara con el SLO. Con
+--check compara cada plan calculado con tolerance=0 con la búsqueda
+exhaustiva sobre los mismos grupos de candidatos (debe dar el mismo error).
+
+Uso:
+    poetry run python benchmarks/bench_meal_plan.py
+    poetry run python benchmarks/bench_meal_plan.py --foods 10000 --plans 200 --check
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import itertools
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from catalog import NUTRIENT_KEYS
+from meal_plan import OBJECTIVE_WEIGHTS, MealPlanner, MealTarget, allowed_prep_times
+
+SLO_MS = 50.0
+
+
+def synthetic_foods(n_foods: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Comidas con macronutrientes coherentes con sus calorías"""
+    rng = random.Random(seed)
+    foods = []
+    for i in range(n_foods):
+        protein, carbs, fat = rng.uniform(0, 40), rng.uniform(0, 90), rng.uniform(0, 35)
+        calories = round(4 * protein + 4 * carbs + 9 * fat)
+        foods.append({
+            "prolog_name": f"food_{i}",
+            "display_name": f"Food {i}",
+            "fdc_id": i + 1,
+            "climate": rng.choice(["cold", "hot", "warm"]),
+            "state": rng.choice(["normal", "low_oxygen"]),
+            "prep_time": rng.choice(["quick", "medium", "long"]),
+            "category": rng.choice(["breakfast", "lunch", "dinner", "snack"]),
+            "calories": calories,
+            "nutrients": {
+                NUTRIENT_KEYS["protein"]: f"{protein:.1f} G",
+                NUTRIENT_KEYS["carbs"]: f"{carbs:.1f} G",
+                NUTRIENT_KEYS["fat"]: f"{fat:.1f} G",
+            },
+        })
+    return foods
+
+
+def exhaustive_error(planner: MealPlanner, target: MealTarget, state: str, prep_time: int) -> float:
+    """Mejor error probando todas las combinaciones de los grupos de candidatos"""
+    goal = target.vector()
+    pools = [planner._pool(slot, [state], allowed_prep_times(prep_time), goal)
+             for slot in ("breakfast", "lunch", "dinner", "snack")]
+    weights = [w / t ** 2 for w, t in zip(OBJECTIVE_WEIGHTS, goal)]
+    best = float("inf")
+    for combo in itertools.product(*[pool for pool in pools if pool]):
+        totals = [sum(vector[j] for vector, _ in combo) for j in range(4)]
+        best = min(best, sum(w * (x - t) ** 2 for w, x, t in zip(weights, totals, goal)))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia del optimizador de planes de comida")
+    parser.add_argument("--foods", type=int, default=10000, help="Tamaño del catálogo sintético")
+    parser.add_argument("--plans", type=int, default=100, help="Planes a calcular")
+    parser.add_argument("--pool-size", type=int, default=None, help="Comidas por tiempo de comida")
+    parser.add_argument("--check", action="store_true", help="Comparar con búsqueda exhaustiva (lento)")
+    args = parser.parse_args()
+
+    foods = synthetic_foods(args.foods)
+    planner = MealPlanner(catalog_loader=lambda: foods, version_fn=lambda: "bench")
+    if args.pool_size:
+        planner.pool_size = args.pool_size
+
+    start = time.perf_counter()
+    planner._ensure_fresh()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(7)
+    requests = [
+        (MealTarget.from_calories(rng.choice([1500, 1800, 2000, 2500, 3000])),
+         rng.choice(["normal", "low_oxygen"]),
+         rng.choice([15, 30, 45, 90]))
+        for _ in range(args.plans)
+    ]
+
+    timings, evaluated, errors, mismatches = [], [], [], 0
+    for target, state, prep_time in requests:
+        start = time.perf_counter()
+        plan = planner.plan(target, state, prep_time)
+        timings.append((time.perf_counter() - start) * 1000)
+        evaluated.append(plan.evaluated)
+        errors.append(plan.error)
+        if args.check:
+            exact = planner.plan(target, state, prep_time, tolerance=0.0)
+            if abs(exhaustive_error(planner, target, state, prep_time) - exact.error) > 1e-9:
+                mismatches += 1
+
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    pairs = planner.pool_size ** 2
+
+    print(f"{'='*60}")
+    print(f"🗓️  Planes de comida: {args.foods} comidas, {args.plans} planes, grupos de {planner.pool_size}")
+    print(f"{'='*60}")
+    print(f"  Columnas por grupo:   {build_ms:8.2f} ms (una vez por versión del catálogo)")
+    print(f"  plan() mediana:       {statistics.median(timings):8.2f} ms")
+    print(f"  plan() p95:           {p95:8.2f} ms   SLO {SLO_MS:.0f} ms {'✅' if p95 <= SLO_MS else '❌'}")
+    print(f"  error mediano:        {statistics.median(errors):8.5f}")
+    print(f"  combinaciones evaluadas: mediana {statistics.median(evaluated):,.0f} "
+          f"de {pairs * pairs:,} posibles")
+    if args.check:
+        print(f"  planes distintos al exhaustivo: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
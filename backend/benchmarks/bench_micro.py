@@ -0,0 +1,198 @@
+"""
+Micro-benchmarks de las piezas que participan en cada turno de chat.
+
+Casos:
+- prolog.consult / prolog.food_recommendation: PrologEngine (necesita SWI-Prolog)
+- categorizer.process_food: FoodCategorizer sobre comidas del catálogo
+- intent.fallback: clasificador de intenciones por palabras clave
+- serialization.chat_turn / serialization.spliced_turn: respuesta de /api/chat
+
+Los casos cuyas dependencias no están instaladas se omiten. Los resultados
+se comparan con la sección "micro" de benchmarks/baseline.json (ver
+report.py); con --save-baseline se guardan como nueva línea base. Sale con
+código 1 si hay regresiones.
+
+Uso:
+    poetry run python benchmarks/bench_micro.py
+    poetry run python benchmarks/bench_micro.py --only serialization intent --repeat 50
+    poetry run python benchmarks/bench_micro.py --save-baseline
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from report import DEFAULT_BASELINE, DEFAULT_TOLERANCE, compare, percentile, rss_mb, save_baseline
+
+# (nombre, función que prepara el caso y devuelve (fn, llamadas por muestra))
+Case = Tuple[str, Callable[[], Tuple[Callable[[], Any], int]]]
+
+CHAT_MESSAGES = [
+    "¿Qué debería comer hoy?",
+    "Hola, buenos días",
+    "Recomiéndame algo para la cena",
+    "ayuda",
+    "no sé qué hacer con mi vida",
+]
+
+
+def setup_prolog_consult():
+    from prolog.prolog_engine import PrologEngine
+
+    engine = PrologEngine()
+    return engine.consult, 1
+
+
+def setup_prolog_recommendation():
+    from prolog.prolog_engine import PrologEngine
+
+    engine = PrologEngine()
+    engine.consult()
+    contexts = [(w, s, t) for w in ("cold", "hot", "warm") for s in ("normal", "low_oxygen") for t in (15, 30, 60)]
+    state = {"i": 0}
+
+    def run():
+        weather, oxygen, prep_time = contexts[state["i"] % len(contexts)]
+        state["i"] += 1
+        engine.food_recommendation(weather, oxygen, prep_time)
+
+    return run, 10
+
+
+def setup_categorizer():
+    from catalog import load_catalog_foods
+    from prolog.food_loader import FoodCategorizer, process_food
+
+    categorizer = FoodCategorizer()
+    foods = [
+        {"nombre": food["display_name"], "fdcId": food["fdc_id"], "nutrientes": food["nutrients"]}
+        for food in load_catalog_foods()
+    ]
+
+    def run():
+        for food in foods:
+            process_food(food, categorizer)
+
+    return run, 1
+
+
+def setup_intent():
+    from dialogflow_integration import _fallback_intent_detection_static
+
+    def run():
+        for message in CHAT_MESSAGES:
+            _fallback_intent_detection_static(message)
+
+    return run, 200
+
+
+def sample_chat_turn() -> Dict[str, Any]:
+    """Respuesta de /api/chat con 3 recomendaciones del catálogo"""
+    from catalog import load_catalog_foods
+
+    recommendations = [
+        {
+            "comida": food["prolog_name"],
+            "display_name": food["prolog_name"].replace("_", " ").title(),
+            "info": {"nombre": food["display_name"], "fdcId": food["fdc_id"], "nutrientes": food["nutrients"]},
+        }
+        for food in load_catalog_foods()[:3]
+    ]
+    return {
+        "agent_response": f"Te recomiendo **{recommendations[0]['display_name']}**.",
+        "intent": "recommendation.food",
+        "recommendations": recommendations,
+    }
+
+
+def setup_serialization():
+    from serialization import dumps
+
+    content = sample_chat_turn()
+    return lambda: dumps(content), 1000
+
+
+def setup_spliced_serialization():
+    from serialization import RawJSON, dumps_spliced
+
+    content = sample_chat_turn()
+    content["recommendations"] = [RawJSON.of(record) for record in content["recommendations"]]
+    return lambda: dumps_spliced(content), 1000
+
+
+CASES: List[Case] = [
+    ("prolog.consult", setup_prolog_consult),
+    ("prolog.food_recommendation", setup_prolog_recommendation),
+    ("categorizer.process_food", setup_categorizer),
+    ("intent.fallback", setup_intent),
+    ("serialization.chat_turn", setup_serialization),
+    ("serialization.spliced_turn", setup_spliced_serialization),
+]
+
+
+def measure(fn: Callable[[], Any], number: int, repeat: int) -> Dict[str, float]:
+    """Tiempo por llamada (µs): `repeat` muestras de `number` llamadas cada una"""
+    fn()  # calentamiento
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "median_us": round(median, 2),
+        "p95_us": round(percentile(samples, 95), 2),
+        "ops_per_s": round(1e6 / median, 1) if median else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del backend")
+    parser.add_argument("--repeat", type=int, default=30, help="Muestras por caso")
+    parser.add_argument("--only", nargs="*", default=None, help="Prefijos de los casos a ejecutar")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Archivo de línea base")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Empeoramiento tolerado")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como línea base")
+    args = parser.parse_args()
+
+    print(f"{'='*72}")
+    print("🔬 Micro-benchmarks (tiempo por llamada)")
+    print(f"{'='*72}")
+    print(f"  {'caso':32s} {'mediana':>12s} {'p95':>12s} {'ops/s':>12s}")
+
+    results: Dict[str, Any] = {}
+    for name, setup in CASES:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        try:
+            fn, number = setup()
+        except ImportError as e:
+            print(f"  {name:32s} omitido ({e})")
+            continue
+        stats = measure(fn, number, args.repeat)
+        results[name] = stats
+        print(f"  {name:32s} {stats['median_us']:10.2f}µs {stats['p95_us']:10.2f}µs {stats['ops_per_s']:12,.1f}")
+
+    memory = rss_mb()
+    if memory:
+        print(f"\n  RSS del proceso: {memory['rss_mb']:.1f} MB (pico {memory['peak_rss_mb']:.1f} MB)")
+
+    if args.save_baseline:
+        save_baseline("micro", results, args.baseline)
+        print(f"\n💾 Línea base guardada en {args.baseline}")
+        return
+
+    regressions = compare("micro", results, args.baseline, args.tolerance)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark de latencia de las reglas de comidas_rules.pl según el tamaño del catálogo.
+
+Genera catálogos sintéticos con CatalogWriter (mismo formato que
+food_loader.py), los consulta en SWI-Prolog y mide cada regla con los
+hechos índice (comida_by_ctx/4, comida_by_calories/3) y sin ellos
+(recorriendo comida/7, como con un comidas_dynamic.pl antiguo).
+
+Necesita SWI-Prolog y pyswip instalados.
+
+Uso:
+    poetry run python benchmarks/bench_prolog_rules.py
+    poetry run python benchmarks/bench_prolog_rules.py --sizes 1000 10000 100000 --repeat 20
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List
+
+from pyswip import Prolog
+
+from catalog import RULES_FILE, CatalogWriter
+
+QUERIES = {
+    "recomendar/4 (rápida)": "recomendar(cold, low_oxygen, 30, F)",
+    "recomendar/4 (extendida)": "recomendar(hot, normal, 60, F)",
+    "recomendar_by_calories/3": "recomendar_by_calories(200, 300, F)",
+    "recomendar_healthy/3": "recomendar_healthy(warm, normal, F)",
+    "highest_calorie_food/2": "highest_calorie_food(F, C)",
+}
+
+
+def synthetic_foods(n_foods: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """Comidas sintéticas con la misma distribución de atributos que el loader"""
+    rng = random.Random(seed)
+    for i in range(n_foods):
+        yield {
+            "prolog_name": f"food_{i}",
+            "display_name": f"Food {i}",
+            "fdc_id": i + 1,
+            "climate": rng.choice(["cold", "hot", "warm"]),
+            "state": rng.choice(["normal", "low_oxygen"]),
+            "prep_time": rng.choice(["quick", "medium", "long"]),
+            "category": rng.choice(["breakfast", "lunch", "dinner", "snack"]),
+            "calories": rng.randint(20, 1600),
+            "nutrients": {},
+        }
+
+
+def time_query(prolog: Prolog, query: str, repeat: int) -> List[float]:
+    """Tiempo (ms) de obtener todas las soluciones de una consulta"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(prolog.query(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de reglas Prolog por tamaño del catálogo")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por consulta")
+    args = parser.parse_args()
+
+    prolog = Prolog()
+    prolog.consult(str(RULES_FILE))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        facts_file = tmp / "comidas_dynamic.pl"
+
+        for size in args.sizes:
+            with CatalogWriter(facts_file, tmp / "cache.jsonl", tmp / "manifest.json") as writer:
+                writer.add_all(synthetic_foods(size))
+            prolog.consult(str(facts_file))
+            print(f"\n📚 {size} comidas")
+
+            for mode in ("índice", "scan"):
+                if mode == "scan":
+                    # Sin comida_index_version/1 las reglas recorren comida/7
+                    list(prolog.query("retractall(comida_index_version(_))"))
+                for label, query in QUERIES.items():
+                    timings = time_query(prolog, query, args.repeat)
+                    print(f"  {mode:6s} {label:28s} mediana={statistics.median(timings):9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark del recomendador (recommender.py) aislado de la API.
+
+Mide la latencia por llamada a Recommender.recommend y la memoria que
+asigna cada llamada (tracemalloc), con los candidatos ya precalculados.
+
+Por defecto los candidatos salen de un filtro en Python equivalente a
+recomendar/4 sobre el cache de comidas (no necesita SWI-Prolog); con
+--prolog se usa la regla real.
+
+Uso:
+    poetry run python benchmarks/bench_recommender.py
+    poetry run python benchmarks/bench_recommender.py --foods 10000 --calls 20000
+    poetry run python benchmarks/bench_recommender.py --prolog
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import dataclasses
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from catalog import load_catalog_foods
+from history import HISTORY_WINDOW
+from recommender import QUICK_TIME_LIMIT, Recommender
+
+
+def scaled_catalog(n_foods: int) -> List[Dict[str, Any]]:
+    """Replica el catálogo real hasta tener n_foods comidas distintas"""
+    base = load_catalog_foods()
+    foods = []
+    for i in range(n_foods):
+        food = dict(base[i % len(base)])
+        food["prolog_name"] = f"{food['prolog_name']}_{i}"
+        foods.append(food)
+    return foods
+
+
+def python_candidate_source(foods: List[Dict[str, Any]]):
+    """Equivalente en Python de recomendar/4 (para no depender de Prolog)"""
+    def source(weather: str, state: str, prep_time: int) -> List[str]:
+        quick = prep_time <= QUICK_TIME_LIMIT
+        return [
+            f["prolog_name"] for f in foods
+            if f["climate"] == weather and f["state"] == state
+            and ((f["prep_time"] == "quick") == quick)
+        ]
+    return source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del recomendador")
+    parser.add_argument("--foods", type=int, default=0, help="Tamaño del catálogo sintético (0 = catálogo real)")
+    parser.add_argument("--calls", type=int, default=10000, help="Llamadas a recommend()")
+    parser.add_argument("--prolog", action="store_true", help="Usar recomendar/4 real (requiere pyswip)")
+    args = parser.parse_args()
+
+    foods = scaled_catalog(args.foods) if args.foods else load_catalog_foods()
+    source = None if args.prolog else python_candidate_source(foods)
+    recommender = Recommender(candidate_source=source, catalog_loader=lambda: foods)
+
+    # Contextos de ejemplo: clima/estado/tiempo variados
+    rng = random.Random(42)
+    samples = [
+        ({"oxygen_level": rng.choice([90, 97]), "temperature": rng.choice([10, 28])},
+         rng.choice([20, 60]))
+        for _ in range(64)
+    ]
+    user_context = recommender.user_context(excluded=[foods[0]["prolog_name"]], favorites=[foods[1]["prolog_name"]])
+    # Ventana de historial llena (HISTORY_WINDOW comidas servidas hace poco)
+    history_context = dataclasses.replace(
+        user_context, recent=tuple(food["prolog_name"] for food in foods[:HISTORY_WINDOW]),
+    )
+
+    # Construcción de candidatos (una vez por contexto)
+    start = time.perf_counter()
+    recommender.warm_up()
+    warm_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{'='*60}")
+    print(f"🍽️  Recomendador: {len(foods)} comidas, {args.calls} llamadas")
+    print(f"{'='*60}")
+    print(f"  Precalculo de contextos:   {warm_ms:8.2f} ms  {recommender.stats()['contexts']}")
+
+    for label, ctx in [
+        ("sin contexto de usuario", None),
+        ("con exclusiones/favoritas", user_context),
+        ("con historial reciente", history_context),
+    ]:
+        start = time.perf_counter()
+        for i in range(args.calls):
+            data, prep_time = samples[i % len(samples)]
+            recommender.recommend(data, prep_time, ctx, k=3)
+        per_call_us = (time.perf_counter() - start) / args.calls * 1e6
+
+        tracemalloc.start()
+        snapshot_before = tracemalloc.take_snapshot()
+        for i in range(1000):
+            data, prep_time = samples[i % len(samples)]
+            recommender.recommend(data, prep_time, ctx, k=3)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot_after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in snapshot_after.compare_to(snapshot_before, "filename") if stat.size_diff > 0)
+
+        print(f"  recommend() {label:<26} {per_call_us:8.2f} µs/llamada   pico {peak / 1024:7.1f} KiB   retenido {allocated / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
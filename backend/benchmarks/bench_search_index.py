@@ -0,0 +1,91 @@
+"""
+Benchmark del índice de búsqueda local (search_index.py).
+
+Mide el tiempo de construcción del índice, la latencia de búsqueda
+(exacta, por prefijo y con errores de tipeo) y la actualización
+incremental cuando cambia una parte del catálogo.
+
+Uso:
+    poetry run python benchmarks/bench_search_index.py
+    poetry run python benchmarks/bench_search_index.py --foods 100000 --queries 5000
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from catalog import load_catalog_foods
+from search_index import FoodSearchIndex
+
+QUERIES = {
+    "exacta": ["scrambled eggs", "salmon", "chicken salad", "oatmeal"],
+    "prefijo": ["chick", "oat", "salm", "egg"],
+    "tipeo": ["oatmel", "salomn", "chiken salad", "scrambeld eggs"],
+}
+
+
+def scaled_catalog(n_foods: int) -> List[Dict[str, Any]]:
+    """Replica el catálogo real hasta tener n_foods comidas con fdc_id distinto"""
+    base = load_catalog_foods()
+    foods = []
+    for i in range(n_foods):
+        food = dict(base[i % len(base)])
+        food["fdc_id"] = i + 1
+        food["prolog_name"] = f"{food['prolog_name']}_{i}"
+        foods.append(food)
+    return foods
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de búsqueda local")
+    parser.add_argument("--foods", type=int, default=0, help="Tamaño del catálogo (0 = catálogo real)")
+    parser.add_argument("--queries", type=int, default=2000, help="Consultas por tipo")
+    args = parser.parse_args()
+
+    foods = scaled_catalog(args.foods) if args.foods else load_catalog_foods()
+    if not foods:
+        print("❌ No hay catálogo. Ejecuta primero prolog/food_loader.py")
+        return
+
+    index = FoodSearchIndex()
+    start = time.perf_counter()
+    index.update(foods)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"📦 Índice: {index.stats()} en {build_ms:.1f} ms")
+
+    rng = random.Random(42)
+    for kind, queries in QUERIES.items():
+        timings = []
+        for _ in range(args.queries):
+            query = rng.choice(queries)
+            start = time.perf_counter()
+            index.search(query, limit=10)
+            timings.append((time.perf_counter() - start) * 1e6)
+        print(
+            f"🔍 {kind:8s} p50={statistics.median(timings):8.1f} µs  "
+            f"p95={percentile(timings, 0.95):8.1f} µs  p99={percentile(timings, 0.99):8.1f} µs"
+        )
+
+    # Actualización incremental: cambia el 1% del catálogo
+    changed = [dict(food) for food in foods]
+    for food in rng.sample(changed, max(1, len(changed) // 100)):
+        food["display_name"] = f"{food.get('display_name', '')} LIGHT"
+    start = time.perf_counter()
+    result = index.update(changed)
+    update_ms = (time.perf_counter() - start) * 1000
+    print(f"♻️  Actualización incremental: {result} en {update_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark del costo de serialización por turno de chat.
+
+Compara:
+1. FastAPI por defecto: jsonable_encoder(ChatResponse) + json.dumps
+2. FastJSONResponse: orjson (o json compacto) sobre el dict
+3. SplicedJSONResponse: registros de recomendación ya serializados (RawJSON)
+
+Uso:
+    poetry run python benchmarks/bench_serialization.py
+    poetry run python benchmarks/bench_serialization.py --turns 20000
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from catalog import load_catalog_foods
+from main import ChatResponse
+from serialization import RawJSON, dumps, dumps_spliced, orjson
+
+
+def build_sample_turn():
+    """Construye un turno de chat con 3 recomendaciones reales del cache"""
+    foods = load_catalog_foods()[:3]
+
+    recommendations = [
+        {
+            "comida": food["prolog_name"],
+            "display_name": food["prolog_name"].replace("_", " ").title(),
+            "info": {
+                "nombre": food["display_name"],
+                "fdcId": food["fdc_id"],
+                "nutrientes": food["nutrients"],
+            },
+        }
+        for food in foods
+    ]
+    agent_response = (
+        "Basado en tu estado (low oxygen) y el clima (cold), te recomiendo "
+        f"**{recommendations[0]['display_name']}**."
+    )
+    return agent_response, recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización por turno de chat")
+    parser.add_argument("--turns", type=int, default=5000, help="Turnos por medición")
+    args = parser.parse_args()
+
+    agent_response, recommendations = build_sample_turn()
+    raw_records = [RawJSON.of(rec) for rec in recommendations]
+
+    def baseline():
+        model = ChatResponse(
+            agent_response=agent_response,
+            intent="recommendation.food",
+            recommendations=recommendations,
+        )
+        json.dumps(jsonable_encoder(model), ensure_ascii=False).encode("utf-8")
+
+    def fast():
+        dumps({
+            "agent_response": agent_response,
+            "intent": "recommendation.food",
+            "recommendations": recommendations,
+        })
+
+    def spliced():
+        dumps_spliced({
+            "agent_response": agent_response,
+            "intent": "recommendation.food",
+            "recommendations": raw_records,
+        })
+
+    print(f"{'='*60}")
+    print(f"📦 Serialización por turno de chat ({args.turns} turnos)")
+    print(f"   Backend JSON: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"{'='*60}")
+
+    base_time = None
+    for name, fn in [("FastAPI default", baseline), ("FastJSONResponse", fast), ("Spliced RawJSON", spliced)]:
+        elapsed = min(timeit.repeat(fn, number=args.turns, repeat=3))
+        per_turn_us = elapsed / args.turns * 1e6
+        if base_time is None:
+            base_time = per_turn_us
+        print(f"  {name:<20} {per_turn_us:8.2f} µs/turno   x{base_time / per_turn_us:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
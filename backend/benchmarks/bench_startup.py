@@ -0,0 +1,161 @@
+"""
+Benchmark del arranque en frío de la API.
+
+1. Tiempo de `import main` en un proceso nuevo (mediana de varias corridas)
+   y los módulos que más tardan en importarse (`python -X importtime`).
+2. Con la app levantada por uvicorn contra los stubs de load_test.py:
+   tiempo hasta /health y /ready, y latencia de la primera petición de
+   recomendación (/sensors + /api/chat) frente a la de las siguientes.
+
+Se mide con y sin el calentamiento del lifespan (STARTUP_WARMUP=1/0) para
+comparar el antes y el después.
+
+Uso:
+    poetry run python benchmarks/bench_startup.py
+    poetry run python benchmarks/bench_startup.py --imports 10 --top 15
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from load_test import BACKEND_DIR, _free_port, start_app
+from stub_servers import DialogflowStubHandler, FdcStubHandler, start_stub
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_times(runs: int, env: Dict[str, str]) -> List[float]:
+    """Segundos de `import main` en procesos nuevos"""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env={**os.environ, **env},
+            capture_output=True, text=True, check=True,
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return times
+
+
+def slowest_imports(top: int, env: Dict[str, str]) -> List[Tuple[str, float]]:
+    """Módulos de primer nivel con más tiempo acumulado según -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+        env={**os.environ, **env}, capture_output=True, text=True, check=True,
+    ).stderr
+    modules: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Los módulos importados directamente llevan un solo espacio de sangría
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) == 1:
+            root = name.strip().split(".")[0]
+            modules[root] = modules.get(root, 0.0) + int(cumulative) / 1000
+    return sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, payload=None) -> Tuple[int, float]:
+    body = json.dumps(payload).encode() if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body else {}
+    start = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status, (time.perf_counter() - start) * 1000
+
+
+def _poll(port: int, path: str, deadline: float) -> float:
+    """Espera a que `path` responda 200; devuelve el instante (monotonic)"""
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            if _request(conn, "GET", path)[0] == 200:
+                return time.monotonic()
+        except OSError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{path} no respondió a tiempo")
+
+
+def cold_start(warm_up: bool, stub_env: Dict[str, str], requests_after: int = 20) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as workdir:
+        env = {
+            **stub_env,
+            "STARTUP_WARMUP": "1" if warm_up else "0",
+            "USER_DB": os.path.join(workdir, "usuarios.sqlite3"),
+            "HISTORY_LOG": os.path.join(workdir, "historial.jsonl"),
+        }
+        port = _free_port()
+        spawned = time.monotonic()
+        process = start_app(port, env)
+        try:
+            deadline = spawned + 120
+            health_at = _poll(port, "/health", deadline)
+            ready_at = _poll(port, "/ready", deadline)
+
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            chat = {"user_id": "bench", "message": "¿Qué debería comer?", "prep_time_available": 30}
+            _request(conn, "POST", "/sensors", {"user_id": "bench", "oxygen_level": 92, "temperature": 12})
+            _, first_ms = _request(conn, "POST", "/api/chat", chat)
+            later = sorted(_request(conn, "POST", "/api/chat", chat)[1] for _ in range(requests_after))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    return {
+        "health_s": health_at - spawned,
+        "ready_s": ready_at - spawned,
+        "first_chat_ms": first_ms,
+        "later_chat_ms": statistics.median(later),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque en frío de la API")
+    parser.add_argument("--imports", type=int, default=5, help="Corridas de `import main`")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    fdc = start_stub(FdcStubHandler)
+    dialogflow = start_stub(DialogflowStubHandler)
+    stub_env = {
+        "API_KEY": "stub",
+        "FDC_BASE_URL": f"http://127.0.0.1:{fdc.server_address[1]}",
+        "DIALOGFLOW_PROJECT_ID": "stub",
+        "DIALOGFLOW_API_ENDPOINT": f"127.0.0.1:{dialogflow.server_address[1]}",
+    }
+
+    print(f"{'='*64}")
+    print("🧊 Arranque en frío")
+    print(f"{'='*64}")
+    times = import_times(args.imports, {})
+    print(f"  import main:          {statistics.median(times) * 1000:8.1f} ms (mediana de {args.imports})")
+    print("  módulos más lentos (acumulado):")
+    for module, ms in slowest_imports(args.top, {}):
+        print(f"    {module:28s} {ms:8.1f} ms")
+
+    print(f"\n  {'':26s} {'sin calentar':>14s} {'con calentamiento':>18s}")
+    cold, warm = cold_start(False, stub_env), cold_start(True, stub_env)
+    rows = [
+        ("hasta /health", "health_s", 1000, "ms"),
+        ("hasta /ready", "ready_s", 1000, "ms"),
+        ("primer /api/chat", "first_chat_ms", 1, "ms"),
+        ("/api/chat siguientes (p50)", "later_chat_ms", 1, "ms"),
+    ]
+    for label, key, scale, unit in rows:
+        print(f"  {label:26s} {cold[key] * scale:12.1f}{unit} {warm[key] * scale:16.1f}{unit}")
+
+
+if __name__ == "__main__":
+    main()
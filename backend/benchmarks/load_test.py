@@ -0,0 +1,295 @@
+"""
+Prueba de carga de /sensors y /api/chat contra una instancia local de la API.
+
+Sin --url arranca los stubs de FoodData Central y Dialogflow
+(stub_servers.py) y la app con uvicorn en un subproceso apuntando a ellos,
+con base de usuarios e historial temporales. Cada hilo cliente simula
+usuarios que envían lecturas de sensores y mensajes de chat (mezcla de
+recomendaciones, saludos y ayuda) por una conexión keep-alive.
+
+Con --workers N la app corre con N procesos de uvicorn; --state elige dónde
+comparten el estado (ver state.py): un SQLite temporal o el stand-in de
+Redis de stub_servers.py. Los resultados multi-worker se comparan con su
+propia sección ("load_4w", ...) y la memoria es la del proceso principal.
+
+Reporta por endpoint el throughput, la latencia p50/p95/p99 y los errores,
+y la memoria residente (actual y pico) del servidor. Los resultados se
+comparan con la sección "load" de benchmarks/baseline.json (ver report.py);
+sale con código 1 si hay regresiones.
+
+Uso:
+    poetry run python benchmarks/load_test.py
+    poetry run python benchmarks/load_test.py --concurrency 32 --duration 60 --fdc-latency-ms 80
+    poetry run python benchmarks/load_test.py --url http://localhost:8000 --pid 12345
+    poetry run python benchmarks/load_test.py --workers 4 --state redis
+    poetry run python benchmarks/load_test.py --save-baseline
+"""
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from report import DEFAULT_BASELINE, DEFAULT_TOLERANCE, compare, percentile, rss_mb, save_baseline
+from stub_servers import DialogflowStubHandler, FdcStubHandler, start_resp_stub, start_stub
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+CHAT_MESSAGES = [
+    ("¿Qué debería comer hoy?", 6),
+    ("Recomiéndame algo para la cena", 3),
+    ("Hola, buenos días", 1),
+    ("ayuda", 1),
+]
+
+# (endpoint, latencia en segundos, ok)
+Sample = Tuple[str, float, bool]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Los usuarios simulados piden mucho más rápido que uno real: límites de tasa
+# tan altos que nunca rechazan, pero el middleware sigue corriendo y se mide
+UNLIMITED_RATE_LIMITS = {
+    name: "1000000:1000000"
+    for name in ("RATE_LIMIT_API", "RATE_LIMIT_SENSORS", "RATE_LIMIT_FDC", "RATE_LIMIT_FDC_USER")
+}
+
+
+def start_app(port: int, env: Dict[str, str], workers: int = 1) -> subprocess.Popen:
+    """Arranca la API con uvicorn en un subproceso"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+    )
+
+
+def wait_ready(host: str, port: int, timeout: float = 60.0, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"La app terminó al arrancar (código {process.returncode})")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"La app no respondió en {timeout:.0f}s")
+
+
+class VirtualUsers:
+    """Un hilo cliente: recorre sus usuarios alternando sensores y chat"""
+
+    def __init__(self, host: str, port: int, user_ids: List[str], chat_ratio: float, seed: int):
+        self.host, self.port = host, port
+        self.user_ids = user_ids
+        self.chat_ratio = chat_ratio
+        self.rng = random.Random(seed)
+        self.samples: List[Sample] = []
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.messages = [message for message, weight in CHAT_MESSAGES for _ in range(weight)]
+
+    def _post(self, endpoint: str, path: str, payload: Dict[str, Any]) -> bool:
+        body = json.dumps(payload).encode()
+        start = time.perf_counter()
+        try:
+            self.conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            ok = False
+        self.samples.append((endpoint, time.perf_counter() - start, ok))
+        return ok
+
+    def send_sensors(self, user_id: str):
+        self._post("sensors", "/sensors", {
+            "user_id": user_id,
+            "oxygen_level": self.rng.choice([88, 92, 97, 99]),
+            "temperature": self.rng.choice([8, 18, 24, 33]),
+            "heart_rate": self.rng.randint(60, 110),
+        })
+
+    def run(self, deadline: float):
+        # Todos los usuarios necesitan lecturas antes de pedir recomendaciones
+        for user_id in self.user_ids:
+            self.send_sensors(user_id)
+        while time.monotonic() < deadline:
+            user_id = self.rng.choice(self.user_ids)
+            if self.rng.random() < self.chat_ratio:
+                self._post("chat", "/api/chat", {
+                    "user_id": user_id,
+                    "message": self.rng.choice(self.messages),
+                    "prep_time_available": self.rng.choice([15, 30, 60]),
+                })
+            else:
+                self.send_sensors(user_id)
+        self.conn.close()
+
+
+def run_load(host: str, port: int, users: int, concurrency: int, duration: float,
+             warmup: float, chat_ratio: float) -> Tuple[List[Sample], float]:
+    """Ejecuta la carga; devuelve las muestras medidas y la duración efectiva"""
+    user_ids = [f"load_user_{i}" for i in range(users)]
+    clients = [
+        VirtualUsers(host, port, user_ids[i::concurrency] or user_ids, chat_ratio, seed=i)
+        for i in range(concurrency)
+    ]
+    start = time.monotonic()
+    deadline = start + warmup + duration
+    threads = [threading.Thread(target=client.run, args=(deadline,)) for client in clients]
+    for thread in threads:
+        thread.start()
+
+    # Descartar lo registrado durante el calentamiento
+    time.sleep(warmup)
+    offsets = [len(client.samples) for client in clients]
+    measured_start = time.monotonic()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - measured_start
+
+    samples = [sample for client, offset in zip(clients, offsets) for sample in client.samples[offset:]]
+    return samples, elapsed
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Dict[str, float]]:
+    by_endpoint: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for endpoint, latency, ok in samples:
+        by_endpoint[endpoint].append(latency * 1000)
+        if not ok:
+            errors[endpoint] += 1
+
+    summary = {}
+    for endpoint, latencies in sorted(by_endpoint.items()):
+        latencies.sort()
+        summary[endpoint] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "errors": errors[endpoint],
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /sensors y /api/chat")
+    parser.add_argument("--url", default=None, help="API ya levantada (por defecto arranca una con stubs)")
+    parser.add_argument("--pid", type=int, default=None, help="PID del servidor (para medir RSS con --url)")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios simulados")
+    parser.add_argument("--concurrency", type=int, default=16, help="Conexiones/hilos cliente")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos medidos")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--chat-ratio", type=float, default=0.7, help="Fracción de peticiones de chat")
+    parser.add_argument("--fdc-latency-ms", type=float, default=0.0, help="Latencia simulada de FDC")
+    parser.add_argument("--dialogflow-latency-ms", type=float, default=0.0, help="Latencia simulada de Dialogflow")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de uvicorn")
+    parser.add_argument("--state", choices=("memory", "sqlite", "redis"), default=None,
+                        help="STATE_BACKEND (por defecto sqlite con varios workers, memory con uno)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Archivo de línea base")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Empeoramiento tolerado")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar los resultados como línea base")
+    args = parser.parse_args()
+
+    process = None
+    workdir = None
+    pid = args.pid
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        fdc = start_stub(FdcStubHandler, latency_ms=args.fdc_latency_ms)
+        dialogflow = start_stub(DialogflowStubHandler, latency_ms=args.dialogflow_latency_ms)
+        workdir = tempfile.TemporaryDirectory(prefix="load_test_")
+        host, port = "127.0.0.1", _free_port()
+        state = args.state or ("sqlite" if args.workers > 1 else "memory")
+        if state == "redis":
+            redis = start_resp_stub()
+            state_url = f"redis://127.0.0.1:{redis.server_address[1]}/0"
+        elif state == "sqlite":
+            state_url = f"sqlite:///{os.path.join(workdir.name, 'estado.sqlite3')}"
+        else:
+            state_url = "memory"
+        process = start_app(port, {
+            "API_KEY": "stub",
+            "FDC_BASE_URL": f"http://127.0.0.1:{fdc.server_address[1]}",
+            "DIALOGFLOW_PROJECT_ID": "stub",
+            "DIALOGFLOW_API_ENDPOINT": f"127.0.0.1:{dialogflow.server_address[1]}",
+            "USER_DB": os.path.join(workdir.name, "usuarios.sqlite3"),
+            "HISTORY_LOG": os.path.join(workdir.name, "historial.jsonl"),
+            "STATE_BACKEND": state_url,
+            **UNLIMITED_RATE_LIMITS,
+        }, workers=args.workers)
+        pid = process.pid
+
+    try:
+        wait_ready(host, port, process=process)
+        idle = rss_mb(pid) if pid else {}
+        samples, elapsed = run_load(host, port, args.users, args.concurrency, args.duration,
+                                    args.warmup, args.chat_ratio)
+        memory = rss_mb(pid) if pid else {}
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if workdir is not None:
+            workdir.cleanup()
+
+    results: Dict[str, Any] = summarize(samples, elapsed)
+    if memory:
+        results.update(memory)
+
+    print(f"{'='*78}")
+    print(f"🚦 Carga: {args.users} usuarios, {args.concurrency} conexiones, {args.workers} worker(s), "
+          f"{elapsed:.1f}s medidos "
+          f"(FDC +{args.fdc_latency_ms:.0f} ms, Dialogflow +{args.dialogflow_latency_ms:.0f} ms)")
+    print(f"{'='*78}")
+    print(f"  {'endpoint':10s} {'peticiones':>10s} {'req/s':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'errores':>8s}")
+    for endpoint, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"  {endpoint:10s} {stats['requests']:10d} {stats['rps']:9.1f} {stats['p50_ms']:7.2f}ms "
+                  f"{stats['p95_ms']:7.2f}ms {stats['p99_ms']:7.2f}ms {stats['errors']:8d}")
+    if memory:
+        print(f"\n  RSS del servidor: {idle.get('rss_mb', 0):.1f} MB en reposo -> {memory['rss_mb']:.1f} MB "
+              f"(pico {memory['peak_rss_mb']:.1f} MB)")
+
+    section = "load" if args.workers == 1 else f"load_{args.workers}w"
+    if args.save_baseline:
+        save_baseline(section, results, args.baseline)
+        print(f"\n💾 Línea base guardada en {args.baseline}")
+        return
+
+    regressions = compare(section, results, args.baseline, args.tolerance)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
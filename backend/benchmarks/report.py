@@ -0,0 +1,116 @@
+"""
+Utilidades compartidas por bench_micro.py y load_test.py: percentiles,
+memoria del proceso y comparación con una línea base guardada.
+
+La línea base es un JSON con una sección por script:
+
+    {"micro": {"serialization.chat_turn": {"median_us": 4.1, ...}},
+     "load": {"chat": {"rps": 850.0, "p95_ms": 31.2, ...}, "rss_mb": 210.4}}
+
+Las métricas que terminan en `_us`, `_ms` o `_mb` empeoran al subir; las
+que terminan en `rps` u `ops_per_s`, al bajar. Se marca una regresión
+cuando empeoran más que la tolerancia (por defecto 20%), o cuando hay más
+`errors` que en la línea base.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.20
+
+LOWER_IS_BETTER = ("_us", "_ms", "_mb")
+HIGHER_IS_BETTER = ("rps", "ops_per_s")
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Percentil q (0-100) por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def rss_mb(pid: Optional[int] = None) -> Dict[str, float]:
+    """Memoria residente actual (VmRSS) y pico (VmHWM) en MB; vacío si no hay /proc"""
+    status = Path(f"/proc/{pid or os.getpid()}/status")
+    if not status.exists():
+        return {}
+    values = {}
+    for line in status.read_text().splitlines():
+        key, _, rest = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            values["rss_mb" if key == "VmRSS" else "peak_rss_mb"] = round(int(rest.split()[0]) / 1024, 1)
+    return values
+
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def load_baseline(path: Path = DEFAULT_BASELINE) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(section: str, results: Dict[str, Any], path: Path = DEFAULT_BASELINE):
+    """Guarda los resultados como línea base de la sección (conserva las demás)"""
+    baseline = load_baseline(path)
+    baseline[section] = results
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(
+    section: str,
+    results: Dict[str, Any],
+    path: Path = DEFAULT_BASELINE,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> Optional[List[str]]:
+    """
+    Compara los resultados con la línea base e imprime las diferencias.
+
+    Returns:
+        Lista de regresiones (vacía si no hay) o None si no hay línea base
+    """
+    baseline = load_baseline(path).get(section)
+    if not baseline:
+        print(f"\n(sin línea base para '{section}' en {path}; usa --save-baseline)")
+        return None
+
+    before, after = _flatten(baseline), _flatten(results)
+    regressions = []
+    print(f"\n📏 Comparación con la línea base ({path.name}, tolerancia {tolerance:.0%})")
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        if name.endswith(LOWER_IS_BETTER):
+            worse = new > old * (1 + tolerance)
+        elif name.endswith(HIGHER_IS_BETTER):
+            worse = new < old * (1 - tolerance)
+        elif name.endswith("errors"):
+            worse = new > old
+        else:
+            continue
+        change = (new - old) / old if old else 0.0
+        mark = "❌" if worse else "  "
+        print(f"  {mark} {name:40s} {old:12.2f} -> {new:12.2f}  ({change:+.1%})")
+        if worse:
+            regressions.append(name)
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones: {', '.join(regressions)}")
+    else:
+        print("\n✅ Sin regresiones")
+    return regressions
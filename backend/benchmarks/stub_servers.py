@@ -0,0 +1,260 @@
+"""
+Servidores falsos de FoodData Central y Dialogflow para pruebas de carga.
+
+- FDC: responde /foods/search, /food/{id} y /foods?fdcIds=... con
+  nutrientes deterministas generados a partir del nombre o del id.
+- Dialogflow: responde el endpoint REST detectIntent de v2beta1
+  (POST /v2beta1/projects/*/agent/sessions/*:detectIntent) clasificando
+  el texto por palabras clave.
+- Redis: stand-in en memoria del protocolo RESP con los comandos que usa
+  state.py (PING, GET, SET [EX|PX], DEL, INCRBY, PEXPIRE, SELECT, AUTH),
+  para probar STATE_BACKEND=redis://... sin un servidor real.
+
+Ambos pueden añadir una latencia fija para simular la red. La app se
+apunta a ellos con FDC_BASE_URL y DIALOGFLOW_API_ENDPOINT (load_test.py
+lo hace solo).
+
+Uso (para probar la app a mano con los stubs):
+    poetry run python benchmarks/stub_servers.py --fdc-port 8101 --dialogflow-port 8102
+"""
+
+import argparse
+import json
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+INTENT_KEYWORDS = [
+    ("recommendation.food", ("recomienda", "recomiénda", "comer", "almuerzo", "cena", "desayuno", "comida")),
+    ("greeting", ("hola", "buenos días", "buenas", "hello")),
+    ("help", ("ayuda", "help")),
+]
+
+
+def _stub_nutrients(seed: int) -> List[Tuple[str, float, str]]:
+    return [
+        ("Energy", 80 + seed % 600, "KCAL"),
+        ("Protein", (seed % 400) / 10, "G"),
+        ("Total lipid (fat)", (seed % 300) / 10, "G"),
+        ("Carbohydrate, by difference", (seed % 800) / 10, "G"),
+        ("Iron, Fe", (seed % 90) / 10, "MG"),
+    ]
+
+
+def _food_record(fdc_id: int, description: Optional[str] = None) -> Dict[str, Any]:
+    """Registro de /food/{id} (formato de detalle de FDC)"""
+    return {
+        "fdcId": fdc_id,
+        "description": description or f"Stub food {fdc_id}",
+        "dataType": "Foundation",
+        "publicationDate": "2024-04-01",
+        "foodNutrients": [
+            {"nutrient": {"name": name, "unitName": unit.lower()}, "amount": amount}
+            for name, amount, unit in _stub_nutrients(fdc_id)
+        ],
+    }
+
+
+def _search_result(query: str, page_size: int) -> Dict[str, Any]:
+    """Respuesta de /foods/search (formato abreviado de FDC)"""
+    base = zlib.crc32(query.encode()) % 1_000_000
+    return {
+        "totalHits": page_size,
+        "foods": [
+            {
+                "fdcId": base + i,
+                "description": f"{query.title()}{'' if i == 0 else f' #{i}'}",
+                "foodNutrients": [
+                    {"nutrientName": name, "value": amount, "unitName": unit}
+                    for name, amount, unit in _stub_nutrients(base + i)
+                ],
+            }
+            for i in range(page_size)
+        ],
+    }
+
+
+def classify(text: str) -> str:
+    text = text.lower()
+    for intent, keywords in INTENT_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return intent
+    return "Default Fallback Intent"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeceras y cuerpo van en escrituras separadas: sin esto Nagle + ACK retardado suman ~40 ms
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FdcStubHandler(_StubHandler):
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip("/")
+
+        if path.endswith("/foods/search"):
+            self._send_json(200, _search_result(params.get("query", ""), int(params.get("pageSize", 2))))
+        elif path.endswith("/foods"):
+            ids = [int(fdc_id) for fdc_id in params.get("fdcIds", "").split(",") if fdc_id]
+            self._send_json(200, [_food_record(fdc_id) for fdc_id in ids])
+        elif "/food/" in path:
+            try:
+                self._send_json(200, _food_record(int(path.rsplit("/", 1)[1])))
+            except ValueError:
+                self._send_json(400, {"error": "invalid fdcId"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+class DialogflowStubHandler(_StubHandler):
+    def do_POST(self):
+        self._delay()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith(":detectIntent"):
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+            return
+
+        text = body.get("queryInput", {}).get("text", {}).get("text", "")
+        self._send_json(200, {
+            "responseId": f"stub-{zlib.crc32(text.encode())}",
+            "queryResult": {
+                "queryText": text,
+                "languageCode": "es",
+                "intent": {"displayName": classify(text)},
+                "intentDetectionConfidence": 0.9,
+                "fulfillmentText": "",
+                "parameters": {},
+            },
+        })
+
+
+class RespStubHandler(socketserver.StreamRequestHandler):
+    """Una conexión RESP: lee comandos (arrays de bulk strings) y responde"""
+    disable_nagle_algorithm = True
+    store: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+    lock = threading.Lock()
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            self.store.pop(key, None)
+            return None
+        return entry[0]
+
+    def _execute(self, name: str, args: List[bytes]) -> bytes:
+        if name in ("PING", "SELECT", "AUTH"):
+            return b"+PONG\r\n" if name == "PING" else b"+OK\r\n"
+        with self.lock:
+            if name == "GET":
+                value = self._get(args[0])
+                return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            if name == "SET":
+                expires_at = None
+                if len(args) >= 4 and args[2].upper() in (b"EX", b"PX"):
+                    scale = 1.0 if args[2].upper() == b"EX" else 0.001
+                    expires_at = time.monotonic() + int(args[3]) * scale
+                self.store[args[0]] = (args[1], expires_at)
+                return b"+OK\r\n"
+            if name == "DEL":
+                return b":%d\r\n" % sum(self.store.pop(key, None) is not None for key in args)
+            if name in ("INCR", "INCRBY"):
+                entry = self.store.get(args[0])
+                value = int(self._get(args[0]) or 0) + (int(args[1]) if name == "INCRBY" else 1)
+                self.store[args[0]] = (str(value).encode(), entry[1] if entry else None)
+                return b":%d\r\n" % value
+            if name == "PEXPIRE":
+                value = self._get(args[0])
+                if value is None:
+                    return b":0\r\n"
+                self.store[args[0]] = (value, time.monotonic() + int(args[1]) / 1000)
+                return b":1\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if not command:
+                return
+            self.wfile.write(self._execute(command[0].decode().upper(), command[1:]))
+
+
+def start_resp_stub(port: int = 0) -> socketserver.ThreadingTCPServer:
+    """Arranca el stand-in de Redis en un hilo (store propio por servidor)"""
+    handler_class = type("RespStubHandler", (RespStubHandler,), {"store": {}, "lock": threading.Lock()})
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="RespStubHandler", daemon=True).start()
+    return server
+
+
+def start_stub(handler: type, port: int = 0, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Arranca el stub en un hilo; con port=0 se elige un puerto libre"""
+    handler_class = type(handler.__name__, (handler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=handler.__name__, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stubs de FoodData Central y Dialogflow")
+    parser.add_argument("--fdc-port", type=int, default=8101)
+    parser.add_argument("--dialogflow-port", type=int, default=8102)
+    parser.add_argument("--fdc-latency-ms", type=float, default=0.0)
+    parser.add_argument("--dialogflow-latency-ms", type=float, default=0.0)
+    parser.add_argument("--redis-port", type=int, default=None, help="Levantar también el stand-in de Redis")
+    args = parser.parse_args()
+
+    start_stub(FdcStubHandler, args.fdc_port, args.fdc_latency_ms)
+    start_stub(DialogflowStubHandler, args.dialogflow_port, args.dialogflow_latency_ms)
+    print(f"FDC_BASE_URL=http://127.0.0.1:{args.fdc_port}")
+    print(f"DIALOGFLOW_API_ENDPOINT=127.0.0.1:{args.dialogflow_port} DIALOGFLOW_PROJECT_ID=stub")
+    if args.redis_port is not None:
+        start_resp_stub(args.redis_port)
+        print(f"STATE_BACKEND=redis://127.0.0.1:{args.redis_port}/0")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+Acceso al catálogo de comidas generado por prolog/food_loader.py.
+
+Centraliza las rutas de los archivos del catálogo y expone una "versión"
+que cambia cada vez que se regeneran, para invalidar caches derivados.
+
+También contiene el escritor del catálogo (CatalogWriter), que genera
+comidas_dynamic.pl, el cache JSON Lines y su manifiesto en streaming y
+los publica con un rename atómico.
+"""
+
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+PROLOG_DIR = Path(__file__).parent / "prolog"
+
+# Cache en JSON Lines: una línea de cabecera y luego una comida por línea
+CACHE_FILE = PROLOG_DIR / "food_cache.jsonl"
+MANIFEST_FILE = PROLOG_DIR / "food_cache.manifest.json"
+# Formato anterior (un único JSON indentado), solo lectura
+LEGACY_CACHE_FILE = PROLOG_DIR / "food_cache.json"
+DYNAMIC_FILE = PROLOG_DIR / "comidas_dynamic.pl"
+STATIC_FILE = PROLOG_DIR / "comidas.pl"
+RULES_FILE = PROLOG_DIR / "comidas_rules.pl"
+
+CATALOG_FILES: List[Path] = [
+    MANIFEST_FILE, CACHE_FILE, LEGACY_CACHE_FILE, DYNAMIC_FILE, STATIC_FILE, RULES_FILE,
+]
+
+CACHE_FORMAT = "food_cache"
+CACHE_FORMAT_VERSION = 2
+CATEGORIES = ["breakfast", "lunch", "dinner", "snack"]
+WRITE_BUFFER_SIZE = 1 << 20
+# Líneas que se ordenan en memoria a la vez al deduplicar los hechos índice
+SORT_CHUNK_LINES = 50000
+
+# Versión de los hechos índice (comida_by_ctx/4, comida_by_calories/3,
+# agregados materializados) y tamaño de los rangos de calorías que usan
+# comidas_rules.pl
+PROLOG_INDEX_VERSION = 4
+CALORIE_BUCKET_SIZE = 100
+
+
+# Versión ya calculada en la petición en curso (ver catalog_version_scope)
+_scoped_version: ContextVar[Optional[Dict[str, str]]] = ContextVar("catalog_version", default=None)
+
+
+def catalog_version() -> str:
+    """
+    Versión del catálogo basada en fecha de modificación y tamaño de los archivos.
+
+    Dentro de catalog_version_scope() (cada petición HTTP, cada trabajo en
+    segundo plano) se calcula una sola vez aunque la pidan varias partes
+    (clave de cache, recomendador, índice de búsqueda).
+    """
+    memo = _scoped_version.get()
+    if memo is None:
+        return _compute_catalog_version()
+    version = memo.get("version")
+    if version is None:
+        version = memo["version"] = _compute_catalog_version()
+    return version
+
+
+@contextmanager
+def catalog_version_scope() -> Iterator[None]:
+    """Congela la versión del catálogo durante el bloque (se propaga a asyncio.to_thread)"""
+    token = _scoped_version.set({})
+    try:
+        yield
+    finally:
+        _scoped_version.reset(token)
+
+
+def _compute_catalog_version() -> str:
+    """Hace stat de los archivos del catálogo y resume fechas y tamaños"""
+    digest = hashlib.sha1()
+    for path in CATALOG_FILES:
+        try:
+            st = os.stat(path)
+            digest.update(f"{path.name}:{st.st_mtime_ns}:{st.st_size};".encode())
+        except FileNotFoundError:
+            digest.update(f"{path.name}:-;".encode())
+    return digest.hexdigest()[:16]
+
+
+# Nutrientes que usa el recomendador (clave corta -> nombre FDC)
+NUTRIENT_KEYS: Dict[str, str] = {
+    "protein": "Protein",
+    "fat": "Total lipid (fat)",
+    "carbs": "Carbohydrate, by difference",
+    "fiber": "Fiber, total dietary",
+    "sugar": "Total Sugars",
+    "iron": "Iron, Fe",
+    "sodium": "Sodium, Na",
+}
+
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Extrae el número de un valor de nutriente ("11.1 G" -> 11.1)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def iter_catalog_foods(cache_file: Path = CACHE_FILE) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre las comidas del cache sin cargarlo entero en memoria.
+
+    Si no existe el cache JSON Lines se lee el formato anterior (food_cache.json).
+    """
+    if cache_file.exists():
+        with open(cache_file, "r", encoding="utf-8") as f:
+            f.readline()  # cabecera
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif LEGACY_CACHE_FILE.exists():
+        with open(LEGACY_CACHE_FILE, "r", encoding="utf-8") as f:
+            yield from json.load(f).get("foods", [])
+
+
+def load_catalog_foods() -> List[Dict[str, Any]]:
+    """Carga las comidas del cache generado por food_loader.py"""
+    return list(iter_catalog_foods())
+
+
+def read_catalog_manifest() -> Optional[Dict[str, Any]]:
+    """
+    Devuelve el manifiesto del catálogo (fecha, total y conteo por categoría).
+
+    Con el formato anterior se calcula leyendo el cache completo.
+    """
+    if MANIFEST_FILE.exists():
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if not LEGACY_CACHE_FILE.exists():
+        return None
+    with open(LEGACY_CACHE_FILE, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    by_category: Dict[str, int] = {}
+    for food in cache.get("foods", []):
+        category = food.get("category", "unknown")
+        by_category[category] = by_category.get(category, 0) + 1
+    return {
+        "generated_at": cache.get("generated_at"),
+        "total_foods": cache.get("total_foods", 0),
+        "by_category": by_category,
+    }
+
+
+# ============================================
+# ✍️ Escritura atómica del catálogo
+# ============================================
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "w") -> Iterator[IO]:
+    """
+    Escribe en un archivo temporal del mismo directorio y lo renombra al terminar.
+
+    Un lector nunca ve el archivo a medio escribir: o ve la versión
+    anterior o la nueva completa. Si hay un error, el temporal se borra.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        encoding = None if "b" in mode else "utf-8"
+        with io.open(fd, mode, buffering=WRITE_BUFFER_SIZE, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def prolog_quote(text: Any) -> str:
+    """Átomo Prolog entre comillas simples (las comillas internas se duplican)"""
+    return "'" + str(text).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _write_unique_sorted(source: IO, target: IO, chunk_lines: Optional[int] = None):
+    """
+    Copia las líneas de `source` a `target` ordenadas y sin repetir.
+
+    Ordena por tramos de `chunk_lines` líneas en archivos temporales y los
+    mezcla con heapq.merge: la memoria no depende del tamaño de `source`.
+    """
+    chunk_lines = chunk_lines or SORT_CHUNK_LINES
+    source.seek(0)
+    with ExitStack() as stack:
+        runs = []
+        while True:
+            chunk = list(itertools.islice(source, chunk_lines))
+            if not chunk:
+                break
+            run = stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8"))
+            run.writelines(sorted(set(chunk)))
+            run.seek(0)
+            runs.append(run)
+
+        previous = None
+        for line in heapq.merge(*runs):
+            if line != previous:
+                target.write(line)
+                previous = line
+
+
+class CatalogWriter:
+    """
+    Genera comidas_dynamic.pl, food_cache.jsonl y el manifiesto en streaming.
+
+    Cada comida se escribe en cuanto llega (add), así que la memoria no
+    depende del tamaño del catálogo: las secciones del archivo Prolog que
+    van agrupadas por categoría se acumulan en archivos temporales y se
+    concatenan al final. Los archivos se publican con rename atómico y el
+    manifiesto se escribe el último.
+
+    Además de comida/7 se generan hechos índice para que SWI-Prolog pueda
+    indexar por primer argumento las consultas de comidas_rules.pl:
+    comida_by_ctx(Climate, State, TimeType, Food) y
+    comida_by_calories(Bucket, Calories, Food), más los agregados que
+    usan las estadísticas (comida_count/1, comida_category_stats/4,
+    comida_by_category/2). Los hechos índice repetidos se quitan al final
+    ordenando sus secciones por tramos (ver _write_unique_sorted), así que
+    tampoco para eso se guarda nada por comida en memoria.
+
+    Uso:
+        with CatalogWriter() as writer:
+            for food in foods:
+                writer.add(food)
+        print(writer.manifest)
+    """
+
+    def __init__(
+        self,
+        prolog_file: Path = DYNAMIC_FILE,
+        cache_file: Path = CACHE_FILE,
+        manifest_file: Path = MANIFEST_FILE,
+        source: str = "FoodData Central API",
+    ):
+        self.prolog_file = Path(prolog_file)
+        self.cache_file = Path(cache_file)
+        self.manifest_file = Path(manifest_file)
+        self.source = source
+        self.generated_at = datetime.now()
+        self.total = 0
+        self.by_category: Dict[str, int] = {}
+        self.manifest: Optional[Dict[str, Any]] = None
+        self._stack = None
+        self._calorie_buckets: Optional[Tuple[int, int]] = None
+        # Categoría -> [comidas con calorías numéricas, suma de sus calorías]
+        self._calories_by_category: Dict[str, List[float]] = {}
+
+    def __enter__(self) -> "CatalogWriter":
+        self._stack = ExitStack()
+        self._cache = self._stack.enter_context(atomic_write(self.cache_file))
+        self._cache.write(json.dumps({
+            "format": CACHE_FORMAT,
+            "version": CACHE_FORMAT_VERSION,
+            "generated_at": self.generated_at.isoformat(),
+        }) + "\n")
+
+        # Secciones del .pl: una por categoría + nombres + fdc_ids + índices
+        self._sections: Dict[str, IO] = {
+            name: self._stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8"))
+            for name in CATEGORIES + ["other", "display", "fdc", "by_ctx", "by_calories", "by_category"]
+        }
+        return self
+
+    def add(self, food: Dict[str, Any]):
+        """Escribe una comida ya categorizada (formato de FoodLoader._process_food)"""
+        category = food["category"]
+        section = self._sections[category if category in CATEGORIES else "other"]
+        section.write(
+            f"comida({food['prolog_name']}, {food['climate']}, {food['state']}, "
+            f"{food['prep_time']}, {category}, {food['calories']}, {prolog_quote(food['fdc_id'])}).\n"
+        )
+        self._sections["display"].write(
+            f"food_display_name({food['prolog_name']}, {prolog_quote(food['display_name'])}).\n"
+        )
+        self._sections["fdc"].write(f"food_fdc_id({food['prolog_name']}, {prolog_quote(food['fdc_id'])}).\n")
+        self._cache.write(json.dumps(food, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._add_index_facts(food)
+
+        self.total += 1
+        self.by_category[category] = self.by_category.get(category, 0) + 1
+
+    def _add_index_facts(self, food: Dict[str, Any]):
+        name = food["prolog_name"]
+        category = food["category"]
+        self._sections["by_category"].write(f"comida_by_category({category}, {name}).\n")
+        calories = food["calories"]
+        if isinstance(calories, (int, float)):
+            # El promedio se calcula sobre estas comidas (cantidad y suma de la misma población)
+            totals = self._calories_by_category.setdefault(category, [0, 0])
+            totals[0] += 1
+            totals[1] += calories
+
+        # Los repetidos se quitan al escribir el .pl
+        self._sections["by_ctx"].write(
+            f"comida_by_ctx({food['climate']}, {food['state']}, {food['prep_time']}, {name}).\n"
+        )
+
+        if isinstance(calories, (int, float)):
+            bucket = int(calories // CALORIE_BUCKET_SIZE)
+            self._sections["by_calories"].write(f"comida_by_calories({bucket}, {calories}, {name}).\n")
+            if self._calorie_buckets is None:
+                self._calorie_buckets = (bucket, bucket)
+            else:
+                low, high = self._calorie_buckets
+                self._calorie_buckets = (min(low, bucket), max(high, bucket))
+
+    def add_all(self, foods: Iterable[Dict[str, Any]]):
+        for food in foods:
+            self.add(food)
+
+    def _write_prolog(self):
+        with atomic_write(self.prolog_file) as f:
+            f.write(f"/* {'=' * 60}\n")
+            f.write("   📘 comidas_dynamic.pl (AUTOGENERADO)\n")
+            f.write(f"   Generado desde {self.source}\n")
+            f.write(f"   Fecha: {self.generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"   Total de comidas: {self.total}\n")
+            f.write(f"   {'=' * 60} */\n\n")
+
+            f.write("% comida(Name, Climate, State, TimeType, Category, Calories, FdcId)\n")
+            f.write("% Climate: cold | hot | warm\n")
+            f.write("% State: normal | low_oxygen\n")
+            f.write("% TimeType: quick | medium | long\n")
+            f.write("% Category: breakfast | lunch | dinner | snack\n\n")
+
+            # Se pueden agregar/quitar comidas en tiempo de ejecución (add_comida/7)
+            f.write(":- dynamic comida/7, food_display_name/2, food_fdc_id/2.\n")
+            f.write(":- dynamic comida_by_ctx/4, comida_by_calories/3, "
+                    "comida_calorie_buckets/2, comida_index_version/1.\n")
+            f.write(":- dynamic comida_by_category/2, comida_count/1, comida_category_stats/4.\n\n")
+
+            for category in CATEGORIES + ["other"]:
+                count = (self.total - sum(self.by_category.get(c, 0) for c in CATEGORIES)
+                         if category == "other" else self.by_category.get(category, 0))
+                if not count:
+                    continue
+                f.write(f"% --- {category.upper()} ({count}) ---\n")
+                self._copy_section(category, f)
+                f.write("\n")
+
+            f.write("% Mapeo de nombres internos a nombres para mostrar\n")
+            self._copy_section("display", f)
+            f.write("\n")
+
+            f.write("% Información nutricional completa\n")
+            self._copy_section("fdc", f)
+            f.write("\n")
+
+            # Hechos índice: el primer argumento es el que se consulta (ver comidas_rules.pl)
+            f.write("% Índice por contexto: comida_by_ctx(Climate, State, TimeType, Food)\n")
+            _write_unique_sorted(self._sections["by_ctx"], f)
+            f.write("\n")
+
+            f.write(f"% Índice por calorías: comida_by_calories(Cal // {CALORIE_BUCKET_SIZE}, Cal, Food)\n")
+            _write_unique_sorted(self._sections["by_calories"], f)
+            if self._calorie_buckets is not None:
+                f.write(f"comida_calorie_buckets({self._calorie_buckets[0]}, {self._calorie_buckets[1]}).\n")
+            f.write("\n")
+
+            # Agregados materializados para count_foods/1, list_by_category/2, ...
+            f.write("% Comidas por categoría: comida_by_category(Category, Food)\n")
+            self._copy_section("by_category", f)
+            f.write("\n")
+            f.write("% Agregados: comida_count(Total),\n"
+                    "% comida_category_stats(Category, Count, CalorieCount, TotalCalories)\n"
+                    "% (CalorieCount: comidas con calorías numéricas, las que suman TotalCalories)\n")
+            f.write(f"comida_count({self.total}).\n")
+            for category, count in self.by_category.items():
+                calorie_count, total_calories = self._calories_by_category.get(category, (0, 0))
+                f.write(f"comida_category_stats({category}, {count}, {calorie_count}, {total_calories}).\n")
+            f.write("\n")
+            f.write(f"comida_index_version({PROLOG_INDEX_VERSION}).\n")
+
+    def _copy_section(self, name: str, target: IO):
+        section = self._sections[name]
+        section.seek(0)
+        shutil.copyfileobj(section, target, WRITE_BUFFER_SIZE)
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if exc_type is None:
+                self._write_prolog()
+        except BaseException as e:
+            self._stack.__exit__(type(e), e, e.__traceback__)
+            raise
+        # Cierra (y publica si no hubo error) el cache y borra las secciones temporales
+        self._stack.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.manifest = {
+                "format": CACHE_FORMAT,
+                "version": CACHE_FORMAT_VERSION,
+                "generated_at": self.generated_at.isoformat(),
+                "source": self.source,
+                "total_foods": self.total,
+                "by_category": self.by_category,
+                "files": {
+                    path.name: os.stat(path).st_size
+                    for path in (self.prolog_file, self.cache_file)
+                },
+            }
+            with atomic_write(self.manifest_file) as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        return False
@@ -10,8 +10,6 @@ Este módulo maneja la comunicación con Dialogflow para:
 
 import os
 from typing import Optional, Dict, Any, List
-from google.cloud import dialogflow_v2beta1 as dialogflow
-from google.api_core import exceptions as google_exceptions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +24,10 @@ class DialogflowClient:
     - DIALOGFLOW_PROJECT_ID: ID del proyecto de Google Cloud
     - DIALOGFLOW_LOCATION: Ubicación del agente (default: global)
     - DIALOGFLOW_AGENT_ID: ID del agente (para Dialogflow CX) o None para ES
+
+    Opcional:
+    - DIALOGFLOW_API_ENDPOINT: host:puerto de un servidor REST de pruebas
+      (sin TLS ni credenciales), ej. el stub de benchmarks/load_test.py
     """
     
     def __init__(
@@ -53,6 +55,12 @@ class DialogflowClient:
             raise ValueError(
                 "DIALOGFLOW_PROJECT_ID debe estar configurado en variables de entorno"
             )
+
+        # El SDK de Google tarda en importarse: solo se carga si hay proyecto configurado
+        from google.cloud import dialogflow_v2beta1 as dialogflow
+        from google.api_core import exceptions as google_exceptions
+        self._dialogflow = dialogflow
+        self._api_error = google_exceptions.GoogleAPIError
         
         # Verificar credenciales
         credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -72,6 +80,19 @@ class DialogflowClient:
             # Dialogflow ES (Enterprise Edition)
             self.session_client = dialogflow.SessionsClient()
             self.use_cx = False
+
+        api_endpoint = os.getenv("DIALOGFLOW_API_ENDPOINT")
+        if api_endpoint:
+            # Servidor local de pruebas: transporte REST por HTTP sin credenciales
+            from google.auth.credentials import AnonymousCredentials
+            from google.cloud.dialogflow_v2beta1.services.sessions.transports import SessionsRestTransport
+
+            self.session_client = dialogflow.SessionsClient(transport=SessionsRestTransport(
+                host=api_endpoint,
+                credentials=AnonymousCredentials(),
+                url_scheme="http",
+            ))
+            logger.info(f"Dialogflow apuntando a {api_endpoint} (REST sin TLS)")
     
     def _get_session_path(self, session_id: str) -> str:
         """
@@ -136,8 +157,8 @@ class DialogflowClient:
             lang = language_code or self.language_code
             
             # Crear el texto de entrada
-            text_input = dialogflow.TextInput(text=text, language_code=lang)
-            query_input = dialogflow.QueryInput(text=text_input)
+            text_input = self._dialogflow.TextInput(text=text, language_code=lang)
+            query_input = self._dialogflow.QueryInput(text=text_input)
             
             # Detectar intención
             response = self.session_client.detect_intent(
@@ -178,7 +199,7 @@ class DialogflowClient:
                 "raw_response": response
             }
             
-        except google_exceptions.GoogleAPIError as e:
+        except self._api_error as e:
             logger.error(f"Error de API de Google Dialogflow: {e}")
             # Fallback a detección básica
             return self._fallback_intent_detection(text)
@@ -265,6 +286,8 @@ class DialogflowClient:
 
 # Instancia global del cliente (se inicializa bajo demanda)
 _dialogflow_client: Optional[DialogflowClient] = None
+# Si falta la configuración no se reintenta (ni se repite el aviso) en cada mensaje
+_dialogflow_unconfigured = False
 
 
 def get_dialogflow_client() -> Optional[DialogflowClient]:
@@ -274,15 +297,16 @@ def get_dialogflow_client() -> Optional[DialogflowClient]:
     Returns:
         Instancia de DialogflowClient o None si no se puede inicializar
     """
-    global _dialogflow_client
+    global _dialogflow_client, _dialogflow_unconfigured
     
-    if _dialogflow_client is None:
+    if _dialogflow_client is None and not _dialogflow_unconfigured:
         try:
             _dialogflow_client = DialogflowClient()
             logger.info("Cliente de Dialogflow inicializado correctamente")
         except ValueError as e:
             logger.warning(f"Dialogflow no configurado correctamente: {e}. Usando fallback.")
             _dialogflow_client = None
+            _dialogflow_unconfigured = True
         except Exception as e:
             logger.error(f"Error inicializando Dialogflow: {e}. Usando fallback.")
             _dialogflow_client = None
@@ -310,6 +334,16 @@ def detect_intent(session_id: str, text: str) -> Dict[str, Any]:
     return client.detect_intent(session_id, text)
 
 
+def quick_intent(text: str) -> str:
+    """
+    Intención por palabras clave, sin llamar a Dialogflow.
+
+    Sirve para priorizar una petición antes de admitirla y para responder
+    cuando el servidor está saturado.
+    """
+    return _fallback_intent_detection_static(text)["intent"]
+
+
 def _fallback_intent_detection_static(text: str) -> Dict[str, Any]:
     """
     Detección básica de intención como fallback estático.
@@ -0,0 +1,396 @@
+"""
+Base de datos local de FoodData Central (SQLite + FTS5).
+
+Importa los archivos CSV de descarga masiva del USDA
+(https://fdc.nal.usda.gov/download-datasets) a un archivo SQLite indexado,
+para que search_food y get_food_details funcionen sin red ni cuota de API.
+
+La importación lee los CSV en streaming y escribe por lotes, así que la
+memoria usada no depende del tamaño de la descarga.
+
+Uso:
+    # Importar (desde el directorio backend)
+    poetry run python -m food_api.fdc_local import ~/Descargas/FoodData_Central_csv fdc_local.sqlite3
+
+    # Probar una búsqueda
+    poetry run python -m food_api.fdc_local search fdc_local.sqlite3 "oatmeal"
+
+    # Usarla desde la API
+    FDC_LOCAL_DB=fdc_local.sqlite3 poetry run uvicorn main:app
+"""
+
+import csv
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Archivos del CSV masivo de FDC que se importan
+FOOD_CSV = "food.csv"
+NUTRIENT_CSV = "nutrient.csv"
+FOOD_NUTRIENT_CSV = "food_nutrient.csv"
+BRANDED_FOOD_CSV = "branded_food.csv"  # Opcional (solo Branded Foods)
+
+# Filas por lote al importar (controla la memoria usada)
+IMPORT_BATCH_SIZE = 5000
+
+# Los tipos de datos "genéricos" se ordenan antes que los productos de marca
+DATA_TYPE_RANK = {
+    "foundation_food": 0,
+    "sr_legacy_food": 1,
+    "survey_fndds_food": 2,
+    "branded_food": 3,
+}
+
+SCHEMA = """
+CREATE TABLE food (
+    fdc_id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    data_type TEXT,
+    publication_date TEXT,
+    brand_owner TEXT,
+    ingredients TEXT,
+    type_rank INTEGER
+);
+CREATE TABLE nutrient (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    unit_name TEXT
+);
+CREATE TABLE food_nutrient (
+    fdc_id INTEGER NOT NULL,
+    nutrient_id INTEGER NOT NULL,
+    amount REAL,
+    PRIMARY KEY (fdc_id, nutrient_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE food_fts USING fts5(
+    description,
+    content='food',
+    content_rowid='fdc_id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# ============================================
+# 📥 IMPORTACIÓN
+# ============================================
+
+def _read_csv(path: Path) -> Iterator[Dict[str, str]]:
+    """Lee un CSV fila a fila (sin cargarlo entero en memoria)"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def _to_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert_batches(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple], batch_size: int) -> int:
+    """Inserta filas por lotes y devuelve el total insertado"""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            conn.executemany(sql, batch)
+            total += len(batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def import_fdc_csv(source_dir: str, db_path: str, batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Importa una descarga CSV de FoodData Central a SQLite.
+
+    Escribe en un archivo temporal y lo renombra al terminar, de modo que
+    un proceso que esté leyendo la base anterior nunca ve una a medias.
+
+    Args:
+        source_dir: Carpeta con food.csv, nutrient.csv y food_nutrient.csv
+        db_path: Ruta del archivo SQLite a generar
+        batch_size: Filas por lote de inserción
+
+    Returns:
+        Número de filas importadas por tabla
+    """
+    source = Path(source_dir)
+    for required in (FOOD_CSV, NUTRIENT_CSV, FOOD_NUTRIENT_CSV):
+        if not (source / required).exists():
+            raise FileNotFoundError(f"Falta {required} en {source}")
+
+    tmp_path = Path(f"{db_path}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        counts = {}
+        counts["nutrient"] = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO nutrient (id, name, unit_name) VALUES (?, ?, ?)",
+            (
+                (_to_int(r["id"]), r["name"], r.get("unit_name", ""))
+                for r in _read_csv(source / NUTRIENT_CSV)
+            ),
+            batch_size,
+        )
+
+        counts["food"] = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO food (fdc_id, description, data_type, publication_date, type_rank) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    _to_int(r["fdc_id"]),
+                    r.get("description", ""),
+                    r.get("data_type", ""),
+                    r.get("publication_date", ""),
+                    DATA_TYPE_RANK.get(r.get("data_type", ""), len(DATA_TYPE_RANK)),
+                )
+                for r in _read_csv(source / FOOD_CSV)
+            ),
+            batch_size,
+        )
+
+        if (source / BRANDED_FOOD_CSV).exists():
+            counts["branded_food"] = _insert_batches(
+                conn,
+                "UPDATE food SET brand_owner = ?, ingredients = ? WHERE fdc_id = ?",
+                (
+                    (r.get("brand_owner", ""), r.get("ingredients", ""), _to_int(r["fdc_id"]))
+                    for r in _read_csv(source / BRANDED_FOOD_CSV)
+                ),
+                batch_size,
+            )
+
+        counts["food_nutrient"] = _insert_batches(
+            conn,
+            "INSERT OR REPLACE INTO food_nutrient (fdc_id, nutrient_id, amount) VALUES (?, ?, ?)",
+            (
+                (_to_int(r["fdc_id"]), _to_int(r["nutrient_id"]), _to_float(r.get("amount")))
+                for r in _read_csv(source / FOOD_NUTRIENT_CSV)
+            ),
+            batch_size,
+        )
+
+        # Índice de texto completo sobre las descripciones
+        conn.execute("INSERT INTO food_fts (food_fts) VALUES ('rebuild')")
+        conn.execute(
+            "INSERT INTO metadata (key, value) VALUES ('imported_at', ?), ('source', ?)",
+            (time.strftime("%Y-%m-%dT%H:%M:%S"), str(source.resolve())),
+        )
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return counts
+
+
+# ============================================
+# 🔍 CONSULTAS
+# ============================================
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(text: str, match_all: bool) -> Optional[str]:
+    """Convierte texto libre en una consulta FTS5 segura (prefijos entre comillas)"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    joiner = " " if match_all else " OR "
+    return joiner.join(f'"{token}"*' for token in tokens)
+
+
+class LocalFoodData:
+    """
+    Consultas de solo lectura sobre la base SQLite de FDC.
+
+    Cada hilo usa su propia conexión (sqlite3 no comparte conexiones entre hilos).
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _nutrients(self, fdc_id: int) -> List[sqlite3.Row]:
+        return self._conn().execute(
+            "SELECT n.id, n.name, n.unit_name, fn.amount "
+            "FROM food_nutrient fn JOIN nutrient n ON n.id = fn.nutrient_id "
+            "WHERE fn.fdc_id = ?",
+            (fdc_id,),
+        ).fetchall()
+
+    def search(self, food_name: str, max_results: int = 2) -> List[Dict[str, Any]]:
+        """
+        Busca alimentos por nombre (mismo formato que search_food).
+
+        Primero exige todas las palabras; si no hay resultados, acepta cualquiera.
+        """
+        rows = []
+        for match_all in (True, False):
+            query = _fts_query(food_name, match_all)
+            if query is None:
+                return []
+            rows = self._conn().execute(
+                "SELECT f.fdc_id, f.description FROM food_fts "
+                "JOIN food f ON f.fdc_id = food_fts.rowid "
+                "WHERE food_fts MATCH ? "
+                "ORDER BY f.type_rank, bm25(food_fts) LIMIT ?",
+                (query, max_results),
+            ).fetchall()
+            if rows:
+                break
+
+        results = []
+        for row in rows:
+            nutrientes = {}
+            for n in self._nutrients(row["fdc_id"]):
+                if n["name"] and n["amount"] is not None:
+                    nutrientes[n["name"]] = f"{n['amount']:g} {n['unit_name']}"
+            results.append({
+                "nombre": row["description"],
+                "fdcId": row["fdc_id"],
+                "nutrientes": nutrientes,
+            })
+        return results
+
+    def iter_foods(self) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre todos los alimentos con sus nutrientes (mismo formato que search_food).
+
+        Usa una sola consulta ordenada por fdc_id, así que no carga la base en memoria.
+        """
+        rows = self._conn().execute(
+            "SELECT f.fdc_id, f.description, n.name, n.unit_name, fn.amount "
+            "FROM food f "
+            "LEFT JOIN food_nutrient fn ON fn.fdc_id = f.fdc_id "
+            "LEFT JOIN nutrient n ON n.id = fn.nutrient_id "
+            "ORDER BY f.fdc_id"
+        )
+        for fdc_id, group in itertools.groupby(rows, key=lambda row: row["fdc_id"]):
+            nutrientes = {}
+            description = None
+            for row in group:
+                description = row["description"]
+                if row["name"] and row["amount"] is not None:
+                    nutrientes[row["name"]] = f"{row['amount']:g} {row['unit_name']}"
+            yield {"nombre": description, "fdcId": fdc_id, "nutrientes": nutrientes}
+
+    def get_raw(self, fdc_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el registro de un alimento con la misma forma que el
+        endpoint /food/{fdc_id} de la API (incluye foodNutrients).
+        """
+        row = self._conn().execute(
+            "SELECT fdc_id, description, data_type, publication_date, brand_owner, ingredients "
+            "FROM food WHERE fdc_id = ?",
+            (fdc_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "fdcId": row["fdc_id"],
+            "description": row["description"],
+            "dataType": row["data_type"] or "",
+            "publicationDate": row["publication_date"] or "",
+            "brandOwner": row["brand_owner"] or "",
+            "ingredients": row["ingredients"] or "",
+            "foodNutrients": [
+                {
+                    "nutrient": {"id": n["id"], "name": n["name"], "unitName": n["unit_name"]},
+                    "amount": n["amount"],
+                }
+                for n in self._nutrients(fdc_id)
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño de la base local"""
+        conn = self._conn()
+        meta = dict(conn.execute("SELECT key, value FROM metadata").fetchall())
+        return {
+            "db_path": self.db_path,
+            "foods": conn.execute("SELECT COUNT(*) FROM food").fetchone()[0],
+            "nutrients": conn.execute("SELECT COUNT(*) FROM nutrient").fetchone()[0],
+            **meta,
+        }
+
+
+def open_local_db(db_path: Optional[str]) -> Optional[LocalFoodData]:
+    """Abre la base local si la ruta está configurada y el archivo existe"""
+    if db_path and Path(db_path).exists():
+        return LocalFoodData(db_path)
+    return None
+
+
+# ============================================
+# 🚀 MAIN
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Base local de FoodData Central")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Importar CSV masivo de FDC")
+    import_parser.add_argument("source_dir", help="Carpeta con los CSV de FDC")
+    import_parser.add_argument("db_path", help="Archivo SQLite de salida")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    search_parser = subparsers.add_parser("search", help="Buscar en la base local")
+    search_parser.add_argument("db_path")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--max-results", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        start = time.perf_counter()
+        counts = import_fdc_csv(args.source_dir, args.db_path, batch_size=args.batch_size)
+        print(f"✅ Importado en {time.perf_counter() - start:.1f}s: {counts}")
+    else:
+        db = LocalFoodData(args.db_path)
+        start = time.perf_counter()
+        results = db.search(args.query, max_results=args.max_results)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for item in results:
+            print(f"  {item['fdcId']:>8}  {item['nombre']}  ({len(item['nutrientes'])} nutrientes)")
+        print(f"⏱️  {elapsed_ms:.2f} ms")
+        sys.exit(0 if results else 1)
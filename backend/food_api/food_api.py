@@ -1,24 +1,117 @@
 import os
-import requests
-from dotenv import load_dotenv
+import threading
+import time
+from typing import List
+from startup import load_environment
+from food_api.cache import TTLCache
+from food_api.singleflight import SingleFlight
+from food_api.fdc_local import open_local_db
+from metrics import FDC_REQUEST_SECONDS
+from ratelimit import RateLimited, check_upstream, check_upstream_user
+from tracing import KIND_CLIENT, span
 
-load_dotenv()
+load_environment()
 API_KEY = os.getenv("API_KEY")
 
-BASE_URL_SEARCH = "https://api.nal.usda.gov/fdc/v1/foods/search"
-BASE_URL_FOOD = "https://api.nal.usda.gov/fdc/v1/food"
+# FDC_BASE_URL permite apuntar a un servidor de pruebas (ver benchmarks/load_test.py)
+BASE_URL = os.getenv("FDC_BASE_URL", "https://api.nal.usda.gov/fdc/v1").rstrip("/")
+BASE_URL_SEARCH = f"{BASE_URL}/foods/search"
+BASE_URL_FOOD = f"{BASE_URL}/food"
+BASE_URL_FOODS = f"{BASE_URL}/foods"
+
+# El endpoint multi-alimento de FDC acepta hasta 20 ids por llamada
+MAX_IDS_PER_REQUEST = 20
+
+# Sesión HTTP compartida (reutiliza conexiones TLS con api.nal.usda.gov).
+# requests se importa al crearla: con la base local no hace falta nunca.
+_session = None
+_session_lock = threading.Lock()
+
+# Cache de detalles por fdc_id: (detalles parseados, foodNutrients original)
+_detail_cache = TTLCache(
+    max_size=int(os.getenv("FDC_DETAIL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("FDC_DETAIL_CACHE_TTL", "86400")),
+)
+
+# Base local de FDC importada desde la descarga masiva (ver fdc_local.py).
+# Si FDC_LOCAL_ONLY=1 nunca se llama a la API aunque no encuentre el alimento.
+_local_db = open_local_db(os.getenv("FDC_LOCAL_DB"))
+FDC_LOCAL_ONLY = os.getenv("FDC_LOCAL_ONLY", "0") == "1"
+
+# Agrupación de llamadas concurrentes idénticas a FDC
+_search_flight = SingleFlight("search_food")
+_detail_flight = SingleFlight("get_food_details")
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+
+                _session = requests.Session()
+    return _session
+
+
+def prime_connections(timeout: float = 5.0) -> bool:
+    """
+    Abre por adelantado la conexión TLS con FoodData Central (calentamiento).
+
+    No hace nada si solo se usa la base local o no hay API_KEY.
+    """
+    if FDC_LOCAL_ONLY or not API_KEY:
+        return False
+    _get_session().head(BASE_URL_FOODS, params={"api_key": API_KEY}, timeout=timeout)
+    return True
+
+
+def _fdc_get(endpoint: str, url: str, params: dict, timeout: float):
+    """
+    GET a FoodData Central registrando la latencia por endpoint.
+
+    Cada llamada real consume la cuota de la API key (ver ratelimit.py); si
+    se agotó lanza RateLimited sin tocar la red. La cuota del usuario la
+    cobra quien llama, antes de unirse al single-flight.
+    """
+    check_upstream("fdc")
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"fdc.{endpoint}", kind=KIND_CLIENT, **{"http.url": url}) as current:
+            response = _get_session().get(url, params=params, timeout=timeout)
+            current.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+        outcome = "ok"
+        return response
+    finally:
+        FDC_REQUEST_SECONDS.labels(endpoint=endpoint, outcome=outcome).observe(time.perf_counter() - start)
 
 
 def search_food(food_name: str, max_results: int = 2):
     """
     Busca alimentos por nombre en la API USDA FoodData Central.
     Devuelve los nutrientes principales (Energy, Protein, Fat, Carbs, etc.)
+
+    Usa la base local si existe; si no encuentra nada, las búsquedas
+    idénticas concurrentes comparten una sola llamada a la API.
     """
+    if _local_db is not None:
+        with span("fdc_local.search"):
+            results = _local_db.search(food_name, max_results=max_results)
+        if results or FDC_LOCAL_ONLY:
+            return results
+
+    check_upstream_user("fdc")
+    return _search_flight.do((food_name, max_results), _search_food, food_name, max_results)
+
+
+def _search_food(food_name: str, max_results: int):
+    """Llamada real al endpoint de búsqueda de FDC"""
     params = {"query": food_name, "pageSize": max_results, "api_key": API_KEY}
 
     try:
-        response = requests.get(BASE_URL_SEARCH, params=params, timeout=10)
-        response.raise_for_status()
+        response = _fdc_get("search", BASE_URL_SEARCH, params, timeout=10)
         data = response.json()
 
         foods = data.get("foods", [])
@@ -43,52 +136,111 @@ def search_food(food_name: str, max_results: int = 2):
 
         return results
 
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"[ERROR] FoodData API: {e}")
         return [{"nombre": "Error fetching data", "nutrientes": {}}]
 
 
-def get_food_details(fdc_id: int):
+def _parse_food_details(data: dict) -> dict:
+    """Convierte un registro completo de FDC al formato que usa el frontend"""
+    # Extraer información nutricional completa
+    # La estructura de foodNutrients es: { "nutrient": { "name": "...", "unitName": "..." }, "amount": ... }
+    nutrientes = {}
+    for n in data.get("foodNutrients", []):
+        nutrient_info = n.get("nutrient", {})
+        name = nutrient_info.get("name")
+        amount = n.get("amount")
+        unit = nutrient_info.get("unitName", "")
+        
+        # Solo agregar si tiene nombre y cantidad válida
+        if name and amount is not None:
+            nutrientes[name] = {
+                "amount": float(amount) if amount else 0.0,
+                "unit": unit or "",
+                "value": f"{amount} {unit}".strip() if unit else str(amount)
+            }
+
+    return {
+        "fdcId": data.get("fdcId"),
+        "description": data.get("description", ""),
+        "dataType": data.get("dataType", ""),
+        "publicationDate": data.get("publicationDate", ""),
+        "brandOwner": data.get("brandOwner", ""),
+        "ingredients": data.get("ingredients", ""),
+        "nutrientes": nutrientes,
+    }
+
+
+def _cache_food_details(data: dict) -> dict:
+    """Parsea un registro de FDC y lo guarda en el cache de detalles"""
+    details = _parse_food_details(data)
+    _detail_cache.set(details["fdcId"], (details, data.get("foodNutrients", [])))
+    return details
+
+
+def _from_cache_entry(entry: tuple, include_raw: bool) -> dict:
+    """Construye la respuesta a partir de una entrada del cache"""
+    details, raw_nutrients = entry
+    result = dict(details)
+    if include_raw:
+        result["foodNutrients"] = raw_nutrients
+    return result
+
+
+def get_food_details(fdc_id: int, include_raw: bool = False):
     """
     Obtiene detalles completos de un alimento por su FDC ID.
     Devuelve información nutricional completa y detallada.
+
+    Args:
+        fdc_id: ID del alimento en FoodData Central
+        include_raw: Si es True, incluye la lista original `foodNutrients`
+    """
+    cached = _detail_cache.get(fdc_id)
+    if cached is not None:
+        return _from_cache_entry(cached, include_raw)
+
+    if _local_db is not None:
+        data = _local_db.get_raw(fdc_id)
+        if data is not None:
+            return _from_cache_entry((_cache_food_details(data), data.get("foodNutrients", [])), include_raw)
+        if FDC_LOCAL_ONLY:
+            return {
+                "fdcId": fdc_id,
+                "description": "Error fetching data",
+                "nutrientes": {},
+                "error": "Food not found in local FDC database"
+            }
+
+    # Las aperturas concurrentes del mismo alimento comparten una sola llamada
+    check_upstream_user("fdc")
+    entry = _detail_flight.do(fdc_id, _fetch_food_details, fdc_id)
+    if isinstance(entry, dict):
+        return dict(entry)
+    return _from_cache_entry(entry, include_raw)
+
+
+def _fetch_food_details(fdc_id: int):
+    """
+    Llamada real al endpoint de detalle de FDC.
+
+    Returns:
+        Tupla (detalles, foodNutrients) o diccionario de error
     """
     url = f"{BASE_URL_FOOD}/{fdc_id}"
     params = {"api_key": API_KEY}
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
+        response = _fdc_get("food", url, params, timeout=10)
         data = response.json()
 
-        # Extraer información nutricional completa
-        # La estructura de foodNutrients es: { "nutrient": { "name": "...", "unitName": "..." }, "amount": ... }
-        nutrientes = {}
-        for n in data.get("foodNutrients", []):
-            nutrient_info = n.get("nutrient", {})
-            name = nutrient_info.get("name")
-            amount = n.get("amount")
-            unit = nutrient_info.get("unitName", "")
-            
-            # Solo agregar si tiene nombre y cantidad válida
-            if name and amount is not None:
-                nutrientes[name] = {
-                    "amount": float(amount) if amount else 0.0,
-                    "unit": unit or "",
-                    "value": f"{amount} {unit}".strip() if unit else str(amount)
-                }
-
-        return {
-            "fdcId": data.get("fdcId"),
-            "description": data.get("description", ""),
-            "dataType": data.get("dataType", ""),
-            "publicationDate": data.get("publicationDate", ""),
-            "brandOwner": data.get("brandOwner", ""),
-            "ingredients": data.get("ingredients", ""),
-            "nutrientes": nutrientes,
-            "foodNutrients": data.get("foodNutrients", []),
-        }
+        details = _cache_food_details(data)
+        return (details, data.get("foodNutrients", []))
 
+    except RateLimited:
+        raise
     except Exception as e:
         print(f"[ERROR] FoodData API (get_food_details): {e}")
         return {
@@ -97,3 +249,88 @@ def get_food_details(fdc_id: int):
             "nutrientes": {},
             "error": str(e)
         }
+
+
+def get_foods_details(fdc_ids: List[int], include_raw: bool = False) -> List[dict]:
+    """
+    Obtiene los detalles de varios alimentos a la vez.
+
+    Los que ya están en cache se sirven directamente; el resto se piden
+    con el endpoint multi-alimento de FDC (una llamada por cada
+    MAX_IDS_PER_REQUEST ids).
+
+    Args:
+        fdc_ids: Lista de IDs de FoodData Central
+        include_raw: Si es True, incluye la lista original `foodNutrients`
+
+    Returns:
+        Lista de detalles en el mismo orden que fdc_ids
+    """
+    found = {}
+    missing = []
+    for fdc_id in dict.fromkeys(fdc_ids):
+        cached = _detail_cache.get(fdc_id)
+        if cached is not None:
+            found[fdc_id] = cached
+            continue
+
+        data = _local_db.get_raw(fdc_id) if _local_db is not None else None
+        if data is not None:
+            found[fdc_id] = (_cache_food_details(data), data.get("foodNutrients", []))
+        elif not FDC_LOCAL_ONLY:
+            missing.append(fdc_id)
+
+    errors = {}
+    for i in range(0, len(missing), MAX_IDS_PER_REQUEST):
+        chunk = missing[i:i + MAX_IDS_PER_REQUEST]
+        params = {
+            "fdcIds": ",".join(str(fdc_id) for fdc_id in chunk),
+            "api_key": API_KEY,
+        }
+
+        try:
+            check_upstream_user("fdc")
+            response = _fdc_get("foods", BASE_URL_FOODS, params, timeout=15)
+
+            for data in response.json():
+                details = _cache_food_details(data)
+                found[details["fdcId"]] = (details, data.get("foodNutrients", []))
+        except RateLimited:
+            raise
+        except Exception as e:
+            print(f"[ERROR] FoodData API (get_foods_details): {e}")
+            for fdc_id in chunk:
+                errors[fdc_id] = str(e)
+
+    results = []
+    for fdc_id in fdc_ids:
+        if fdc_id in found:
+            results.append(_from_cache_entry(found[fdc_id], include_raw))
+        else:
+            results.append({
+                "fdcId": fdc_id,
+                "description": "Error fetching data",
+                "nutrientes": {},
+                "error": errors.get(fdc_id, "Food not found"),
+            })
+    return results
+
+
+def detail_cache_stats() -> dict:
+    """Estadísticas del cache de detalles (para endpoints de administración)"""
+    return _detail_cache.stats()
+
+
+def local_db_stats() -> dict:
+    """Estado de la base local de FDC (si está configurada)"""
+    if _local_db is None:
+        return {"enabled": False}
+    return {"enabled": True, "local_only": FDC_LOCAL_ONLY, **_local_db.stats()}
+
+
+def singleflight_stats() -> dict:
+    """Llamadas a FDC ejecutadas y agrupadas por single-flight"""
+    return {
+        "search_food": _search_flight.stats(),
+        "get_food_details": _detail_flight.stats(),
+    }
@@ -0,0 +1,83 @@
+"""
+Agrupación de llamadas concurrentes idénticas ("single-flight").
+
+Si varias peticiones piden lo mismo a la vez (por ejemplo la misma
+búsqueda en FoodData Central), solo la primera hace la llamada real y
+las demás esperan y reciben el mismo resultado.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """Llamada en curso compartida por todos los que esperan la misma clave"""
+
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Ejecuta como máximo una llamada en curso por clave.
+
+    El resultado se comparte entre todos los llamadores, así que no debe
+    modificarse in situ.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecuta fn(*args, **kwargs) o espera a la llamada en curso con la misma clave.
+
+        Si la llamada falla, la excepción se propaga a todos los que esperaban.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de llamadas ejecutadas y agrupadas"""
+        total = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+            "coalesced_ratio": (self.coalesced / total) if total else 0.0,
+        }
@@ -0,0 +1,266 @@
+"""
+🕘 history.py
+Historial de recomendaciones servidas a cada usuario (write-behind).
+
+- Cada usuario tiene en memoria una ventana con sus últimas comidas
+  servidas (deque acotado); el recomendador la usa para no repetir siempre
+  lo mismo.
+- Registrar una recomendación solo toca la ventana y encola el evento: un
+  hilo en segundo plano escribe los eventos por lotes en un log JSON Lines
+  (solo se agrega al final), así que la petición no espera al disco.
+- Cada cierto número de eventos el log se compacta: se reescribe (de forma
+  atómica) con una línea por usuario que contiene solo su ventana.
+- La memoria está acotada: ventana de HISTORY_WINDOW comidas por usuario y
+  como mucho HISTORY_MAX_USERS usuarios activos (se olvida el menos reciente).
+
+Con un STATE_BACKEND compartido (varios workers) las ventanas viven en el
+backend en vez de en memoria, así todos los workers evitan repetir las
+mismas comidas; el log se sigue escribiendo y la compactación toma un
+lock de archivo para no pisar lo que agregan los otros workers.
+
+Configuración: HISTORY_LOG, HISTORY_WINDOW, HISTORY_MAX_USERS.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from catalog import atomic_write
+from state import Namespace, get_state_backend
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LOG = os.getenv("HISTORY_LOG", str(Path(__file__).parent / "historial.jsonl"))
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "12"))
+HISTORY_MAX_USERS = int(os.getenv("HISTORY_MAX_USERS", "100000"))
+
+# Escritura por lotes
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 512
+# Eventos pendientes como máximo; si se llena se descartan (no se bloquea la petición)
+QUEUE_MAX_SIZE = 10000
+# Compactar tras escribir tantos eventos
+COMPACT_EVERY = 50000
+
+
+class HistoryLog:
+    """
+    Ventanas de comidas recientes por usuario con log write-behind.
+
+    Args:
+        path: Archivo JSON Lines del log
+        window: Comidas recientes que se recuerdan por usuario
+        max_users: Usuarios con ventana en memoria
+        compact_every: Eventos escritos entre compactaciones
+        store: Ventanas compartidas entre workers (None = en memoria)
+    """
+
+    def __init__(
+        self,
+        path: str = HISTORY_LOG,
+        window: int = HISTORY_WINDOW,
+        max_users: int = HISTORY_MAX_USERS,
+        compact_every: int = COMPACT_EVERY,
+        store: Optional[Namespace] = None,
+    ):
+        self.path = Path(path)
+        self.window = window
+        self.max_users = max_users
+        self.compact_every = compact_every
+        self._store = store
+        self._windows: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        self._since_compaction = 0
+        self.written = 0
+        self.dropped = 0
+        self.compactions = 0
+
+        # Las ventanas compartidas ya persisten en el backend: releer el log
+        # desde cada worker solo duplicaría comidas
+        if store is None:
+            for user_id, comidas in self._read_log():
+                self._remember(user_id, comidas)
+
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------
+    # Ventanas en memoria
+    # ------------------------------------------
+
+    def _remember(self, user_id: str, comidas: Iterable[str]):
+        if self._store is not None:
+            # Leer-modificar-escribir: si dos workers registran a la vez para el
+            # mismo usuario puede perderse una comida de la ventana (aceptable)
+            previous = self._store.get(user_id) or []
+            self._store.set(user_id, (list(reversed(list(comidas))) + previous)[:self.window])
+            return
+        with self._lock:
+            recent = self._windows.get(user_id)
+            if recent is None:
+                recent = self._windows[user_id] = deque(maxlen=self.window)
+                while len(self._windows) > self.max_users:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(user_id)
+            recent.extend(comidas)
+
+    def recent(self, user_id: str) -> Tuple[str, ...]:
+        """Comidas servidas recientemente al usuario, de la más nueva a la más vieja"""
+        if self._store is not None:
+            return tuple(self._store.get(user_id) or ())
+        with self._lock:
+            recent = self._windows.get(user_id)
+            return tuple(reversed(recent)) if recent else ()
+
+    def record(self, user_id: str, comidas: List[str]):
+        """Registra las comidas servidas (no espera a que se escriban)"""
+        if not comidas:
+            return
+        self._remember(user_id, comidas)
+        try:
+            self._queue.put_nowait({"ts": round(time.time(), 3), "user_id": user_id, "comidas": comidas})
+        except queue.Full:
+            self.dropped += 1
+
+    # ------------------------------------------
+    # Log en disco (solo lo toca el hilo escritor)
+    # ------------------------------------------
+
+    def _read_log(self) -> Iterable[Tuple[str, List[str]]]:
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea cortada por una caída del proceso
+                    continue
+                yield event["user_id"], event["comidas"]
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            batch = [event]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            # Juntar lo que llegue durante el intervalo (o hasta llenar el lote)
+            while event is not None and len(batch) < BATCH_SIZE:
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(event)
+
+            events = [e for e in batch if e is not None]
+            try:
+                if events:
+                    self._append(events)
+                if self._since_compaction >= self.compact_every:
+                    self.compact()
+            except OSError as e:
+                logger.error(f"No se pudo escribir el historial en {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(events) < len(batch):
+                return
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Lock entre workers: compartido para agregar, exclusivo para compactar"""
+        if self._store is None or fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _append(self, events: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events)
+        with self._file_lock(exclusive=False), open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        self.written += len(events)
+        self._since_compaction += len(events)
+
+    def compact(self):
+        """Reescribe el log con una línea por usuario con su ventana reciente"""
+        with self._file_lock(exclusive=True):
+            self._compact()
+        self._since_compaction = 0
+        self.compactions += 1
+
+    def _compact(self):
+        windows: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        for user_id, comidas in self._read_log():
+            recent = windows.pop(user_id, None) or deque(maxlen=self.window)
+            recent.extend(comidas)
+            # Al final quedan los usuarios más recientes
+            windows[user_id] = recent
+            if len(windows) > self.max_users:
+                windows.popitem(last=False)
+
+        now = round(time.time(), 3)
+        with atomic_write(self.path) as f:
+            for user_id, recent in windows.items():
+                f.write(json.dumps({"ts": now, "user_id": user_id, "comidas": list(recent)},
+                                   ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def flush(self):
+        """Espera a que todos los eventos encolados estén escritos"""
+        self._queue.join()
+
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo escritor"""
+        self._queue.put(None)
+        self._writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "users": len(self._windows),
+            "shared": self._store is not None,
+            "window": self.window,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "compactions": self.compactions,
+        }
+
+
+# Instancia global (se crea bajo demanda)
+_history_log: Optional[HistoryLog] = None
+
+
+def get_history_log() -> HistoryLog:
+    """Obtiene o crea el historial compartido por los endpoints"""
+    global _history_log
+    if _history_log is None:
+        backend = get_state_backend()
+        _history_log = HistoryLog(store=backend.namespace("history") if backend.shared else None)
+    return _history_log
+
+
+def close_history_log():
+    """Escribe lo pendiente y detiene el hilo escritor (al apagar la API)"""
+    global _history_log
+    if _history_log is not None:
+        _history_log.close()
+        _history_log = None
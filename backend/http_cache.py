@@ -0,0 +1,167 @@
+"""
+Cache de respuestas HTTP para endpoints de solo lectura.
+
+Guarda el cuerpo ya serializado (y sus variantes comprimidas) por clave
+de ruta + parámetros + versión de los datos, y añade los encabezados
+ETag / Cache-Control. Las peticiones condicionales (If-None-Match) se
+responden con 304 sin volver a calcular ni a enviar el cuerpo.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from food_api.cache import TTLCache
+from serialization import dumps
+
+try:
+    import brotli  # Si falta: solo gzip
+except ImportError:
+    brotli = None
+
+# Tamaño mínimo (bytes) a partir del cual se comprime el cuerpo
+COMPRESS_MIN_SIZE = int(os.getenv("HTTP_COMPRESS_MIN_SIZE", "1024"))
+
+
+@dataclass
+class CachedBody:
+    """Cuerpo serializado junto con su ETag y las variantes comprimidas"""
+    etag: str
+    body: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get_encoded(self, encoding: str) -> bytes:
+        """Devuelve el cuerpo comprimido, calculándolo solo la primera vez"""
+        with self.lock:
+            data = self.encoded.get(encoding)
+            if data is None:
+                if encoding == "br":
+                    data = brotli.compress(self.body, quality=5)
+                else:
+                    data = gzip.compress(self.body, compresslevel=6)
+                self.encoded[encoding] = data
+            return data
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Elige la mejor codificación aceptada por el cliente"""
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara If-None-Match con el ETag (comparación débil, RFC 7232)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def _is_cacheable(content: Any) -> bool:
+    """Las respuestas de error no se guardan en cache"""
+    return not (isinstance(content, dict) and "error" in content)
+
+
+class ResponseCache:
+    """Cache de respuestas JSON con ETag, 304 y compresión"""
+
+    def __init__(self, max_size: int = 2048, ttl: float = 300.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.not_modified = 0
+
+    def _build(self, content: Any) -> CachedBody:
+        body = dumps(content)
+        etag = 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        return CachedBody(etag=etag, body=body)
+
+    def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        producer: Callable[[], Any],
+        cache_control: str = "no-cache",
+        ttl: Optional[float] = None,
+        cacheable: Callable[[Any], bool] = _is_cacheable,
+    ) -> Response:
+        """
+        Devuelve la respuesta cacheada para `key` o la genera con `producer`.
+
+        Args:
+            request: Petición actual (para If-None-Match y Accept-Encoding)
+            key: Clave que identifica la ruta, parámetros y versión de los datos
+            producer: Función que calcula el contenido si no está en cache
+            cache_control: Valor del encabezado Cache-Control
+            ttl: Segundos que la entrada vive en el cache del servidor
+            cacheable: Decide si el contenido se guarda (por defecto, todo
+                lo que no sea un dict de error)
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            content = producer()
+            entry = self._build(content)
+            if cacheable(content):
+                self._cache.set(key, entry, ttl=ttl)
+            else:
+                cache_control = "no-store"
+
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        body = entry.body
+        if len(body) >= COMPRESS_MIN_SIZE:
+            encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+            if encoding:
+                body = entry.get_encoded(encoding)
+                headers["Content-Encoding"] = encoding
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def prime(
+        self,
+        key: Hashable,
+        content: Any,
+        ttl: Optional[float] = None,
+        cacheable: Callable[[Any], bool] = _is_cacheable,
+    ) -> bool:
+        """
+        Guarda por adelantado la respuesta de `key` (p. ej. calculada en
+        segundo plano) para que la próxima petición la sirva sin calcular.
+
+        Returns:
+            False si el contenido no es cacheable y no se guardó
+        """
+        if not cacheable(content):
+            return False
+        self._cache.set(key, self._build(content), ttl=ttl)
+        return True
+
+    def clear(self):
+        """Vacía el cache (por ejemplo tras recargar el catálogo)"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del cache de respuestas"""
+        stats = self._cache.stats()
+        stats["not_modified"] = self.not_modified
+        stats["brotli_available"] = brotli is not None
+        return stats
@@ -1,14 +1,62 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-from food_api.food_api import search_food, get_food_details
-from prolog.prolog_engine import PrologEngine
-from dialogflow_integration import detect_intent, get_dialogflow_client
-from dotenv import load_dotenv
-import logging
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+from contextlib import asynccontextmanager
+import startup
+
+# Cargar variables de entorno desde .env antes de importar los módulos que
+# leen su configuración con os.getenv
+startup.load_environment()
 
-# Cargar variables de entorno desde .env
-load_dotenv()
+from food_api.food_api import (
+    search_food,
+    get_food_details,
+    get_foods_details,
+    detail_cache_stats,
+    local_db_stats,
+    singleflight_stats,
+)
+from dialogflow_integration import detect_intent, get_dialogflow_client, quick_intent
+from catalog import (
+    CACHE_FILE,
+    DYNAMIC_FILE,
+    LEGACY_CACHE_FILE,
+    STATIC_FILE,
+    catalog_version,
+    catalog_version_scope,
+    read_catalog_manifest,
+)
+from http_cache import ResponseCache
+from recommender import (
+    QUICK_TIME_LIMIT,
+    RecommendationResult,
+    UserContext,
+    get_prolog_engine,
+    get_recommender,
+    get_sensor_context,
+    time_bucket,
+)
+from admission import PRIORITY_ADMIN, PRIORITY_CHEAP, PRIORITY_RECOMMENDATION, Overloaded, get_admission_controller
+from history import close_history_log, get_history_log
+from meal_plan import MealTarget, get_meal_planner
+from precompute import PRECOMPUTE_ENABLED, Precomputer, Subscribers
+import metrics
+import profiler
+import ratelimit
+import tracing
+from metrics import CHAT_SECONDS, DIALOGFLOW_SECONDS, ENRICHMENT_SECONDS, SENSOR_READINGS
+from search_index import get_search_index
+from state import get_state_backend
+from users import allergy_names, get_user_store
+from serialization import FastJSONResponse, SplicedJSONResponse, RawJSON, dumps, dumps_spliced
+from food_api.cache import TTLCache
+import asyncio
+import dataclasses
+import logging
+import os
+import re
+import time
 
 # Configuración básica de logging para que se vean los logs en consola
 logging.basicConfig(
@@ -18,8 +66,134 @@ logging.basicConfig(
 
 logger = logging.getLogger("food_recommendation")
 
-app = FastAPI(title="Food Recommendation API")
-sensors_data = {}
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Calienta el proceso al arrancar y vacía los buffers al apagar.
+
+    El calentamiento corre en un hilo: /health responde desde el primer
+    momento y /ready solo cuando el motor Prolog, el catálogo, los índices y
+    las conexiones ya están listos.
+    """
+    warm_up = asyncio.create_task(asyncio.to_thread(startup.warm_up))
+    yield
+    if not warm_up.done():
+        logger.warning("Apagando antes de terminar el calentamiento")
+    precomputer.close()
+    close_history_log()
+    tracing.shutdown()
+
+
+app = FastAPI(title="Food Recommendation API", default_response_class=FastJSONResponse, lifespan=lifespan)
+
+# Última lectura de sensores por usuario. Vive en el STATE_BACKEND para que
+# con varios workers el /api/chat la vea aunque /sensors llegara a otro.
+SENSOR_DATA_TTL = float(os.getenv("SENSOR_DATA_TTL", "0")) or None
+sensors_data = get_state_backend().namespace("sensors", ttl=SENSOR_DATA_TTL)
+
+# Cache de respuestas para endpoints de solo lectura (ETag / 304 / gzip)
+response_cache = ResponseCache()
+RECOMMEND_CACHE_TTL = 300
+RECOMMEND_FOOD_LIMIT = 5
+
+# Recomendaciones enriquecidas por comida: (registro, registro serializado)
+enrichment_cache = TTLCache(max_size=512, ttl=3600)
+FOOD_DETAIL_CACHE_TTL = 3600
+
+
+# Endpoints con user_id en la ruta o en el cuerpo JSON (para la limitación de tasa)
+USER_PATH_RE = re.compile(r"^/(?:users|recommend_food|recommend_personalized|meal_plan)/([^/]+)")
+USER_BODY_PATHS = {"/sensors", "/api/chat", "/api/chat/stream"}
+USER_BODY_RE = re.compile(rb'"user_id"\s*:\s*"([^"\\]{1,128})"')
+# Sondas y métricas: nunca se limitan
+RATE_LIMIT_EXEMPT = {"/health", "/ready", "/metrics"}
+
+
+async def request_user_id(request: Request) -> Optional[str]:
+    """user_id de la petición sin parsear el cuerpo completo (None si no tiene)"""
+    path = request.url.path
+    match = USER_PATH_RE.match(path)
+    if match:
+        return match.group(1)
+    if request.method == "POST" and path in USER_BODY_PATHS:
+        # Starlette guarda el cuerpo: el endpoint lo vuelve a leer sin costo
+        match = USER_BODY_RE.search(await request.body())
+        if match:
+            return match.group(1).decode("utf-8", "replace")
+    return None
+
+
+def too_many_requests(error: ratelimit.RateLimited) -> FastJSONResponse:
+    return FastJSONResponse(
+        content={"error": "Too many requests", "limiter": error.limiter, "retry_after": round(error.retry_after, 2)},
+        status_code=429,
+        headers={"Retry-After": error.retry_after_header},
+    )
+
+
+@app.exception_handler(ratelimit.RateLimited)
+async def rate_limited_handler(request: Request, error: ratelimit.RateLimited):
+    """Cuota de un servicio externo agotada durante la petición"""
+    return too_many_requests(error)
+
+
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    """
+    Token bucket por usuario (o IP) delante de cada petición; responde 429
+    con Retry-After sin llegar al endpoint. El usuario queda en contexto
+    para cobrarle también las llamadas a FoodData Central.
+    """
+    path = request.url.path
+    if not ratelimit.RATE_LIMIT_ENABLED or path in RATE_LIMIT_EXEMPT:
+        return await call_next(request)
+
+    user_id = await request_user_id(request)
+    key = f"user:{user_id}" if user_id else f"ip:{request.client.host if request.client else ''}"
+    limiter = ratelimit.get_limiter("sensors" if path == "/sensors" else "api")
+    retry_after = limiter.acquire(key)
+    if retry_after:
+        return too_many_requests(ratelimit.RateLimited(limiter.name, retry_after))
+
+    token = ratelimit.current_user.set(user_id)
+    try:
+        return await call_next(request)
+    finally:
+        ratelimit.current_user.reset(token)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Abre el span raíz de cada petición y devuelve su id en X-Trace-Id.
+
+    Si el cliente manda un `traceparent` (W3C) la petición continúa esa
+    traza y respeta su decisión de muestreo.
+    """
+    remote = tracing.parse_traceparent(request.headers.get(tracing.TRACEPARENT_HEADER))
+    with tracing.span(
+        f"{request.method} {request.url.path}",
+        kind=tracing.KIND_SERVER,
+        parent=remote,
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as root:
+        response = await call_next(request)
+        # Nombre por plantilla de ruta (/users/{user_id}) para agrupar trazas
+        route = request.scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            root.name = f"{request.method} {route.path}"
+            root.set_attribute("http.route", route.path)
+        root.set_attribute("http.status_code", response.status_code)
+        response.headers[tracing.TRACE_ID_HEADER] = root.trace_id
+        response.headers[tracing.TRACEPARENT_HEADER] = root.traceparent
+        return response
+
+
+@app.middleware("http")
+async def catalog_version_per_request(request: Request, call_next):
+    """La versión del catálogo se calcula una sola vez por petición"""
+    with catalog_version_scope():
+        return await call_next(request)
 
 
 # ============================================
@@ -60,11 +234,15 @@ def get_dialogflow_intent(user_id: str, message: str) -> Dict[str, Any]:
         - entities: Entidades extraídas
         - parameters: Parámetros de la intención
     """
+    start = time.perf_counter()
     try:
-        result = detect_intent(session_id=user_id, text=message)
+        with tracing.span("dialogflow.detect_intent", kind=tracing.KIND_CLIENT):
+            result = detect_intent(session_id=user_id, text=message)
+        DIALOGFLOW_SECONDS.labels(outcome="ok").observe(time.perf_counter() - start)
         logger.info(f"Dialogflow detectó intención: {result['intent']} (confianza: {result['confidence']:.2f})")
         return result
     except Exception as e:
+        DIALOGFLOW_SECONDS.labels(outcome="error").observe(time.perf_counter() - start)
         logger.error(f"Error al detectar intención con Dialogflow: {e}")
         # Fallback a detección básica
         return {
@@ -77,45 +255,696 @@ def get_dialogflow_intent(user_id: str, message: str) -> Dict[str, Any]:
 
 
 @app.get("/recommend_food/{user_id}")
-def recommend_food(user_id: str):
+def recommend_food(user_id: str, request: Request):
+    """
+    Recomendación general según los últimos datos de sensores del usuario.
+
+    La respuesta se cachea por usuario, contexto (clima/estado) y versión
+    del catálogo, así que solo se recalcula cuando cambia alguno de ellos.
+    """
     data = sensors_data.get(user_id)
+    context = get_sensor_context(data) if data else None
+    return response_cache.respond(
+        request,
+        key=("recommend_food", user_id, context, catalog_version()),
+        producer=lambda: build_food_recommendation(user_id, data),
+        cache_control="private, no-cache",
+        ttl=RECOMMEND_CACHE_TTL,
+        cacheable=recommendation_cacheable,
+    )
+
+
+def build_food_recommendation(user_id: str, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcula la recomendación general (Prolog + FoodData Central)"""
     if not data:
         return {"error": "No sensor data found for this user."}
 
-    state = "low_oxygen" if data["oxygen_level"] < 94 else "normal"
-    weather = "cold" if data["temperature"] < 20 else "hot"
-
-    prolog_engine = PrologEngine()
-    prolog_engine.consult()
-    logic_recommendations = prolog_engine.food_recommendation(weather, state)
-
-    detailed_recommendations = []
-    for comida in logic_recommendations:
-        # Traducir a inglés para mejor búsqueda
-        nombre_busqueda = comida.replace("_", " ")
-        results = search_food(nombre_busqueda)
-        detailed_recommendations.append({"comida": comida, "info": results})
+    result = get_recommender().recommend(data, k=RECOMMEND_FOOD_LIMIT)
 
     return {
         "user_id": user_id,
-        "weather": weather,
-        "state": state,
-        "recommendations": detailed_recommendations,
+        "weather": result.weather,
+        "state": result.state,
+        "recommendations": detail_recommendations(result),
     }
 
 
+def recommendation_cacheable(content: Dict[str, Any]) -> bool:
+    """
+    Solo se cachea una recomendación completa: sin error y con todas las
+    búsquedas de FoodData Central resueltas (los fallos de la API vuelven
+    como registros sin fdcId, ej. "Error fetching data").
+    """
+    if "error" in content:
+        return False
+    return all(
+        info.get("fdcId") is not None
+        for item in content["recommendations"]
+        for info in item["info"] or ()
+    )
+
+
+def food_info(comida_prolog: str) -> List[Dict[str, Any]]:
+    """Información nutricional de una comida (catálogo local o FoodData Central)"""
+    local_info = local_food_info(comida_prolog)
+    return [local_info] if local_info else search_food(comida_prolog.replace("_", " "))
+
+
+def detail_recommendations(
+    result: RecommendationResult,
+    infos: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Agrega la información nutricional (catálogo local o FoodData Central) a cada candidato.
+
+    Si se pasa `infos`, se usa como memo por comida (una sola búsqueda por
+    comida entre varias llamadas, ver /cohort/recommendations).
+    """
+    detailed_recommendations = []
+    for candidate in result.recommendations:
+        if infos is None:
+            results = food_info(candidate.comida)
+        else:
+            results = infos.get(candidate.comida)
+            if results is None:
+                results = infos[candidate.comida] = food_info(candidate.comida)
+        detailed_recommendations.append({
+            "comida": candidate.comida,
+            "score": round(candidate.score, 4),
+            "explanation": candidate.explanation,
+            "info": results,
+        })
+    return detailed_recommendations
+
+
+# ============================================
+# 👥 RECOMENDACIONES POR COHORTE (paneles de seguimiento)
+# ============================================
+
+MAX_COHORT_USERS = 1000
+NO_SENSOR_DATA = "No sensor data found for this user."
+
+
+class CohortRequest(BaseModel):
+    """Usuarios de un panel de seguimiento"""
+    user_ids: List[str]
+    prep_time: int = QUICK_TIME_LIMIT
+    prep_times: Dict[str, int] = {}  # Tiempo por usuario (opcional, pisa prep_time)
+
+
+# (clima, estado, rango de tiempo) -> [(user_id, tiempo de preparación)]
+CohortGroups = Dict[Tuple[str, str, str], List[Tuple[str, int]]]
+
+
+def group_cohort(body: CohortRequest) -> Tuple[CohortGroups, List[str]]:
+    """Agrupa los usuarios por contexto; devuelve también los que no tienen sensores"""
+    groups: CohortGroups = {}
+    missing = []
+    for user_id in dict.fromkeys(body.user_ids):
+        data = sensors_data.get(user_id)
+        if not data:
+            missing.append(user_id)
+            continue
+        prep_time = body.prep_times.get(user_id, body.prep_time)
+        weather, state = get_sensor_context(data)
+        groups.setdefault((weather, state, time_bucket(prep_time)), []).append((user_id, prep_time))
+    return groups, missing
+
+
+def build_cohort_context(
+    weather: str, state: str, prep_time: int, infos: Dict[str, List[Dict[str, Any]]]
+) -> RawJSON:
+    """Recomendaciones de un contexto, enriquecidas y serializadas una sola vez"""
+    with tracing.span("cohort.context", weather=weather, state=state, prep_time=prep_time):
+        result = get_recommender().recommend_for(weather, state, prep_time, k=RECOMMEND_FOOD_LIMIT)
+        return RawJSON.of(detail_recommendations(result, infos))
+
+
+def _ndjson(content: Dict[str, Any]) -> bytes:
+    return dumps_spliced(content) + b"\n"
+
+
+async def _cohort_stream(body: CohortRequest) -> AsyncIterator[bytes]:
+    """
+    Una línea JSON por usuario (mismo formato que /recommend_food más
+    `prep_time`), contexto por contexto, y al final un resumen.
+    """
+    start = time.perf_counter()
+    try:
+        async with get_admission_controller().admit("cohort", PRIORITY_ADMIN):
+            groups, missing = await asyncio.to_thread(group_cohort, body)
+            for user_id in missing:
+                yield _ndjson({"user_id": user_id, "error": NO_SENSOR_DATA})
+
+            # Memo compartido: cada comida se enriquece una vez en toda la cohorte
+            infos: Dict[str, List[Dict[str, Any]]] = {}
+            for (weather, state, _), members in groups.items():
+                try:
+                    recommendations = await asyncio.to_thread(
+                        build_cohort_context, weather, state, members[0][1], infos
+                    )
+                except Exception as e:
+                    logger.error(f"Error en la cohorte para el contexto {weather}/{state}: {e}")
+                    for user_id, _ in members:
+                        yield _ndjson({"user_id": user_id, "error": str(e)})
+                    continue
+                for user_id, prep_time in members:
+                    yield _ndjson({
+                        "user_id": user_id,
+                        "weather": weather,
+                        "state": state,
+                        "prep_time": prep_time,
+                        "recommendations": recommendations,
+                    })
+
+            yield _ndjson({
+                "type": "summary",
+                "users": sum(len(members) for members in groups.values()) + len(missing),
+                "without_sensor_data": len(missing),
+                "contexts": len(groups),
+                "foods": len(infos),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+    except Overloaded as e:
+        yield _ndjson({"error": BUSY_TEXT, "load_shed": e.reason})
+
+
+@app.post("/cohort/recommendations")
+async def cohort_recommendations(body: CohortRequest):
+    """
+    Recomendaciones generales para muchos usuarios a la vez (NDJSON en streaming).
+
+    Los usuarios se agrupan por contexto (clima, estado, rango de tiempo):
+    cada contexto se consulta una sola vez y cada comida se enriquece una
+    sola vez, así que el costo depende de los contextos distintos y no de
+    la cantidad de usuarios.
+    """
+    if len(body.user_ids) > MAX_COHORT_USERS:
+        return {"error": f"Máximo {MAX_COHORT_USERS} usuarios por petición"}
+    return StreamingResponse(
+        _cohort_stream(body),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/sensors")
 async def receive_sensor_data(request: Request):
+    """
+    Guarda la última lectura del usuario. Si cambió su contexto (clima o
+    estado cruzaron un umbral) encola el precálculo de sus recomendaciones.
+    """
     body = await request.json()
     user_id = body["user_id"]
-    sensors_data[user_id] = body
-    return {"status": "Sensor data received", "user": user_id}
+    # Con STATE_BACKEND=sqlite/redis leer y escribir bloquea: fuera del event loop
+    previous = await asyncio.to_thread(sensors_data.get, user_id)
+    await asyncio.to_thread(sensors_data.set, user_id, body)
+    SENSOR_READINGS.inc()
+    context_changed = previous is None or get_sensor_context(previous) != get_sensor_context(body)
+    if context_changed and PRECOMPUTE_ENABLED:
+        precomputer.submit(user_id, body)
+    return {"status": "Sensor data received", "user": user_id, "context_changed": context_changed}
+
+
+# ============================================
+# ⚡ RECOMENDACIONES PRECALCULADAS (WebSocket)
+# ============================================
+
+# Último mensaje precalculado por usuario: se envía al abrir el WebSocket y,
+# con varios workers, lo leen los workers que no hicieron el cálculo
+latest_recommendations = get_state_backend().namespace("recommendations", ttl=RECOMMEND_CACHE_TTL)
+recommendation_subscribers = Subscribers()
+# Con estado compartido, cada cuánto revisa un WebSocket si otro worker calculó algo nuevo
+WS_POLL_INTERVAL = 2.0
+
+
+def precompute_recommendations(user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Calcula las recomendaciones del nuevo contexto del usuario y las deja
+    listas: respuesta de /recommend_food en el cache HTTP y registros
+    enriquecidos en el cache del chat. Devuelve el mensaje para el WebSocket.
+    """
+    with catalog_version_scope(), tracing.span("precompute.recommendations", user_id=user_id):
+        content = build_food_recommendation(user_id, data)
+        if not recommendation_cacheable(content):
+            # Falló alguna búsqueda: no se deja en cache ni se avisa; la
+            # próxima petición vuelve a intentarlo
+            return None
+        version = catalog_version()
+        response_cache.prime(
+            ("recommend_food", user_id, get_sensor_context(data), version), content, ttl=RECOMMEND_CACHE_TTL
+        )
+        for item in content["recommendations"]:
+            get_enriched_record(item["comida"])
+
+    message = {"type": "recommendations", "id": time.time_ns(), "catalog_version": version, **content}
+    latest_recommendations.set(user_id, message)
+    return message
+
+
+precomputer = Precomputer(precompute_recommendations, recommendation_subscribers)
+
+
+@app.websocket("/ws/recommendations/{user_id}")
+async def recommendations_socket(websocket: WebSocket, user_id: str):
+    """
+    Empuja al frontend las recomendaciones del usuario cada vez que se
+    precalculan (al cambiar su contexto de sensores). Al conectar envía la
+    última disponible. Los mensajes del cliente se ignoran.
+    """
+    await websocket.accept()
+    queue = recommendation_subscribers.subscribe(user_id)
+    poll = WS_POLL_INTERVAL if get_state_backend().shared else None
+    receive = asyncio.ensure_future(websocket.receive_text())
+    last_id = None
+    try:
+        message = await asyncio.to_thread(latest_recommendations.get, user_id)
+        while True:
+            if message is not None and message.get("id") != last_id:
+                await websocket.send_text(dumps(message).decode())
+                last_id = message.get("id")
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({get, receive}, timeout=poll, return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                message = get.result()
+            else:
+                get.cancel()
+                message = None
+            if receive in done:
+                receive.result()  # WebSocketDisconnect si el cliente se fue
+                receive = asyncio.ensure_future(websocket.receive_text())
+            elif not done:
+                # Otro worker pudo haber precalculado (estado compartido)
+                message = await asyncio.to_thread(latest_recommendations.get, user_id)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receive.cancel()
+        recommendation_subscribers.unsubscribe(user_id, queue)
+
+
+# ============================================
+# 👤 USUARIOS Y RECOMENDACIÓN PERSONALIZADA
+# ============================================
+
+class UserCreate(BaseModel):
+    """Datos para crear un usuario"""
+    user_id: str
+    nombre: Optional[str] = None
+    edad: Optional[int] = None
+
+
+class UserPreferences(BaseModel):
+    """Preferencias a actualizar (los campos omitidos no cambian)"""
+    clima: Optional[str] = None  # cold | hot | warm ("" para borrar)
+    estado: Optional[str] = None  # normal | low_oxygen ("" para borrar)
+    alergias: Optional[List[str]] = None  # ver users.ALLERGENS
+    excluidas: Optional[List[str]] = None  # reemplaza la lista completa
+
+
+class FoodReference(BaseModel):
+    """Comida por nombre (átomo de Prolog o texto libre del catálogo)"""
+    comida: str
+
+
+MAX_USERS_PAGE = 200
+USER_HISTORY_LIMIT = 10
+
+USER_NOT_FOUND = {"error": "User not found"}
+
+
+def resolve_catalog_food(name: str) -> Optional[str]:
+    """
+    Nombre Prolog de la comida del catálogo que corresponde a `name`, o None
+    si no hay una coincidencia segura (los endpoints responden con error)
+    """
+    hit = get_search_index().resolve(name)
+    return hit.prolog_name if hit else None
+
+
+@app.post("/users")
+def create_user(body: UserCreate):
+    """Crea un usuario"""
+    profile = get_user_store().create_user(body.user_id, body.nombre, body.edad)
+    if profile is None:
+        return {"error": f"User {body.user_id} already exists"}
+    return {"status": "User created", "user": profile.to_dict()}
+
+
+@app.get("/users")
+def list_users(offset: int = 0, limit: int = 50):
+    """Lista paginada de usuarios"""
+    limit = max(1, min(limit, MAX_USERS_PAGE))
+    users, total = get_user_store().list_users(offset=max(0, offset), limit=limit)
+    return {"total": total, "offset": offset, "users": users}
+
+
+@app.get("/users/{user_id}")
+def get_user(user_id: str):
+    """Perfil completo del usuario con su historial reciente"""
+    store = get_user_store()
+    profile = store.get_user(user_id)
+    if profile is None:
+        return USER_NOT_FOUND
+    return {**profile.to_dict(), "historial": store.recent_history(user_id, USER_HISTORY_LIMIT)}
+
+
+@app.post("/users/{user_id}/preferences")
+def update_user_preferences(user_id: str, body: UserPreferences):
+    """Actualiza clima/estado preferidos, alergias y comidas excluidas"""
+    excluded = None
+    if body.excluidas is not None:
+        excluded = []
+        for name in body.excluidas:
+            comida = resolve_catalog_food(name)
+            if comida is None:
+                return {"error": f"Comida no encontrada en el catálogo: {name}"}
+            excluded.append(comida)
+
+    try:
+        profile = get_user_store().update_preferences(
+            user_id, clima=body.clima, estado=body.estado, alergias=body.alergias, excluidas=excluded,
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    if profile is None:
+        return USER_NOT_FOUND
+    return {"status": "Preferences updated", "user": profile.to_dict()}
+
+
+@app.post("/users/{user_id}/favoritas")
+def add_user_favorite(user_id: str, body: FoodReference):
+    """Agrega una comida a las favoritas del usuario"""
+    comida = resolve_catalog_food(body.comida)
+    if comida is None:
+        return {"error": f"Comida no encontrada en el catálogo: {body.comida}"}
+    profile = get_user_store().add_favorite(user_id, comida)
+    if profile is None:
+        return USER_NOT_FOUND
+    return {"status": "Favorite added", "comida": comida, "favoritas": sorted(profile.favorites)}
+
+
+@app.post("/users/{user_id}/historial")
+def add_user_history(user_id: str, body: FoodReference):
+    """Registra una comida consumida por el usuario"""
+    comida = resolve_catalog_food(body.comida) or body.comida
+    if not get_user_store().add_history(user_id, comida):
+        return USER_NOT_FOUND
+    return {"status": "History updated", "comida": comida}
+
+
+@app.get("/recommend_personalized/{user_id}")
+def recommend_personalized(user_id: str, prep_time: int = 30):
+    """
+    Recomendación con el perfil del usuario: sin sus exclusiones ni
+    alergias y con sus favoritas priorizadas.
+
+    El contexto sale de los sensores; el clima/estado de las preferencias
+    se usan cuando no hay datos de sensores.
+    """
+    store = get_user_store()
+    profile = store.get_user(user_id)
+    if profile is None:
+        return USER_NOT_FOUND
+
+    data = sensors_data.get(user_id)
+    if data:
+        weather, state = get_sensor_context(data)
+    elif profile.clima and profile.estado:
+        weather, state = profile.clima, profile.estado
+    else:
+        return {"error": "No sensor data or preferences (clima, estado) found for this user."}
+
+    recommender = get_recommender()
+    history = get_history_log()
+    user_context = dataclasses.replace(store.user_context(profile, recommender), recent=history.recent(user_id))
+    result = recommender.recommend_for(weather, state, prep_time, user_context=user_context, k=RECOMMEND_FOOD_LIMIT)
+    history.record(user_id, result.names)
+    return {
+        "user_id": user_id,
+        "weather": result.weather,
+        "state": result.state,
+        "personalized": {
+            "alergias": allergy_names(profile.allergies),
+            "excluidas": len(profile.excluded),
+            "favoritas": len(profile.favorites),
+        },
+        "recommendations": detail_recommendations(result),
+    }
+
+
+# ============================================
+# 🍽️ PLAN DE COMIDAS DEL DÍA
+# ============================================
+
+MEAL_PLAN_MIN_CALORIES = 800
+MEAL_PLAN_MAX_CALORIES = 6000
+
+
+@app.get("/meal_plan/{user_id}")
+def meal_plan(
+    user_id: str,
+    calories: float = 2000,
+    protein: Optional[float] = None,
+    carbs: Optional[float] = None,
+    fat: Optional[float] = None,
+    prep_time: int = 45,
+):
+    """
+    Plan del día (desayuno, comida, cena y snack) que se acerca a una meta
+    de calorías y macronutrientes.
+
+    Args:
+        calories: Meta diaria en kcal
+        protein, carbs, fat: Metas en gramos (por defecto 20/50/30% de las calorías)
+        prep_time: Minutos disponibles para preparar cada comida
+
+    El estado (normal / low_oxygen) sale de los sensores del usuario o, si
+    no hay, de sus preferencias.
+    """
+    if not MEAL_PLAN_MIN_CALORIES <= calories <= MEAL_PLAN_MAX_CALORIES:
+        return {"error": f"calories debe estar entre {MEAL_PLAN_MIN_CALORIES} y {MEAL_PLAN_MAX_CALORIES}"}
+    if prep_time < 0:
+        return {"error": "prep_time no puede ser negativo"}
+    negative = [name for name, grams in (("protein", protein), ("carbs", carbs), ("fat", fat))
+                if grams is not None and grams < 0]
+    if negative:
+        return {"error": f"Las metas de macronutrientes no pueden ser negativas: {', '.join(negative)}"}
+
+    data = sensors_data.get(user_id)
+    if data:
+        _, state = get_sensor_context(data)
+    else:
+        profile = get_user_store().get_user(user_id)
+        state = profile.estado if profile and profile.estado else "normal"
+
+    target = MealTarget.from_calories(calories, protein=protein, carbs=carbs, fat=fat)
+    plan = get_meal_planner().plan(target, state=state, prep_time=prep_time)
+    if plan is None:
+        return {"error": "No hay comidas en el catálogo para armar un plan."}
+    return {"user_id": user_id, **plan.to_dict()}
 
 
 # ============================================
 # 💬 ENDPOINT DE CHAT
 # ============================================
 
+SENSORS_REQUIRED_TEXT = (
+    "Lo siento, necesito que me envíes tus datos de pulso/oxígeno "
+    "para darte una recomendación personalizada. "
+    "Por favor, envía tus datos de sensores primero."
+)
+
+INTERNAL_ERROR_TEXT = "Hubo un error interno al buscar tu recomendación. Por favor, intenta de nuevo."
+
+BUSY_TEXT = (
+    "En este momento hay mucha demanda y no pude preparar una recomendación. "
+    "Por favor, intenta de nuevo en unos segundos."
+)
+
+# Última recomendación enriquecida por contexto (clima, estado, tiempo):
+# (texto del agente, [(registro, registro serializado)]). Es la respuesta
+# degradada cuando el control de admisión rechaza una petición.
+degraded_recommendations = TTLCache(max_size=64, ttl=600)
+LOAD_SHED_HEADER = "X-Load-Shed"
+
+
+def recommend_varied(user_id: str, data: Dict[str, Any], prep_time: int, k: int) -> RecommendationResult:
+    """
+    Recomendación para el chat que evita repetir lo servido en los últimos
+    turnos. Lo servido se registra en el historial sin esperar al disco.
+    """
+    history = get_history_log()
+    result = get_recommender().recommend(data, prep_time, UserContext(recent=history.recent(user_id)), k)
+    history.record(user_id, result.names)
+    return result
+
+
+def local_food_info(comida_prolog: str) -> Optional[Dict[str, Any]]:
+    """
+    Resuelve una comida con el índice local del catálogo (sin llamar a la API).
+
+    Devuelve el mismo formato que search_food, o None si no hay coincidencia.
+    """
+    index = get_search_index()
+    # Solo el átomo exacto: una comida que no está en el catálogo no debe
+    # heredar los nutrientes de otra parecida (se busca en FDC)
+    hit = index.lookup(comida_prolog)
+    food = index.get_food(hit.fdc_id) if hit else None
+    if not food:
+        return None
+    return {
+        "nombre": food.get("display_name", ""),
+        "fdcId": hit.fdc_id,
+        "nutrientes": food.get("nutrients", {}),
+    }
+
+
+def enrich_recommendation(comida_prolog: str) -> Dict[str, Any]:
+    """Busca la información nutricional de una comida recomendada usando food_api"""
+    return get_enriched_record(comida_prolog)[0]
+
+
+def get_enriched_record(comida_prolog: str) -> Tuple[Dict[str, Any], RawJSON]:
+    """
+    Devuelve la recomendación enriquecida y su versión ya serializada.
+
+    Primero se resuelve con el índice local del catálogo; solo si no hay
+    coincidencia se busca en FoodData Central. Los registros válidos se
+    guardan en cache para no volver a serializarlos en cada turno del chat.
+    """
+    cached = enrichment_cache.get(comida_prolog)
+    if cached is not None:
+        return cached
+
+    with tracing.span("enrich", comida=comida_prolog) as current:
+        info = local_food_info(comida_prolog)
+        current.set_attribute("source", "catalog" if info is not None else "fdc")
+        if info is None:
+            try:
+                results = search_food(comida_prolog.replace("_", " "), max_results=1)
+            except ratelimit.RateLimited as e:
+                # Sin cuota de FDC: la comida va sin información nutricional (no se cachea)
+                current.set_attribute("rate_limited", e.limiter)
+                results = []
+            info = results[0] if results else None
+
+    record = {
+        "comida": comida_prolog,
+        "display_name": comida_prolog.replace("_", " ").title(),
+        "info": info
+    }
+    entry = (record, RawJSON.of(record))
+
+    # No cachear errores de la API (no traen fdcId)
+    if record["info"] and record["info"].get("fdcId") is not None:
+        enrichment_cache.set(comida_prolog, entry)
+
+    return entry
+
+
+def build_recommendation_text(
+    state: str,
+    weather: str,
+    recommendations_list: List[Dict[str, Any]],
+    reasons: Optional[List[str]] = None
+) -> str:
+    """Formatea la respuesta del agente a partir de las recomendaciones"""
+    primera_comida = recommendations_list[0]["display_name"]
+    agent_response = (
+        f"Basado en tu estado ({state.replace('_', ' ')}) "
+        f"y el clima ({weather}), te recomiendo **{primera_comida}**"
+    )
+    # Explicación del recomendador (ej. "rica en hierro, alta en proteína")
+    if reasons:
+        agent_response += f" ({', '.join(reasons)})"
+    agent_response += "."
+
+    # Agregar información nutricional si está disponible
+    if recommendations_list[0].get("info") and recommendations_list[0]["info"].get("nutrientes"):
+        nutrientes = recommendations_list[0]["info"]["nutrientes"]
+        energia = nutrientes.get("Energy", "N/A")
+        agent_response += f" Contiene aproximadamente {energia} de energía."
+
+    # Si hay más recomendaciones, mencionarlas
+    if len(recommendations_list) > 1:
+        otras_comidas = ", ".join([
+            rec["display_name"]
+            for rec in recommendations_list[1:3]
+        ])
+        agent_response += f" Otras opciones: {otras_comidas}."
+
+    return agent_response
+
+
+def build_no_recommendation_text(weather: str, state: str, prep_time: int) -> str:
+    """Respuesta cuando Prolog no encuentra comidas para el contexto"""
+    return (
+        f"Lo siento, no pude encontrar una recomendación que cumpla "
+        f"todos los criterios (clima: {weather}, estado: {state}, "
+        f"tiempo disponible: {prep_time} minutos). "
+        f"¿Podrías intentar con un tiempo diferente?"
+    )
+
+
+def build_intent_text(intent: str, fulfillment_text: str) -> str:
+    """
+    Respuesta para intenciones que no son de recomendación.
+
+    Si Dialogflow tiene una respuesta, se usa; si no, se usa la predefinida.
+    """
+    if fulfillment_text:
+        return fulfillment_text
+
+    if intent == "greeting":
+        return (
+            "¡Hola! Soy tu Agente de Asesoría de Estilo de Vida Saludable. "
+            "¿En qué puedo ayudarte hoy? Por ejemplo, puedes decirme "
+            "'Recomiéndame algo para comer' o '¿Qué debería comer?'"
+        )
+
+    if intent == "help":
+        return (
+            "Puedo ayudarte con:\n"
+            "🍽️ Recomendaciones de comida personalizadas según tu estado de salud y clima\n"
+            "⏱️ Sugerencias basadas en tu tiempo disponible para preparar comida\n"
+            "📊 Información nutricional detallada\n\n"
+            "Para obtener una recomendación, primero envía tus datos de sensores "
+            "(oxígeno, temperatura, etc.) y luego pregunta 'Recomiéndame algo para comer'."
+        )
+
+    # Fallback
+    return (
+        "No entendí tu solicitud. ¿Estás buscando una recomendación de comida, "
+        "o tienes alguna pregunta? Puedes decirme:\n"
+        "- 'Recomiéndame algo para comer'\n"
+        "- '¿Qué debería comer?'\n"
+        "- 'Ayuda' para ver qué puedo hacer"
+    )
+
+
+def resolve_intent(user_id: str, user_message: str) -> Tuple[str, str]:
+    """
+    Obtiene la intención normalizada y el texto de Dialogflow.
+
+    Returns:
+        Tupla (intent, fulfillment_text)
+    """
+    dialogflow_result = get_dialogflow_intent(user_id, user_message)
+    logger.info(f"Resultado bruto de Dialogflow/fallback: {dialogflow_result}")
+    # Normalizar el nombre de la intención para evitar problemas de mayúsculas/minúsculas
+    raw_intent = dialogflow_result.get("intent", "") or ""
+    intent = raw_intent.lower()
+    fulfillment_text = dialogflow_result.get("fulfillment_text", "")
+    dialogflow_confidence = dialogflow_result.get("confidence", 0.0)
+
+    logger.info(
+        f"Usuario {user_id}: '{user_message}' -> Intención: {intent} "
+        f"(original: {raw_intent}, confianza: {dialogflow_confidence:.2f})"
+    )
+    return intent, fulfillment_text
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_interaction(request: ChatRequest):
     """
@@ -132,177 +961,289 @@ async def chat_interaction(request: ChatRequest):
         
     Returns:
         ChatResponse con agent_response, intent y opcionalmente recommendations
+
+    Pasa por el control de admisión (saludos y ayuda antes que
+    recomendaciones); si el servidor está saturado responde al instante una
+    versión degradada con la cabecera X-Load-Shed.
     """
-    user_id = request.user_id
-    user_message = request.message
-    prep_time = request.prep_time_available
-    
-    # 1. Obtener la intención usando Dialogflow (o fallback básico)
-    dialogflow_result = get_dialogflow_intent(user_id, user_message)
-    logger.info(f"Resultado bruto de Dialogflow/fallback: {dialogflow_result}")
-    # Normalizar el nombre de la intención para evitar problemas de mayúsculas/minúsculas
-    raw_intent = dialogflow_result.get("intent", "") or ""
-    intent = raw_intent.lower()
-    fulfillment_text = dialogflow_result.get("fulfillment_text", "")
-    dialogflow_confidence = dialogflow_result.get("confidence", 0.0)
+    try:
+        async with get_admission_controller().admit("chat", chat_priority(request.message)):
+            return await asyncio.to_thread(answer_chat, request)
+    except Overloaded as e:
+        content = await asyncio.to_thread(degraded_chat_content, request)
+        content["recommendations"] = [raw for _, raw in content["recommendations"] or ()] or None
+        return SplicedJSONResponse(content=content, headers={LOAD_SHED_HEADER: e.reason})
+
+
+def chat_priority(message: str) -> int:
+    """Prioridad de admisión según la intención aproximada (sin llamar a Dialogflow)"""
+    return PRIORITY_CHEAP if quick_intent(message) in ("greeting", "help") else PRIORITY_RECOMMENDATION
+
+
+def degraded_chat_content(request: ChatRequest) -> Dict[str, Any]:
+    """
+    Respuesta sin Dialogflow, Prolog ni FoodData Central para cuando el
+    servidor está saturado: la última recomendación servida para el mismo
+    contexto, o un texto genérico. Las recomendaciones van como pares
+    (registro, registro serializado).
+    """
+    intent = quick_intent(request.message)
+    if intent != "recommendation.food":
+        return {"agent_response": build_intent_text(intent, ""), "intent": intent, "recommendations": None}
+
+    data = sensors_data.get(request.user_id)
+    if not data:
+        return {"agent_response": SENSORS_REQUIRED_TEXT, "intent": intent, "recommendations": None}
+
+    weather, state = get_sensor_context(data)
+    cached = degraded_recommendations.get((weather, state, time_bucket(request.prep_time_available)))
+    if cached is None:
+        return {"agent_response": BUSY_TEXT, "intent": intent, "recommendations": None}
+    agent_response, enriched = cached
+    return {"agent_response": agent_response, "intent": intent, "recommendations": enriched}
+
+
+def answer_chat(request: ChatRequest):
+    """Resuelve un turno del chat (bloqueante: corre en un hilo ya admitido)"""
+    start = time.perf_counter()
+    intent = "unknown"
+    try:
+        user_id = request.user_id
+        user_message = request.message
+        prep_time = request.prep_time_available
     
-    logger.info(
-        f"Usuario {user_id}: '{user_message}' -> Intención: {intent} "
-        f"(original: {raw_intent}, confianza: {dialogflow_confidence:.2f})"
-    )
+        # 1. Obtener la intención usando Dialogflow (o fallback básico)
+        intent, fulfillment_text = resolve_intent(user_id, user_message)
     
-    # 2. Lógica de Respuesta
-    if intent == "recommendation.food":
-        # 2a. Si la intención es una recomendación, usar la lógica de Prolog
+        # 2. Lógica de Respuesta
+        if intent == "recommendation.food":
+            # 2a. Si la intención es una recomendación, usar la lógica de Prolog
         
-        # Obtener datos de sensores almacenados (del endpoint /sensors)
-        data = sensors_data.get(user_id)
-        if not data:
-            agent_response = (
-                "Lo siento, necesito que me envíes tus datos de pulso/oxígeno "
-                "para darte una recomendación personalizada. "
-                "Por favor, envía tus datos de sensores primero."
-            )
-            return ChatResponse(
-                agent_response=agent_response,
-                intent=intent,
-                recommendations=None
-            )
-        
-        # Calcular contexto para Prolog
-        state = "low_oxygen" if data.get("oxygen_level", 100) < 94 else "normal"
-        weather = "cold" if data.get("temperature", 25) < 20 else "hot"
+            # Obtener datos de sensores almacenados (del endpoint /sensors)
+            data = sensors_data.get(user_id)
+            if not data:
+                return ChatResponse(
+                    agent_response=SENSORS_REQUIRED_TEXT,
+                    intent=intent,
+                    recommendations=None
+                )
         
-        # Usar la lógica de Prolog para obtener recomendaciones
-        try:
-            prolog_engine = PrologEngine()
-            prolog_engine.consult()
+            # Usar el recomendador (candidatos de Prolog ya puntuados por contexto)
+            try:
+                result = recommend_varied(user_id, data, prep_time, k=3)  # Limitar a 3 recomendaciones
+                weather, state = result.weather, result.state
             
-            # Usar la regla 'recomendar' con el tiempo disponible (prep_time)
-            # La regla recomendar/4 usa (Climate, State, Time, Food)
-            logic_recommendations = prolog_engine.food_recommendation(
-                weather=weather,
-                state=state,
-                time=prep_time
-            )
-            
-            # Si hay resultados, generar respuesta detallada
-            if logic_recommendations:
-                recommendations_list = []
+                # Si hay resultados, generar respuesta detallada
+                if result.recommendations:
+                    # Obtener información detallada de las comidas recomendadas
+                    with ENRICHMENT_SECONDS.labels(endpoint="chat").time(), tracing.span("chat.enrichment"):
+                        enriched = [
+                            get_enriched_record(comida_prolog)
+                            for comida_prolog in result.names
+                        ]
+                    recommendations_list = [record for record, _ in enriched]
+                    reasons = result.recommendations[0].explanation
+                    agent_response = build_recommendation_text(state, weather, recommendations_list, reasons)
+                    degraded_recommendations.set((weather, state, time_bucket(prep_time)), (agent_response, enriched))
                 
-                # Obtener información detallada de las comidas recomendadas
-                for comida_prolog in logic_recommendations[:3]:  # Limitar a 3 recomendaciones
-                    # Buscar información nutricional usando food_api
-                    nombre_busqueda = comida_prolog.replace("_", " ")
-                    results = search_food(nombre_busqueda, max_results=1)
-                    
-                    recommendations_list.append({
-                        "comida": comida_prolog,
-                        "display_name": comida_prolog.replace("_", " ").title(),
-                        "info": results[0] if results else None
+                    # Los registros ya serializados se insertan tal cual en la respuesta
+                    return SplicedJSONResponse(content={
+                        "agent_response": agent_response,
+                        "intent": intent,
+                        "recommendations": [raw for _, raw in enriched],
                     })
+                else:
+                    return ChatResponse(
+                        agent_response=build_no_recommendation_text(weather, state, prep_time),
+                        intent=intent,
+                        recommendations=None
+                    )
                 
-                # Formatear la respuesta del agente
-                primera_comida = recommendations_list[0]["display_name"]
-                agent_response = (
-                    f"Basado en tu estado ({state.replace('_', ' ')}) "
-                    f"y el clima ({weather}), te recomiendo **{primera_comida}**."
-                )
-                
-                # Agregar información nutricional si está disponible
-                if recommendations_list[0].get("info") and recommendations_list[0]["info"].get("nutrientes"):
-                    nutrientes = recommendations_list[0]["info"]["nutrientes"]
-                    energia = nutrientes.get("Energy", "N/A")
-                    agent_response += f" Contiene aproximadamente {energia} de energía."
-                
-                # Si hay más recomendaciones, mencionarlas
-                if len(recommendations_list) > 1:
-                    otras_comidas = ", ".join([
-                        rec["display_name"] 
-                        for rec in recommendations_list[1:3]
-                    ])
-                    agent_response += f" Otras opciones: {otras_comidas}."
-                
-                return ChatResponse(
-                    agent_response=agent_response,
-                    intent=intent,
-                    recommendations=recommendations_list
-                )
-            else:
-                agent_response = (
-                    f"Lo siento, no pude encontrar una recomendación que cumpla "
-                    f"todos los criterios (clima: {weather}, estado: {state}, "
-                    f"tiempo disponible: {prep_time} minutos). "
-                    f"¿Podrías intentar con un tiempo diferente?"
-                )
+            except Exception as e:
+                print(f"Error en la lógica Prolog/API: {e}")
+                import traceback
+                traceback.print_exc()
                 return ChatResponse(
-                    agent_response=agent_response,
+                    agent_response=INTERNAL_ERROR_TEXT,
                     intent=intent,
                     recommendations=None
                 )
-                
-        except Exception as e:
-            print(f"Error en la lógica Prolog/API: {e}")
-            import traceback
-            traceback.print_exc()
-            agent_response = "Hubo un error interno al buscar tu recomendación. Por favor, intenta de nuevo."
-            return ChatResponse(
-                agent_response=agent_response,
-                intent=intent,
-                recommendations=None
-            )
-    
-    # 2b. Si no es una recomendación, usar respuesta de Dialogflow o lógica predefinida
-    elif intent == "greeting":
-        # Si Dialogflow tiene una respuesta, usarla; si no, usar la predefinida
-        agent_response = fulfillment_text if fulfillment_text else (
-            "¡Hola! Soy tu Agente de Asesoría de Estilo de Vida Saludable. "
-            "¿En qué puedo ayudarte hoy? Por ejemplo, puedes decirme "
-            "'Recomiéndame algo para comer' o '¿Qué debería comer?'"
-        )
-        return ChatResponse(
-            agent_response=agent_response,
-            intent=intent,
-            recommendations=None
-        )
-    
-    # 2c. Intención de ayuda
-    elif intent == "help":
-        # Si Dialogflow tiene una respuesta, usarla; si no, usar la predefinida
-        agent_response = fulfillment_text if fulfillment_text else (
-            "Puedo ayudarte con:\n"
-            "🍽️ Recomendaciones de comida personalizadas según tu estado de salud y clima\n"
-            "⏱️ Sugerencias basadas en tu tiempo disponible para preparar comida\n"
-            "📊 Información nutricional detallada\n\n"
-            "Para obtener una recomendación, primero envía tus datos de sensores "
-            "(oxígeno, temperatura, etc.) y luego pregunta 'Recomiéndame algo para comer'."
-        )
-        return ChatResponse(
-            agent_response=agent_response,
-            intent=intent,
-            recommendations=None
-        )
     
-    # 2d. Fallback - usar respuesta de Dialogflow si está disponible
-    else:
-        agent_response = fulfillment_text if fulfillment_text else (
-            "No entendí tu solicitud. ¿Estás buscando una recomendación de comida, "
-            "o tienes alguna pregunta? Puedes decirme:\n"
-            "- 'Recomiéndame algo para comer'\n"
-            "- '¿Qué debería comer?'\n"
-            "- 'Ayuda' para ver qué puedo hacer"
-        )
+        # 2b. Si no es una recomendación (greeting, help o fallback),
+        # usar respuesta de Dialogflow o lógica predefinida
         return ChatResponse(
-            agent_response=agent_response,
+            agent_response=build_intent_text(intent, fulfillment_text),
             intent=intent,
             recommendations=None
         )
+    finally:
+        CHAT_SECONDS.labels(endpoint="chat", intent=intent).observe(time.perf_counter() - start)
+
+
+# ============================================
+# 📡 CHAT CON STREAMING (SSE)
+# ============================================
+
+def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    """Serializa un evento Server-Sent Events"""
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def _chat_event_stream(request: ChatRequest) -> AsyncIterator[bytes]:
+    """
+    Genera los eventos del chat en streaming.
+
+    Orden de los eventos:
+    1. `message`: texto del agente y nombres de las comidas (sin nutrientes)
+    2. `recommendation`: una por comida, en cuanto llega su información nutricional
+    3. `update`: texto final del agente cuando la primera comida trae su
+       energía (el mismo que devolvería /api/chat); solo si cambió
+    4. `done`: fin del stream
+    """
+    start = time.perf_counter()
+    intent = "unknown"
+    try:
+        user_id = request.user_id
+        prep_time = request.prep_time_available
+
+        intent, fulfillment_text = await asyncio.to_thread(resolve_intent, user_id, request.message)
+
+        if intent != "recommendation.food":
+            yield _sse_event("message", {
+                "agent_response": build_intent_text(intent, fulfillment_text),
+                "intent": intent,
+                "recommendations": None,
+            })
+            yield _sse_event("done", {"count": 0})
+            return
+
+        data = await asyncio.to_thread(sensors_data.get, user_id)
+        if not data:
+            yield _sse_event("message", {
+                "agent_response": SENSORS_REQUIRED_TEXT,
+                "intent": intent,
+                "recommendations": None,
+            })
+            yield _sse_event("done", {"count": 0})
+            return
+
+        weather, state = get_sensor_context(data)
+
+        try:
+            result = await asyncio.to_thread(recommend_varied, user_id, data, prep_time, 3)
+        except Exception as e:
+            logger.error(f"Error en la lógica Prolog (stream): {e}")
+            yield _sse_event("message", {
+                "agent_response": INTERNAL_ERROR_TEXT,
+                "intent": intent,
+                "recommendations": None,
+            })
+            yield _sse_event("done", {"count": 0})
+            return
+
+        if not result.recommendations:
+            yield _sse_event("message", {
+                "agent_response": build_no_recommendation_text(weather, state, prep_time),
+                "intent": intent,
+                "recommendations": None,
+            })
+            yield _sse_event("done", {"count": 0})
+            return
+
+        # Primer evento: nombres de las comidas en cuanto el recomendador responde
+        selected = result.names
+        placeholders = [
+            {
+                "comida": comida_prolog,
+                "display_name": comida_prolog.replace("_", " ").title(),
+                "info": None,
+            }
+            for comida_prolog in selected
+        ]
+        reasons = result.recommendations[0].explanation
+        agent_response = build_recommendation_text(state, weather, placeholders, reasons)
+        yield _sse_event("message", {
+            "agent_response": agent_response,
+            "intent": intent,
+            "recommendations": placeholders,
+        })
+
+        # Enriquecer en paralelo y enviar cada comida en cuanto llega
+        enrich_start = time.perf_counter()
+        pending = {
+            asyncio.ensure_future(asyncio.to_thread(enrich_recommendation, comida_prolog)): index
+            for index, comida_prolog in enumerate(selected)
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        recommendation = task.result()
+                    except Exception as e:
+                        logger.error(f"Error enriqueciendo {selected[index]}: {e}")
+                        recommendation = placeholders[index]
+                    yield _sse_event("recommendation", {"index": index, **recommendation})
+                    if index == 0:
+                        # El texto menciona la energía de la primera comida
+                        final_response = build_recommendation_text(
+                            state, weather, [recommendation, *placeholders[1:]], reasons
+                        )
+                        if final_response != agent_response:
+                            yield _sse_event("update", {"agent_response": final_response})
+        finally:
+            ENRICHMENT_SECONDS.labels(endpoint="stream").observe(time.perf_counter() - enrich_start)
+            # Si el cliente se desconecta, no dejar tareas huérfanas
+            for task in pending:
+                task.cancel()
+
+        yield _sse_event("done", {"count": len(selected)})
+    finally:
+        CHAT_SECONDS.labels(endpoint="stream", intent=intent).observe(time.perf_counter() - start)
+
+
+async def _admitted_chat_stream(request: ChatRequest) -> AsyncIterator[bytes]:
+    """
+    Eventos del chat dentro del control de admisión; el turno se mantiene
+    hasta terminar el stream. Si se rechaza, un solo `message` degradado.
+    """
+    try:
+        async with get_admission_controller().admit("stream", chat_priority(request.message)):
+            async for event in _chat_event_stream(request):
+                yield event
+    except Overloaded as e:
+        content = await asyncio.to_thread(degraded_chat_content, request)
+        records = [record for record, _ in content["recommendations"] or ()]
+        content["recommendations"] = records or None
+        yield _sse_event("message", {**content, "load_shed": e.reason})
+        yield _sse_event("done", {"count": len(records)})
+
+
+@app.post("/api/chat/stream")
+async def chat_interaction_stream(request: ChatRequest):
+    """
+    Variante en streaming de /api/chat usando Server-Sent Events.
+
+    Envía primero el texto del agente y los nombres de las recomendaciones
+    (en cuanto Prolog responde) y después cada registro nutricional a medida
+    que llega de FoodData Central.
+    """
+    return StreamingResponse(
+        _admitted_chat_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============================================
 # 🔧 ENDPOINTS DE ADMINISTRACIÓN
 # ============================================
 
+# La recarga puede esperar más que una petición del chat antes de rechazarse
+RELOAD_QUEUE_TIMEOUT = 30.0
+
+
 @app.post("/admin/reload-foods")
 async def reload_foods(force_refresh: bool = False):
     """
@@ -310,6 +1251,8 @@ async def reload_foods(force_refresh: bool = False):
     
     Args:
         force_refresh: Si es True, ignora cache y recarga desde API
+
+    Tiene la última prioridad en el control de admisión y corre de a una.
     """
     import subprocess
     from pathlib import Path
@@ -323,26 +1266,27 @@ async def reload_foods(force_refresh: bool = False):
         if force_refresh:
             args.append("--refresh")
         
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        async with get_admission_controller().admit("reload", PRIORITY_ADMIN, timeout=RELOAD_QUEUE_TIMEOUT):
+            result = await asyncio.to_thread(
+                subprocess.run,
+                args,
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
         
         if result.returncode == 0:
-            # Leer estadísticas del cache
-            cache_file = prolog_dir / "food_cache.json"
-            if cache_file.exists():
-                import json
-                with open(cache_file, 'r') as f:
-                    cache = json.load(f)
-                
+            # El catálogo cambió: descartar respuestas cacheadas
+            response_cache.clear()
+
+            # Leer estadísticas del manifiesto del catálogo
+            manifest = read_catalog_manifest()
+            if manifest:
                 return {
                     "status": "success",
                     "message": "Comidas recargadas exitosamente",
-                    "total_foods": cache.get('total_foods', 0),
-                    "generated_at": cache.get('generated_at'),
+                    "total_foods": manifest.get('total_foods', 0),
+                    "generated_at": manifest.get('generated_at'),
                     "force_refresh": force_refresh
                 }
             else:
@@ -363,6 +1307,11 @@ async def reload_foods(force_refresh: bool = False):
             "status": "error",
             "message": "Timeout recargando comidas (> 60s)"
         }
+    except Overloaded:
+        return {
+            "status": "error",
+            "message": "Servidor ocupado atendiendo el chat, intenta recargar más tarde"
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -371,61 +1320,220 @@ async def reload_foods(force_refresh: bool = False):
 
 
 @app.get("/admin/food-stats")
-def food_statistics():
+def food_statistics(request: Request):
     """Obtener estadísticas de las comidas cargadas"""
-    from pathlib import Path
-    import json
-    
-    prolog_dir = Path(__file__).parent / "prolog"
-    cache_file = prolog_dir / "food_cache.json"
-    dynamic_file = prolog_dir / "comidas_dynamic.pl"
-    static_file = prolog_dir / "comidas.pl"
+    return response_cache.respond(
+        request,
+        key=("food_stats", catalog_version()),
+        producer=build_food_statistics,
+        cache_control="no-cache",
+    )
+
+
+def build_food_statistics() -> Dict[str, Any]:
+    """Calcula las estadísticas a partir del cache de comidas"""
+    cache_file = CACHE_FILE
+    dynamic_file = DYNAMIC_FILE
+    static_file = STATIC_FILE
     
     stats = {
-        "cache_exists": cache_file.exists(),
+        "cache_exists": cache_file.exists() or LEGACY_CACHE_FILE.exists(),
         "dynamic_file_exists": dynamic_file.exists(),
         "static_file_exists": static_file.exists(),
         "using": "dynamic" if dynamic_file.exists() else "static"
     }
     
-    if cache_file.exists():
-        try:
-            with open(cache_file, 'r') as f:
-                cache = json.load(f)
-            
-            # Contar por categoría
-            by_category = {}
-            for food in cache.get('foods', []):
-                cat = food.get('category', 'unknown')
-                by_category[cat] = by_category.get(cat, 0) + 1
-            
+    try:
+        # El manifiesto ya trae el conteo por categoría: no hace falta leer el cache
+        manifest = read_catalog_manifest()
+        if manifest:
             stats.update({
-                "total_foods": cache.get('total_foods', 0),
-                "generated_at": cache.get('generated_at'),
-                "by_category": by_category,
+                "total_foods": manifest.get('total_foods', 0),
+                "generated_at": manifest.get('generated_at'),
+                "by_category": manifest.get('by_category', {}),
                 "cache_loaded": True
             })
-        except Exception as e:
-            stats["cache_error"] = str(e)
+    except Exception as e:
+        stats["cache_error"] = str(e)
     
     return stats
 
 
+@app.get("/admin/prolog-stats")
+def prolog_statistics(request: Request):
+    """Estadísticas calculadas por las reglas de Prolog (agregados materializados)"""
+    return response_cache.respond(
+        request,
+        key=("prolog_stats", catalog_version()),
+        producer=build_prolog_statistics,
+        cache_control="no-cache",
+    )
+
+
+def build_prolog_statistics() -> Dict[str, Any]:
+    """Consulta count_foods/1, average_calories_by_category/2 y extremos de calorías"""
+    try:
+        engine = get_prolog_engine()
+        extremes = engine.calorie_extremes()
+        return {
+            "total_foods": engine.count_foods(),
+            "by_category": {
+                category: stats.to_dict()
+                for category, stats in engine.category_stats().items()
+            },
+            "highest_calorie_food": extremes["highest"],
+            "lowest_calorie_food": extremes["lowest"],
+        }
+    except Exception as e:
+        logger.error(f"Error consultando estadísticas en Prolog: {e}")
+        return {"error": str(e)}
+
+
+@app.get("/admin/cache-stats")
+def cache_statistics():
+    """Estadísticas de los caches en memoria (respuestas HTTP y detalles FDC)"""
+    return {
+        "responses": response_cache.stats(),
+        "food_details": detail_cache_stats(),
+        "singleflight": singleflight_stats(),
+        "fdc_local_db": local_db_stats(),
+        "recommender": get_recommender().stats(),
+        "search_index": get_search_index().stats(),
+        "users": get_user_store().stats(),
+        "history": get_history_log().stats(),
+        "state": get_state_backend().stats(),
+        "admission": get_admission_controller().stats(),
+        "rate_limits": ratelimit.stats(),
+        "precompute": precomputer.stats(),
+        "degraded_recommendations": degraded_recommendations.stats(),
+        "tracing": tracing.stats(),
+        "catalog_version": catalog_version(),
+    }
+
+
+def cache_metric_samples():
+    """Aciertos y fallos de los caches en memoria (para /metrics)"""
+    caches = {
+        "responses": response_cache.stats(),
+        "food_details": detail_cache_stats(),
+        "enrichment": enrichment_cache.stats(),
+        # Sin stats(): su COUNT(*) recorrería la tabla de usuarios en cada scrape
+        "user_profiles": get_user_store().profile_cache_stats(),
+    }
+    for name, stats in caches.items():
+        labels = {"cache": name}
+        yield "cache_hits_total", labels, stats["hits"]
+        yield "cache_misses_total", labels, stats["misses"]
+        yield "cache_hit_ratio", labels, stats["hit_ratio"]
+        yield "cache_entries", labels, stats["size"]
+
+
+metrics.collector("caches", cache_metric_samples, {
+    "cache_hits_total": ("counter", "Aciertos de cada cache en memoria"),
+    "cache_misses_total": ("counter", "Fallos de cada cache en memoria"),
+    "cache_hit_ratio": ("gauge", "Proporción de aciertos de cada cache"),
+    "cache_entries": ("gauge", "Entradas guardadas en cada cache"),
+})
+
+
+def admission_metric_samples():
+    """Ocupación del control de admisión (para /metrics)"""
+    stats = get_admission_controller().stats()
+    yield "admission_active", {}, stats["active"]
+    yield "admission_queued", {}, stats["queued"]
+
+
+metrics.collector("admission", admission_metric_samples, {
+    "admission_active": ("gauge", "Peticiones en curso dentro del control de admisión"),
+    "admission_queued": ("gauge", "Peticiones esperando turno"),
+})
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ============================================
+# 🔥 PROFILING DEL PROCESO EN EJECUCIÓN
+# ============================================
+
+@app.get("/admin/profile")
+def profile_status():
+    """Estado del profiler (habilitado, en curso, duración máxima)"""
+    return profiler.status()
+
+
+@app.post("/admin/profile/cpu")
+async def profile_cpu(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    include_idle: bool = False,
+    format: str = "json",
+    top: int = 25,
+):
+    """
+    Perfil de CPU por muestreo de las pilas de todos los hilos.
+
+    El muestreo corre en otro hilo, así que la API sigue atendiendo el
+    tráfico real mientras tanto. Con format=folded devuelve solo las pilas
+    en formato folded (flamegraph.pl / speedscope).
+    """
+    try:
+        result = await asyncio.to_thread(profiler.profile_cpu, seconds, interval_ms / 1000, include_idle)
+    except (PermissionError, profiler.ProfilerBusy) as e:
+        return {"error": str(e)}
+    if format == "folded":
+        return Response(content=result.folded(), media_type="text/plain; charset=utf-8")
+    return result.to_dict(top)
+
+
+@app.post("/admin/profile/memory")
+async def profile_memory(seconds: float = 10, top: int = 25, format: str = "json"):
+    """
+    Asignaciones de memoria hechas durante la ventana (tracemalloc).
+
+    Con format=folded devuelve las pilas de asignación ponderadas por bytes.
+    """
+    try:
+        result = await asyncio.to_thread(profiler.profile_memory, seconds, top)
+    except (PermissionError, profiler.ProfilerBusy) as e:
+        return {"error": str(e)}
+    if format == "folded":
+        return Response(content=result["folded"], media_type="text/plain; charset=utf-8")
+    return result
+
+
 @app.get("/api/food/{fdc_id}")
-def get_food_detail(fdc_id: int):
+def get_food_detail(fdc_id: int, request: Request, include_raw: bool = False):
     """
     Obtiene detalles completos de un alimento por su FDC ID.
     
     Args:
         fdc_id: ID del alimento en FoodData Central
+        include_raw: Si es True, incluye también la lista original `foodNutrients`
         
     Returns:
         Diccionario con información completa del alimento incluyendo
         todos los nutrientes, ingredientes, y metadatos.
     """
+    return response_cache.respond(
+        request,
+        key=("food_detail", fdc_id, include_raw),
+        producer=lambda: build_food_detail(fdc_id, include_raw),
+        cache_control=f"public, max-age={FOOD_DETAIL_CACHE_TTL}",
+        ttl=FOOD_DETAIL_CACHE_TTL,
+    )
+
+
+def build_food_detail(fdc_id: int, include_raw: bool) -> Dict[str, Any]:
+    """Obtiene el detalle de un alimento desde food_api"""
     try:
-        details = get_food_details(fdc_id)
+        details = get_food_details(fdc_id, include_raw=include_raw)
         return details
+    except ratelimit.RateLimited:
+        raise
     except Exception as e:
         logger.error(f"Error obteniendo detalles del alimento {fdc_id}: {e}")
         return {
@@ -436,9 +1544,91 @@ def get_food_detail(fdc_id: int):
         }
 
 
+MAX_BATCH_FOOD_IDS = 50
+MAX_SEARCH_RESULTS = 50
+
+
+@app.get("/api/foods/search")
+def search_foods_local(q: str, limit: int = 10):
+    """
+    Búsqueda de comidas en el catálogo local (tolerante a acentos y errores de tipeo).
+
+    Args:
+        q: Texto a buscar (ej. "salmón", "oatmel")
+        limit: Número máximo de resultados
+
+    Returns:
+        Diccionario con los resultados ordenados por relevancia
+    """
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    hits = get_search_index().search(q, limit=limit)
+    return {"query": q, "results": [hit.to_dict() for hit in hits]}
+
+
+@app.get("/api/foods/autocomplete")
+def autocomplete_foods(q: str, limit: int = 8):
+    """Sugerencias de comidas del catálogo para lo que el usuario está escribiendo"""
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    hits = get_search_index().autocomplete(q, limit=limit)
+    return {"query": q, "suggestions": [hit.to_dict() for hit in hits]}
+
+
+@app.get("/api/foods")
+def get_foods_detail(ids: str, include_raw: bool = False):
+    """
+    Obtiene detalles de varios alimentos en una sola llamada.
+    
+    Args:
+        ids: IDs de FoodData Central separados por comas (ej. "1995469,2503998")
+        include_raw: Si es True, incluye también la lista original `foodNutrients`
+        
+    Returns:
+        Diccionario con la lista de alimentos en el mismo orden que `ids`
+    """
+    try:
+        fdc_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        return {"error": "ids debe ser una lista de enteros separados por comas", "foods": []}
+
+    if len(fdc_ids) > MAX_BATCH_FOOD_IDS:
+        return {"error": f"Máximo {MAX_BATCH_FOOD_IDS} ids por petición", "foods": []}
+
+    try:
+        foods = get_foods_details(fdc_ids, include_raw=include_raw)
+        return {"foods": foods}
+    except ratelimit.RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo detalles de alimentos {fdc_ids}: {e}")
+        return {"error": str(e), "foods": []}
+
+
+@app.get("/health")
+def health():
+    """Liveness: el proceso responde (no espera al calentamiento)"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 solo cuando terminó el calentamiento de arranque"""
+    state = startup.readiness()
+    return FastJSONResponse(content=state, status_code=200 if state["ready"] else 503)
+
+
 @app.get("/")
-def root():
+def root(request: Request):
     """Información de la API"""
+    return response_cache.respond(
+        request,
+        key=("root",),
+        producer=build_api_info,
+        cache_control="public, max-age=3600",
+    )
+
+
+def build_api_info() -> Dict[str, Any]:
+    """Descripción de la API y sus endpoints"""
     return {
         "name": "Food Recommendation API",
         "version": "2.0.0",
@@ -451,7 +1641,9 @@ def root():
         "endpoints": {
             "recommendations": {
                 "general": "GET /recommend_food/{user_id}",
-                "personalized": "GET /recommend_personalized/{user_id}"
+                "personalized": "GET /recommend_personalized/{user_id}",
+                "meal_plan": "GET /meal_plan/{user_id}?calories=2000&prep_time=45",
+                "cohort": "POST /cohort/recommendations"
             },
             "users": {
                 "create": "POST /users",
@@ -462,14 +1654,29 @@ def root():
                 "history": "POST /users/{user_id}/historial"
             },
             "sensors": {
-                "send_data": "POST /sensors"
+                "send_data": "POST /sensors",
+                "recommendations_socket": "WS /ws/recommendations/{user_id}"
+            },
+            "foods": {
+                "detail": "GET /api/food/{fdc_id}?include_raw=false",
+                "batch": "GET /api/foods?ids=1,2,3&include_raw=false",
+                "search": "GET /api/foods/search?q=salmon&limit=10",
+                "autocomplete": "GET /api/foods/autocomplete?q=chick"
             },
             "chat": {
-                "interaction": "POST /api/chat"
+                "interaction": "POST /api/chat",
+                "stream": "POST /api/chat/stream"
             },
             "admin": {
                 "reload_foods": "POST /admin/reload-foods?force_refresh=true",
-                "food_stats": "GET /admin/food-stats"
+                "food_stats": "GET /admin/food-stats",
+                "prolog_stats": "GET /admin/prolog-stats",
+                "cache_stats": "GET /admin/cache-stats",
+                "metrics": "GET /metrics",
+                "health": "GET /health",
+                "ready": "GET /ready",
+                "profile_cpu": "POST /admin/profile/cpu?seconds=10&format=folded",
+                "profile_memory": "POST /admin/profile/memory?seconds=10&top=25"
             }
         },
         "docs": "/docs"
@@ -0,0 +1,350 @@
+"""
+🗓️ meal_plan.py
+Plan de comidas del día: desayuno, comida, cena y snack del catálogo que
+más se acercan a una meta de calorías y macronutrientes.
+
+Flujo:
+1. Por versión del catálogo, las comidas se agrupan por (categoría, estado,
+   tipo de tiempo) en columnas numéricas (array('d')) de calorías,
+   proteína, carbohidratos y grasa
+2. Para cada tiempo de comida se toman las POOL_SIZE comidas más cercanas a
+   su parte de la meta (SLOT_SHARES), filtradas por estado y tiempo disponible
+3. Entre esas comidas se busca la combinación óptima con meet-in-the-middle:
+   se combinan desayuno+comida y cena+snack, y para cada par de la primera
+   mitad se recorre la segunda (ordenada por calorías) solo mientras el
+   error en calorías no supere a la mejor solución encontrada
+
+El error es la suma ponderada de desviaciones relativas al cuadrado
+(OBJECTIVE_WEIGHTS). El paso 3 es exacto sobre los grupos del paso 2, salvo
+que antes encuentre un plan con error menor que PLAN_TOLERANCE.
+"""
+
+import bisect
+import heapq
+import itertools
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from catalog import NUTRIENT_KEYS, catalog_version, load_catalog_foods, parse_amount
+
+SLOTS = ("breakfast", "lunch", "dinner", "snack")
+# Parte de la meta diaria que corresponde a cada tiempo de comida
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snack": 0.10}
+
+MACROS = ("calories", "protein", "carbs", "fat")
+OBJECTIVE_WEIGHTS = (2.0, 1.0, 1.0, 1.0)
+
+# Minutos mínimos que requiere cada tipo de preparación (ver README_DYNAMIC_FOODS.md)
+PREP_TIME_MINUTES = {"quick": 0, "medium": 20, "long": 45}
+
+# Comidas por tiempo de comida que entran a la búsqueda exacta
+POOL_SIZE = 40
+# Error con el que un plan se considera suficiente (≈1% de desviación por
+# macronutriente); la búsqueda se detiene al encontrarlo
+PLAN_TOLERANCE = 1e-4
+
+Vector = Tuple[float, float, float, float]
+
+
+@dataclass
+class MealTarget:
+    """Meta diaria (kcal y gramos)"""
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+
+    @classmethod
+    def from_calories(
+        cls,
+        calories: float,
+        protein: Optional[float] = None,
+        carbs: Optional[float] = None,
+        fat: Optional[float] = None,
+    ) -> "MealTarget":
+        """Meta con el reparto 20% proteína / 50% carbohidratos / 30% grasa si no se indica"""
+        return cls(
+            calories=calories,
+            protein=protein if protein is not None else calories * 0.20 / 4,
+            carbs=carbs if carbs is not None else calories * 0.50 / 4,
+            fat=fat if fat is not None else calories * 0.30 / 9,
+        )
+
+    def vector(self) -> Vector:
+        return (self.calories, self.protein, self.carbs, self.fat)
+
+
+@dataclass
+class MealPlan:
+    """Resultado del optimizador"""
+    target: MealTarget
+    state: str
+    meals: Dict[str, Dict[str, Any]]
+    totals: Vector
+    error: float
+    relaxed: List[str] = field(default_factory=list)
+    evaluated: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "target": {macro: round(value, 1) for macro, value in zip(MACROS, self.target.vector())},
+            "totals": {macro: round(value, 1) for macro, value in zip(MACROS, self.totals)},
+            "error": round(self.error, 5),
+            "meals": self.meals,
+            "relaxed_state": self.relaxed,
+        }
+
+
+class _Group:
+    """Comidas de una (categoría, estado, tipo de tiempo) en columnas"""
+
+    def __init__(self):
+        self.foods: List[Dict[str, Any]] = []
+        self.columns = tuple(array("d") for _ in MACROS)
+
+    def add(self, food: Dict[str, Any], values: Vector):
+        self.foods.append(food)
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+
+def food_vector(food: Dict[str, Any]) -> Vector:
+    """(kcal, proteína, carbohidratos, grasa) de una comida del catálogo; ausente = 0"""
+    nutrients = food.get("nutrients", {})
+    return (
+        parse_amount(food.get("calories")) or 0.0,
+        parse_amount(nutrients.get(NUTRIENT_KEYS["protein"])) or 0.0,
+        parse_amount(nutrients.get(NUTRIENT_KEYS["carbs"])) or 0.0,
+        parse_amount(nutrients.get(NUTRIENT_KEYS["fat"])) or 0.0,
+    )
+
+
+def allowed_prep_times(prep_time: int) -> List[str]:
+    """Tipos de preparación que caben en los minutos disponibles"""
+    return [kind for kind, minutes in PREP_TIME_MINUTES.items() if minutes <= prep_time]
+
+
+class MealPlanner:
+    """
+    Optimizador de planes de comida sobre el catálogo.
+
+    Args:
+        catalog_loader: Función que devuelve las comidas del catálogo
+        version_fn: Función que devuelve la versión actual del catálogo
+        pool_size: Comidas por tiempo de comida en la búsqueda exacta
+    """
+
+    def __init__(
+        self,
+        catalog_loader: Callable[[], Iterable[Dict[str, Any]]] = load_catalog_foods,
+        version_fn: Callable[[], str] = catalog_version,
+        pool_size: int = POOL_SIZE,
+    ):
+        self._catalog_loader = catalog_loader
+        self._version_fn = version_fn
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._groups: Dict[Tuple[str, str, str], _Group] = {}
+
+    def _ensure_fresh(self):
+        version = self._version_fn()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            groups: Dict[Tuple[str, str, str], _Group] = {}
+            seen = set()
+            for food in self._catalog_loader():
+                name = food.get("prolog_name")
+                if not name or name in seen or food.get("category") not in SLOT_SHARES:
+                    continue
+                seen.add(name)
+                key = (food["category"], food.get("state", "normal"), food.get("prep_time", "medium"))
+                groups.setdefault(key, _Group()).add(food, food_vector(food))
+            self._groups = groups
+            self._version = version
+
+    # ------------------------------------------
+    # Paso 2: grupos de candidatos por tiempo de comida
+    # ------------------------------------------
+
+    def _pool(self, slot: str, states: Sequence[str], prep_times: Sequence[str], target: Vector) -> List[Tuple[Vector, Dict[str, Any]]]:
+        """Las pool_size comidas del tiempo de comida más cercanas a su parte de la meta"""
+        share = SLOT_SHARES[slot]
+        scaled = [w / (t * share) ** 2 if t > 0 else 0.0 for w, t in zip(OBJECTIVE_WEIGHTS, target)]
+        goal = [t * share for t in target]
+
+        scored = []
+        for state in states:
+            for prep_time in prep_times:
+                group = self._groups.get((slot, state, prep_time))
+                if group is None:
+                    continue
+                cal, protein, carbs, fat = group.columns
+                # Distancia por columnas (sin construir vectores por comida)
+                for i, (c, p, h, f) in enumerate(zip(cal, protein, carbs, fat)):
+                    distance = (scaled[0] * (c - goal[0]) ** 2 + scaled[1] * (p - goal[1]) ** 2
+                                + scaled[2] * (h - goal[2]) ** 2 + scaled[3] * (f - goal[3]) ** 2)
+                    scored.append((distance, i, group))
+
+        best = heapq.nsmallest(self.pool_size, scored, key=lambda entry: entry[0])
+        return [
+            (tuple(column[i] for column in group.columns), group.foods[i])
+            for _, i, group in best
+        ]
+
+    # ------------------------------------------
+    # Paso 3: meet-in-the-middle exacto sobre los grupos
+    # ------------------------------------------
+
+    @staticmethod
+    def _half(pools: List[List[Tuple[Vector, Dict[str, Any]]]]) -> List[Tuple[Vector, Tuple[int, ...]]]:
+        """Todas las combinaciones de una mitad como (suma de vectores, índices)"""
+        combos = []
+        for choice in itertools.product(*(range(len(pool)) for pool in pools)):
+            total = [0.0, 0.0, 0.0, 0.0]
+            for pool, index in zip(pools, choice):
+                vector = pool[index][0]
+                for j in range(4):
+                    total[j] += vector[j]
+            combos.append((tuple(total), choice))
+        return combos
+
+    def _search(
+        self,
+        slots: List[str],
+        pools: List[List[Tuple[Vector, Dict[str, Any]]]],
+        target: Vector,
+        tolerance: float,
+    ) -> Tuple[float, Tuple[int, ...], int]:
+        weights = [w / t ** 2 if t > 0 else 0.0 for w, t in zip(OBJECTIVE_WEIGHTS, target)]
+        w_cal = weights[0]
+        middle = len(pools) // 2
+        first_share = sum(SLOT_SHARES[slot] for slot in slots[:middle])
+        first_goal = [t * first_share for t in target]
+
+        def first_distance(combo: Tuple[Vector, Tuple[int, ...]]) -> float:
+            return sum(w * (x - g) ** 2 for w, x, g in zip(weights, combo[0], first_goal))
+
+        # Empezar por los pares más cercanos a su parte de la meta: la mejor
+        # solución baja rápido y la cota poda más
+        first = sorted(self._half(pools[:middle]), key=first_distance)
+        second = sorted(self._half(pools[middle:]), key=lambda combo: combo[0][0])
+        second_cal = [combo[0][0] for combo in second]
+        # Rango de cada macronutriente en la segunda mitad
+        low = [min(combo[0][j] for combo in second) for j in range(4)]
+        high = [max(combo[0][j] for combo in second) for j in range(4)]
+
+        # Cota inicial: la comida más cercana de cada grupo (el índice 0)
+        greedy = [sum(pool[0][0][j] for pool in pools) for j in range(4)]
+        best_error = sum(w * (x - t) ** 2 for w, x, t in zip(weights, greedy, target))
+        best_choice: Tuple[int, ...] = (0,) * len(pools)
+        evaluated = 0
+        for (a_cal, a_p, a_h, a_f), a_choice in first:
+            if best_error <= tolerance:
+                break
+            rest = (target[0] - a_cal, target[1] - a_p, target[2] - a_h, target[3] - a_f)
+            r_cal, r_p, r_h, r_f = rest
+            # Parte del error que ninguna combinación de la segunda mitad puede
+            # evitar: lo que queda fuera del rango de cada macronutriente
+            gaps = [max(low[j] - rest[j], rest[j] - high[j], 0.0) for j in range(4)]
+            floor = weights[1] * gaps[1] ** 2 + weights[2] * gaps[2] ** 2 + weights[3] * gaps[3] ** 2
+            if w_cal * gaps[0] ** 2 + floor >= best_error:
+                continue
+
+            start = bisect.bisect_left(second_cal, r_cal)
+            # Hacia arriba y hacia abajo en calorías desde el punto ideal; el
+            # término de calorías solo crece, así que con floor es una cota inferior
+            for indices in (range(start, len(second)), range(start - 1, -1, -1)):
+                for i in indices:
+                    (b_cal, b_p, b_h, b_f), b_choice = second[i]
+                    bound = w_cal * (b_cal - r_cal) ** 2
+                    if bound + floor >= best_error:
+                        break
+                    evaluated += 1
+                    error = (bound + weights[1] * (b_p - r_p) ** 2
+                             + weights[2] * (b_h - r_h) ** 2 + weights[3] * (b_f - r_f) ** 2)
+                    if error < best_error:
+                        best_error = error
+                        best_choice = a_choice + b_choice
+        return best_error, best_choice, evaluated
+
+    # ------------------------------------------
+    # Punto de entrada
+    # ------------------------------------------
+
+    def plan(
+        self,
+        target: MealTarget,
+        state: str = "normal",
+        prep_time: int = 45,
+        tolerance: float = PLAN_TOLERANCE,
+    ) -> Optional[MealPlan]:
+        """
+        Plan del día para la meta, el estado (de los sensores) y los minutos
+        disponibles por comida. Si para un tiempo de comida no hay opciones
+        con ese estado se usan las de cualquier estado (queda en `relaxed`).
+
+        La búsqueda termina en cuanto encuentra un plan con error menor o
+        igual a `tolerance` (0 = óptimo exacto sobre los grupos).
+
+        Returns:
+            El plan, o None si el catálogo no tiene comidas para ningún tiempo
+        """
+        self._ensure_fresh()
+        goal = target.vector()
+        prep_times = allowed_prep_times(prep_time)
+        all_states = sorted({key[1] for key in self._groups})
+
+        slots, pools, relaxed = [], [], []
+        for slot in SLOTS:
+            pool = self._pool(slot, [state], prep_times, goal)
+            if not pool:
+                pool = self._pool(slot, all_states, prep_times, goal)
+                if pool:
+                    relaxed.append(slot)
+            if pool:
+                slots.append(slot)
+                pools.append(pool)
+        if not pools:
+            return None
+
+        error, choice, evaluated = self._search(slots, pools, goal, tolerance)
+        meals, totals = {}, [0.0, 0.0, 0.0, 0.0]
+        for slot, pool, index in zip(slots, pools, choice):
+            vector, food = pool[index]
+            for j in range(4):
+                totals[j] += vector[j]
+            meals[slot] = {
+                "comida": food["prolog_name"],
+                "display_name": food.get("display_name", food["prolog_name"]),
+                "fdc_id": food.get("fdc_id"),
+                **{macro: round(value, 1) for macro, value in zip(MACROS, vector)},
+            }
+
+        return MealPlan(
+            target=target,
+            state=state,
+            meals=meals,
+            totals=tuple(totals),
+            error=error,
+            relaxed=relaxed,
+            evaluated=evaluated,
+        )
+
+
+# Instancia global (se crea bajo demanda)
+_meal_planner: Optional[MealPlanner] = None
+
+
+def get_meal_planner() -> MealPlanner:
+    """Obtiene o crea el optimizador compartido por los endpoints"""
+    global _meal_planner
+    if _meal_planner is None:
+        _meal_planner = MealPlanner()
+    return _meal_planner
@@ -0,0 +1,260 @@
+"""
+📈 metrics.py
+Métricas en formato de texto de Prometheus (expuestas en /metrics).
+
+Implementación mínima sin dependencias:
+- Counter: contador que solo sube
+- Histogram: latencias con buckets acumulativos (_bucket, _sum, _count)
+- Collector: función que se llama al exportar (p. ej. estadísticas de caches)
+
+Cada combinación de etiquetas se resuelve una vez a un objeto hijo; en el
+camino caliente solo se hace un bisect y dos sumas bajo un lock propio, así
+que se puede dejar activo en producción.
+
+Uso:
+    REQUESTS = counter("app_requests_total", "Peticiones", ["endpoint"])
+    REQUESTS.labels(endpoint="chat").inc()
+
+    LATENCY = histogram("app_latency_seconds", "Latencia", ["stage"])
+    with LATENCY.labels(stage="prolog").time():
+        ...
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Buckets por defecto (segundos): de 1 ms a 30 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (nombre, etiquetas, valor) que devuelve un Collector
+Sample = Tuple[str, Dict[str, str], float]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Métrica con etiquetas: cada combinación de valores es un hijo"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Atajo para contadores sin etiquetas"""
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, key)), child.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observa la duración del bloque en segundos"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Atajo para histogramas sin etiquetas"""
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Collector:
+    """
+    Métricas calculadas al exportar (estadísticas que ya llevan otros módulos).
+
+    Args:
+        fn: Función que devuelve muestras (nombre, etiquetas, valor)
+        types: Tipo y ayuda de cada nombre de métrica: {nombre: (tipo, ayuda)}
+    """
+
+    def __init__(self, fn: Callable[[], Iterable[Sample]], types: Dict[str, Tuple[str, str]]):
+        self.fn = fn
+        self.types = types
+
+    def render(self) -> List[str]:
+        by_name: Dict[str, List[str]] = {name: [] for name in self.types}
+        for name, labels, value in self.fn():
+            by_name.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        lines = []
+        for name, samples in by_name.items():
+            kind, documentation = self.types.get(name, ("gauge", ""))
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"] + samples
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas que se exportan juntas"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric, key: Optional[str] = None):
+        """Registra una métrica; si ya existe con ese nombre devuelve la existente"""
+        key = key or metric.name
+        with self._lock:
+            return self._metrics.setdefault(key, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines += metric.render()
+            except Exception as e:  # un collector roto no debe tumbar /metrics
+                lines.append(f"# error en {getattr(metric, 'name', 'collector')}: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def collector(key: str, fn: Callable[[], Iterable[Sample]], types: Dict[str, Tuple[str, str]]) -> Collector:
+    return REGISTRY.register(Collector(fn, types), key=key)
+
+
+def render() -> str:
+    """Todas las métricas en formato de texto de Prometheus"""
+    return REGISTRY.render()
+
+
+# ============================================
+# Métricas compartidas por los módulos del backend
+# ============================================
+
+DIALOGFLOW_SECONDS = histogram(
+    "dialogflow_request_seconds", "Tiempo de ida y vuelta a Dialogflow (detect_intent)", ["outcome"])
+PROLOG_CONSULT_SECONDS = histogram(
+    "prolog_consult_seconds", "Tiempo de consult() de los archivos Prolog")
+PROLOG_QUERY_SECONDS = histogram(
+    "prolog_query_seconds", "Tiempo de las consultas Prolog por predicado", ["predicate"])
+FDC_REQUEST_SECONDS = histogram(
+    "fdc_request_seconds", "Latencia de las llamadas a FoodData Central por endpoint", ["endpoint", "outcome"])
+ENRICHMENT_SECONDS = histogram(
+    "enrichment_seconds", "Tiempo de enriquecer las recomendaciones con datos nutricionales", ["endpoint"])
+CHAT_SECONDS = histogram(
+    "chat_request_seconds", "Latencia de extremo a extremo del chat por intención", ["endpoint", "intent"])
+SENSOR_READINGS = counter(
+    "sensor_readings_total", "Lecturas de sensores recibidas")
+ADMISSION_SHED = counter(
+    "admission_shed_total", "Peticiones descartadas por el control de admisión", ["endpoint", "reason"])
+ADMISSION_WAIT_SECONDS = histogram(
+    "admission_wait_seconds", "Espera en la cola del control de admisión", ["endpoint"])
+RATE_LIMITED = counter(
+    "rate_limited_total", "Peticiones o llamadas externas rechazadas por límite de tasa", ["limiter"])
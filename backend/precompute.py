@@ -0,0 +1,180 @@
+"""
+⚡ precompute.py
+Recomendaciones calculadas en segundo plano cuando cambia el contexto de
+un usuario, y canal para empujarlas al frontend.
+
+El contexto de recomendación (clima, estado) solo cambia cuando una lectura
+de sensores cruza un umbral (oxígeno 94, temperatura 20). /sensors detecta
+esa transición y encola un trabajo; un hilo lo ejecuta (recomendar,
+enriquecer, dejar la respuesta en los caches) y publica el resultado:
+
+- Precomputer: cola de trabajos por usuario que se fusionan (si llegan
+  varias transiciones antes de procesarse, solo cuenta la última lectura).
+- Subscribers: colas asyncio por usuario para los WebSocket abiertos. El
+  hilo publica con call_soon_threadsafe; un cliente lento pierde los
+  mensajes viejos, no bloquea al resto.
+
+Configuración: PRECOMPUTE_ENABLED.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "1") == "1"
+# Usuarios con trabajo pendiente como máximo (si se llena se descarta el nuevo)
+MAX_PENDING = 10000
+# Mensajes sin leer por WebSocket antes de descartar los más viejos
+SUBSCRIBER_QUEUE_SIZE = 8
+
+Job = Callable[[str, Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class Subscribers:
+    """Colas de los WebSocket abiertos por usuario (viven en el event loop)"""
+
+    def __init__(self):
+        self._queues: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._queues.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        with self._lock:
+            entries = self._queues.get(user_id, set())
+            entries.difference_update({entry for entry in entries if entry[1] is queue})
+            if not entries:
+                self._queues.pop(user_id, None)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: Dict[str, Any]):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    def publish(self, user_id: str, message: Dict[str, Any]) -> int:
+        """Envía el mensaje a los WebSocket del usuario (desde cualquier hilo)"""
+        with self._lock:
+            entries = list(self._queues.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:  # loop cerrado
+                continue
+        self.published += len(entries)
+        return len(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._queues),
+                "connections": sum(len(entries) for entries in self._queues.values()),
+                "published": self.published,
+            }
+
+
+class Precomputer:
+    """
+    Ejecuta `job(user_id, lectura)` en un hilo y publica lo que devuelve.
+
+    Args:
+        job: Calcula y cachea las recomendaciones; devuelve el mensaje a
+            publicar (o None si no hay nada que avisar)
+        subscribers: Destino de los mensajes
+    """
+
+    def __init__(self, job: Job, subscribers: Subscribers):
+        self.job = job
+        self.subscribers = subscribers
+        # user_id -> última lectura pendiente (en orden de llegada)
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_ms = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="precompute", daemon=True)
+            self._worker.start()
+
+    def submit(self, user_id: str, data: Dict[str, Any]) -> bool:
+        """Encola el recálculo del usuario (no espera). False si se descartó"""
+        with self._cond:
+            if self._stopped:
+                return False
+            self._ensure_worker()
+            self.submitted += 1
+            if user_id in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= MAX_PENDING:
+                self.dropped += 1
+                return False
+            self._pending[user_id] = data
+            self._cond.notify()
+        return True
+
+    def _next(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            return self._pending.popitem(last=False)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            user_id, data = item
+            start = time.perf_counter()
+            try:
+                message = self.job(user_id, data)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error precalculando recomendaciones de {user_id}: {e}")
+                continue
+            finally:
+                self.last_ms = round((time.perf_counter() - start) * 1000, 2)
+            if message is not None:
+                self.subscribers.publish(user_id, message)
+
+    def close(self):
+        """Descarta lo pendiente y detiene el hilo (al apagar la API)"""
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": PRECOMPUTE_ENABLED,
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "last_ms": self.last_ms,
+            "subscribers": self.subscribers.stats(),
+        }
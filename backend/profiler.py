@@ -0,0 +1,291 @@
+"""
+🔥 profiler.py
+Perfiles del proceso en ejecución (detrás de /admin/profile/*).
+
+- CPU: muestreo estadístico. Un hilo toma cada `interval` las pilas de
+  todos los hilos (sys._current_frames) y las acumula en formato "folded"
+  (`frame;frame;frame N`), compatible con flamegraph.pl y speedscope.
+- Memoria: tracemalloc durante una ventana de tiempo; devuelve los
+  principales puntos de asignación y las pilas en formato folded
+  ponderadas por bytes.
+
+Cada pila se etiqueta con la ruta caliente a la que pertenece (chat,
+sensors, precompute, prolog, food_api) según los frames que contiene, así se ve de
+un vistazo qué parte del trabajo real consume el tiempo o la memoria.
+
+Salvaguardas: deshabilitado salvo PROFILER_ENABLED=1, duración máxima
+PROFILER_MAX_SECONDS, un solo perfil a la vez y el propio hilo de muestreo
+se detiene al vencer el plazo aunque la petición se cancele.
+"""
+
+import ast
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Tuple
+
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+DEFAULT_INTERVAL = 0.005
+MIN_INTERVAL = 0.001
+MAX_STACK_DEPTH = 128
+TRACEMALLOC_FRAMES = 25
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Rutas calientes: (etiqueta, archivos y funciones que la identifican).
+# Se asigna la etiqueta de la primera regla que coincide desde la raíz de la
+# pila, así una consulta Prolog hecha desde el chat cuenta como "chat".
+HOT_PATHS: List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]] = [
+    ("chat", ("main.py",), ("chat_interaction", "answer_chat", "_chat_event_stream", "resolve_intent", "recommend_varied")),
+    ("sensors", ("main.py", "sensors.py"), ("receive_sensor_data",)),
+    ("precompute", ("precompute.py",), ()),
+    ("prolog", ("prolog_engine.py", "prolog.py"), ()),
+    ("food_api", ("food_api.py", "fdc_local.py"), ()),
+]
+
+# Hojas de pila de hilos que solo esperan (se descartan salvo include_idle)
+IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"), ("thread.py", "_worker"),
+}
+
+_session_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Ya hay un perfil en curso"""
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(BACKEND_DIR):
+        return os.path.relpath(filename, BACKEND_DIR)
+    return os.path.basename(filename)
+
+
+def tag_stack(frames: List[Tuple[str, str]]) -> str:
+    """Ruta caliente de una pila [(archivo, función)] ordenada desde la raíz"""
+    for filename, function in frames:
+        base = os.path.basename(filename)
+        for tag, files, functions in HOT_PATHS:
+            if base in files and (not functions or function in functions):
+                return tag
+    return "other"
+
+
+def _stack_of(frame, limit: int = MAX_STACK_DEPTH) -> List[Tuple[str, str]]:
+    """Pila [(archivo, función)] desde la raíz hasta el frame dado"""
+    stack = []
+    while frame is not None and len(stack) < limit:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _folded(stack: List[Tuple[str, str]], tag: str) -> str:
+    return ";".join([f"[{tag}]"] + [f"{_short_path(filename)}:{function}" for filename, function in stack])
+
+
+@contextmanager
+def _exclusive() -> Iterator[None]:
+    if not PROFILER_ENABLED:
+        raise PermissionError("El profiler está deshabilitado (PROFILER_ENABLED=1 para activarlo)")
+    if not _session_lock.acquire(blocking=False):
+        raise ProfilerBusy("Ya hay un perfil en curso")
+    try:
+        yield
+    finally:
+        _session_lock.release()
+
+
+def clamp_seconds(seconds: float) -> float:
+    return max(0.1, min(float(seconds), PROFILER_MAX_SECONDS))
+
+
+# ============================================
+# CPU
+# ============================================
+
+@dataclass
+class CpuProfile:
+    """Resultado de un muestreo de CPU"""
+    seconds: float
+    interval: float
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    tags: Counter = field(default_factory=Counter)
+    leaves: Counter = field(default_factory=Counter)
+
+    def folded(self) -> str:
+        """Pilas en formato folded (una por línea: `frames N`)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def to_dict(self, top: int = 25) -> Dict[str, Any]:
+        total = sum(self.tags.values()) or 1
+        return {
+            "seconds": round(self.seconds, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "tags": {tag: {"samples": count, "ratio": round(count / total, 4)}
+                     for tag, count in self.tags.most_common()},
+            "top_functions": [{"frame": frame, "samples": count}
+                              for frame, count in self.leaves.most_common(top)],
+            "folded": self.folded(),
+        }
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: CpuProfile, deadline: float, include_idle: bool):
+        super().__init__(name="cpu-profiler", daemon=True)
+        self.profile = profile
+        self.deadline = deadline
+        self.include_idle = include_idle
+        self.stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        profile = self.profile
+        while not self.stop_event.is_set() and time.monotonic() < self.deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _stack_of(frame)
+                if not stack:
+                    continue
+                leaf_file, leaf_function = stack[-1]
+                if not self.include_idle and (os.path.basename(leaf_file), leaf_function) in IDLE_LEAVES:
+                    continue
+                tag = tag_stack(stack)
+                profile.stacks[_folded(stack, tag)] += 1
+                profile.tags[tag] += 1
+                profile.leaves[f"{_short_path(leaf_file)}:{leaf_function}"] += 1
+            profile.samples += 1
+            self.stop_event.wait(profile.interval)
+
+
+def profile_cpu(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False) -> CpuProfile:
+    """
+    Muestrea las pilas de todos los hilos durante `seconds` (bloquea).
+
+    Raises:
+        PermissionError: Si el profiler está deshabilitado
+        ProfilerBusy: Si ya hay otro perfil en curso
+    """
+    with _exclusive():
+        seconds = clamp_seconds(seconds)
+        profile = CpuProfile(seconds=seconds, interval=max(MIN_INTERVAL, interval))
+        sampler = _Sampler(profile, time.monotonic() + seconds, include_idle)
+        sampler.start()
+        try:
+            sampler.join(seconds + 1.0)
+        finally:
+            sampler.stop_event.set()
+            sampler.join()
+        return profile
+
+
+# ============================================
+# Memoria
+# ============================================
+
+@lru_cache(maxsize=256)
+def _function_spans(filename: str) -> Tuple[Tuple[int, int, str], ...]:
+    """(primera línea, última línea, nombre) de las funciones de un archivo"""
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return ()
+    return tuple(
+        (node.lineno, node.end_lineno or node.lineno, node.name)
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    )
+
+
+def _function_at(filename: str, lineno: int) -> str:
+    """Función más interna que contiene la línea (tracemalloc solo guarda archivo y línea)"""
+    best = ("<module>", -1)
+    for start, end, name in _function_spans(filename):
+        if start <= lineno <= end and start > best[1]:
+            best = (name, start)
+    return best[0]
+
+
+def profile_memory(seconds: float, top: int = 25) -> Dict[str, Any]:
+    """
+    Registra las asignaciones hechas durante `seconds` (bloquea).
+
+    Si tracemalloc ya estaba activo (p. ej. PYTHONTRACEMALLOC) se reutiliza
+    y no se detiene al terminar.
+    """
+    with _exclusive():
+        seconds = clamp_seconds(seconds)
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot()
+            time.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, __file__),
+    ]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+
+    tags: Counter = Counter()
+    stacks: Counter = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if stat.size_diff <= 0:
+            continue
+        # Desde Python 3.7 los frames de tracemalloc van de la raíz a la hoja
+        frames = [(frame.filename, frame.lineno) for frame in stat.traceback]
+        named = [(filename, _function_at(filename, lineno)) for filename, lineno in frames]
+        tag = tag_stack(named)
+        tags[tag] += stat.size_diff
+        stacks[";".join([f"[{tag}]"] + [
+            f"{_short_path(filename)}:{function}:{lineno}"
+            for (filename, lineno), (_, function) in zip(frames, named)
+        ])] += stat.size_diff
+
+    top_allocators = [
+        {
+            "location": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+            "size_kb": round(stat.size / 1024, 1),
+        }
+        for stat in after.compare_to(before, "lineno")[:top]
+    ]
+    return {
+        "seconds": round(seconds, 3),
+        "traced_current_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "tags_kb": {tag: round(size / 1024, 1) for tag, size in tags.most_common()},
+        "top_allocators": top_allocators,
+        "folded": "".join(f"{stack} {size}\n" for stack, size in stacks.most_common()),
+    }
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "enabled": PROFILER_ENABLED,
+        "running": _session_lock.locked(),
+        "max_seconds": PROFILER_MAX_SECONDS,
+    }
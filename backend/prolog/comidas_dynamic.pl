@@ -11,6 +11,10 @@
 % TimeType: quick | medium | long
 % Category: breakfast | lunch | dinner | snack
 
+:- dynamic comida/7, food_display_name/2, food_fdc_id/2.
+:- dynamic comida_by_ctx/4, comida_by_calories/3, comida_calorie_buckets/2, comida_index_version/1.
+:- dynamic comida_by_category/2, comida_count/1, comida_category_stats/4.
+
 % --- BREAKFAST (34) ---
 comida(oatmeal, warm, low_oxygen, medium, breakfast, 1580, '1995469').
 comida(oatmeal, warm, low_oxygen, medium, breakfast, 378, '2503998').
@@ -280,3 +284,259 @@ food_fdc_id(popcorn, '2080653').
 food_fdc_id(popcorn, '2041350').
 food_fdc_id(yogurt, '463067').
 food_fdc_id(yogurt, '2554062').
+
+% Índice por contexto: comida_by_ctx(Climate, State, TimeType, Food)
+comida_by_ctx(cold, low_oxygen, long, chicken_chicken_roll_roasted).
+comida_by_ctx(cold, low_oxygen, long, roasted_chicken).
+comida_by_ctx(cold, normal, medium, soup).
+comida_by_ctx(hot, low_oxygen, medium, chicken_salad).
+comida_by_ctx(hot, low_oxygen, quick, lamb_new_zealand_imported_loin_chop_separable_lean).
+comida_by_ctx(hot, normal, medium, chicken_salad).
+comida_by_ctx(hot, normal, medium, fruit_salad).
+comida_by_ctx(hot, normal, medium, taco_bell_taco_salad).
+comida_by_ctx(hot, normal, medium, tuna_salad_sandwich_on_white).
+comida_by_ctx(hot, normal, medium, tuna_salad_sandwich_wrap).
+comida_by_ctx(hot, normal, quick, avocado_raw).
+comida_by_ctx(hot, normal, quick, fruit_smoothie_light).
+comida_by_ctx(hot, normal, quick, vegetable_smoothie).
+comida_by_ctx(warm, low_oxygen, medium, almonds).
+comida_by_ctx(warm, low_oxygen, medium, bagel).
+comida_by_ctx(warm, low_oxygen, medium, bagel_multigrain).
+comida_by_ctx(warm, low_oxygen, medium, burrito).
+comida_by_ctx(warm, low_oxygen, medium, cheese).
+comida_by_ctx(warm, low_oxygen, medium, crackers).
+comida_by_ctx(warm, low_oxygen, medium, enchiladas).
+comida_by_ctx(warm, low_oxygen, medium, fish_bass_grilled).
+comida_by_ctx(warm, low_oxygen, medium, fish_sandwich_grilled).
+comida_by_ctx(warm, low_oxygen, medium, hummus).
+comida_by_ctx(warm, low_oxygen, medium, lamb_chop).
+comida_by_ctx(warm, low_oxygen, medium, mexican_pizza).
+comida_by_ctx(warm, low_oxygen, medium, oatmeal).
+comida_by_ctx(warm, low_oxygen, medium, pasta).
+comida_by_ctx(warm, low_oxygen, medium, pork_chops).
+comida_by_ctx(warm, low_oxygen, medium, quinoa_uncooked).
+comida_by_ctx(warm, low_oxygen, medium, salmon).
+comida_by_ctx(warm, low_oxygen, medium, taco_bell_soft_taco_with_steak).
+comida_by_ctx(warm, low_oxygen, medium, turkey_breast).
+comida_by_ctx(warm, low_oxygen, medium, veggie_burger).
+comida_by_ctx(warm, low_oxygen, quick, protein_bar).
+comida_by_ctx(warm, normal, medium, almonds).
+comida_by_ctx(warm, normal, medium, apple).
+comida_by_ctx(warm, normal, medium, avocado_dressing).
+comida_by_ctx(warm, normal, medium, banana).
+comida_by_ctx(warm, normal, medium, beef_curry).
+comida_by_ctx(warm, normal, medium, breakfast_burrito).
+comida_by_ctx(warm, normal, medium, burrito).
+comida_by_ctx(warm, normal, medium, burrito_bowl_chicken_with_rice).
+comida_by_ctx(warm, normal, medium, carrots).
+comida_by_ctx(warm, normal, medium, crackers).
+comida_by_ctx(warm, normal, medium, curry).
+comida_by_ctx(warm, normal, medium, dessert_pizza).
+comida_by_ctx(warm, normal, medium, egg_whole_cooked_scrambled).
+comida_by_ctx(warm, normal, medium, enchilada_beef).
+comida_by_ctx(warm, normal, medium, fish_wrap_sandwich).
+comida_by_ctx(warm, normal, medium, french_toast).
+comida_by_ctx(warm, normal, medium, grilled_chicken).
+comida_by_ctx(warm, normal, medium, ham_sandwich_wrap).
+comida_by_ctx(warm, normal, medium, hummus).
+comida_by_ctx(warm, normal, medium, mcdonalds_fruit_n_yogurt_parfait_without_granola).
+comida_by_ctx(warm, normal, medium, pancakes).
+comida_by_ctx(warm, normal, medium, pasta_primavera).
+comida_by_ctx(warm, normal, medium, pepper_steak).
+comida_by_ctx(warm, normal, medium, popcorn).
+comida_by_ctx(warm, normal, medium, primavera_pasta).
+comida_by_ctx(warm, normal, medium, quinoa_cooked).
+comida_by_ctx(warm, normal, medium, rice_bowl).
+comida_by_ctx(warm, normal, medium, scrambled_eggs).
+comida_by_ctx(warm, normal, medium, steak).
+comida_by_ctx(warm, normal, medium, vegetable_stir_fry).
+comida_by_ctx(warm, normal, medium, veggie_burger).
+comida_by_ctx(warm, normal, medium, yogurt).
+comida_by_ctx(warm, normal, medium, yogurt_parfait_lowfat_with_fruit_and_granola).
+
+% Índice por calorías: comida_by_calories(Cal // 100, Cal, Food)
+comida_by_calories(0, 0, curry).
+comida_by_calories(0, 24, vegetable_stir_fry).
+comida_by_calories(0, 37, soup).
+comida_by_calories(0, 37, vegetable_stir_fry).
+comida_by_calories(0, 38, carrots).
+comida_by_calories(0, 46, apple).
+comida_by_calories(0, 52, apple).
+comida_by_calories(0, 53, fruit_smoothie_light).
+comida_by_calories(0, 62, yogurt).
+comida_by_calories(0, 80, soup).
+comida_by_calories(0, 82, pasta_primavera).
+comida_by_calories(0, 84, yogurt_parfait_lowfat_with_fruit_and_granola).
+comida_by_calories(0, 89, turkey_breast).
+comida_by_calories(0, 89, vegetable_smoothie).
+comida_by_calories(0, 90, mcdonalds_fruit_n_yogurt_parfait_without_granola).
+comida_by_calories(0, 94, yogurt).
+comida_by_calories(1, 113, beef_curry).
+comida_by_calories(1, 113, scrambled_eggs).
+comida_by_calories(1, 119, roasted_chicken).
+comida_by_calories(1, 120, quinoa_cooked).
+comida_by_calories(1, 123, turkey_breast).
+comida_by_calories(1, 125, pork_chops).
+comida_by_calories(1, 139, salmon).
+comida_by_calories(1, 143, fish_bass_grilled).
+comida_by_calories(1, 145, pepper_steak).
+comida_by_calories(1, 149, egg_whole_cooked_scrambled).
+comida_by_calories(1, 149, rice_bowl).
+comida_by_calories(1, 155, burrito_bowl_chicken_with_rice).
+comida_by_calories(1, 160, avocado_raw).
+comida_by_calories(1, 164, chicken_chicken_roll_roasted).
+comida_by_calories(1, 175, french_toast).
+comida_by_calories(1, 180, fish_sandwich_grilled).
+comida_by_calories(1, 191, enchilada_beef).
+comida_by_calories(1, 194, burrito).
+comida_by_calories(1, 195, french_toast).
+comida_by_calories(1, 198, breakfast_burrito).
+comida_by_calories(1, 198, veggie_burger).
+comida_by_calories(12, 1250, lamb_new_zealand_imported_loin_chop_separable_lean).
+comida_by_calories(15, 1540, quinoa_uncooked).
+comida_by_calories(15, 1580, oatmeal).
+comida_by_calories(2, 204, dessert_pizza).
+comida_by_calories(2, 204, pancakes).
+comida_by_calories(2, 212, burrito).
+comida_by_calories(2, 216, breakfast_burrito).
+comida_by_calories(2, 217, grilled_chicken).
+comida_by_calories(2, 218, tuna_salad_sandwich_on_white).
+comida_by_calories(2, 225, grilled_chicken).
+comida_by_calories(2, 225, taco_bell_soft_taco_with_steak).
+comida_by_calories(2, 226, pork_chops).
+comida_by_calories(2, 230, ham_sandwich_wrap).
+comida_by_calories(2, 232, salmon).
+comida_by_calories(2, 244, tuna_salad_sandwich_wrap).
+comida_by_calories(2, 247, almonds).
+comida_by_calories(2, 249, mexican_pizza).
+comida_by_calories(2, 250, bagel_multigrain).
+comida_by_calories(2, 250, hummus).
+comida_by_calories(2, 262, fish_wrap_sandwich).
+comida_by_calories(2, 263, enchiladas).
+comida_by_calories(2, 264, bagel).
+comida_by_calories(2, 264, lamb_chop).
+comida_by_calories(2, 274, pancakes).
+comida_by_calories(2, 280, chicken_salad).
+comida_by_calories(2, 294, protein_bar).
+comida_by_calories(3, 300, fruit_salad).
+comida_by_calories(3, 312, banana).
+comida_by_calories(3, 319, chicken_salad).
+comida_by_calories(3, 321, hummus).
+comida_by_calories(3, 329, veggie_burger).
+comida_by_calories(3, 331, cheese).
+comida_by_calories(3, 333, fruit_salad).
+comida_by_calories(3, 336, banana).
+comida_by_calories(3, 340, pasta).
+comida_by_calories(3, 350, protein_bar).
+comida_by_calories(3, 357, primavera_pasta).
+comida_by_calories(3, 375, pasta).
+comida_by_calories(3, 378, oatmeal).
+comida_by_calories(4, 427, avocado_dressing).
+comida_by_calories(4, 429, crackers).
+comida_by_calories(5, 500, cheese).
+comida_by_calories(5, 500, crackers).
+comida_by_calories(5, 515, popcorn).
+comida_by_calories(5, 556, steak).
+comida_by_calories(5, 571, popcorn).
+comida_by_calories(6, 633, almonds).
+comida_by_calories(7, 710, taco_bell_taco_salad).
+comida_calorie_buckets(0, 15).
+
+% Comidas por categoría: comida_by_category(Category, Food)
+comida_by_category(breakfast, oatmeal).
+comida_by_category(breakfast, oatmeal).
+comida_by_category(breakfast, scrambled_eggs).
+comida_by_category(breakfast, egg_whole_cooked_scrambled).
+comida_by_category(lunch, avocado_dressing).
+comida_by_category(snack, avocado_raw).
+comida_by_category(breakfast, yogurt_parfait_lowfat_with_fruit_and_granola).
+comida_by_category(breakfast, mcdonalds_fruit_n_yogurt_parfait_without_granola).
+comida_by_category(breakfast, pancakes).
+comida_by_category(breakfast, pancakes).
+comida_by_category(breakfast, fruit_salad).
+comida_by_category(breakfast, fruit_salad).
+comida_by_category(breakfast, vegetable_smoothie).
+comida_by_category(breakfast, fruit_smoothie_light).
+comida_by_category(breakfast, bagel).
+comida_by_category(breakfast, bagel_multigrain).
+comida_by_category(breakfast, french_toast).
+comida_by_category(breakfast, french_toast).
+comida_by_category(snack, breakfast_burrito).
+comida_by_category(breakfast, breakfast_burrito).
+comida_by_category(lunch, chicken_salad).
+comida_by_category(lunch, chicken_salad).
+comida_by_category(snack, quinoa_cooked).
+comida_by_category(dinner, quinoa_uncooked).
+comida_by_category(lunch, tuna_salad_sandwich_on_white).
+comida_by_category(lunch, tuna_salad_sandwich_wrap).
+comida_by_category(lunch, pasta).
+comida_by_category(lunch, pasta).
+comida_by_category(lunch, rice_bowl).
+comida_by_category(lunch, burrito_bowl_chicken_with_rice).
+comida_by_category(breakfast, burrito).
+comida_by_category(snack, burrito).
+comida_by_category(lunch, fish_wrap_sandwich).
+comida_by_category(lunch, ham_sandwich_wrap).
+comida_by_category(dinner, soup).
+comida_by_category(dinner, soup).
+comida_by_category(breakfast, dessert_pizza).
+comida_by_category(breakfast, mexican_pizza).
+comida_by_category(dinner, grilled_chicken).
+comida_by_category(dinner, grilled_chicken).
+comida_by_category(breakfast, salmon).
+comida_by_category(snack, salmon).
+comida_by_category(breakfast, veggie_burger).
+comida_by_category(breakfast, veggie_burger).
+comida_by_category(dinner, fish_sandwich_grilled).
+comida_by_category(dinner, fish_bass_grilled).
+comida_by_category(dinner, roasted_chicken).
+comida_by_category(dinner, chicken_chicken_roll_roasted).
+comida_by_category(dinner, steak).
+comida_by_category(dinner, pepper_steak).
+comida_by_category(snack, vegetable_stir_fry).
+comida_by_category(snack, vegetable_stir_fry).
+comida_by_category(lunch, pasta_primavera).
+comida_by_category(lunch, primavera_pasta).
+comida_by_category(snack, curry).
+comida_by_category(snack, beef_curry).
+comida_by_category(lunch, taco_bell_taco_salad).
+comida_by_category(dinner, taco_bell_soft_taco_with_steak).
+comida_by_category(breakfast, enchiladas).
+comida_by_category(snack, enchilada_beef).
+comida_by_category(breakfast, pork_chops).
+comida_by_category(snack, pork_chops).
+comida_by_category(snack, turkey_breast).
+comida_by_category(snack, turkey_breast).
+comida_by_category(breakfast, lamb_chop).
+comida_by_category(dinner, lamb_new_zealand_imported_loin_chop_separable_lean).
+comida_by_category(dinner, almonds).
+comida_by_category(breakfast, almonds).
+comida_by_category(snack, protein_bar).
+comida_by_category(snack, protein_bar).
+comida_by_category(snack, apple).
+comida_by_category(snack, apple).
+comida_by_category(breakfast, banana).
+comida_by_category(breakfast, banana).
+comida_by_category(snack, carrots).
+comida_by_category(snack, carrots).
+comida_by_category(breakfast, hummus).
+comida_by_category(breakfast, hummus).
+comida_by_category(lunch, cheese).
+comida_by_category(breakfast, cheese).
+comida_by_category(lunch, crackers).
+comida_by_category(lunch, crackers).
+comida_by_category(lunch, popcorn).
+comida_by_category(lunch, popcorn).
+comida_by_category(breakfast, yogurt).
+comida_by_category(breakfast, yogurt).
+
+% Agregados: comida_count(Total),
+% comida_category_stats(Category, Count, CalorieCount, TotalCalories)
+% (CalorieCount: comidas con calorías numéricas, las que suman TotalCalories)
+comida_count(86).
+comida_category_stats(breakfast, 34, 34, 8877).
+comida_category_stats(lunch, 19, 19, 6663).
+comida_category_stats(snack, 19, 19, 2331).
+comida_category_stats(dinner, 14, 14, 5514).
+
+comida_index_version(4).
@@ -11,7 +11,124 @@
 % NOTA: Ahora comida/7 incluye FdcId como último parámetro
 % comida(Name, Climate, State, TimeType, Category, Calories, FdcId)
 
+/* ===========================================
+   🗂️ HECHOS ÍNDICE
+   comidas_dynamic.pl incluye, además de comida/7, hechos cuyo primer
+   argumento es el que se consulta (SWI-Prolog indexa por el primer
+   argumento, y por los siguientes solo bajo demanda):
+     comida_by_ctx(Climate, State, TimeType, Food)
+     comida_by_calories(Bucket, Calories, Food)   % Bucket = floor(Calories) // 100
+     comida_calorie_buckets(MinBucket, MaxBucket)
+     comida_by_category(Category, Food)
+   y los agregados materializados comida_count/1 y comida_category_stats/4.
+   Si no existen (comidas.pl estático o archivo de una versión anterior,
+   ver PROLOG_INDEX_VERSION en catalog.py) se recorre comida/7.
+   =========================================== */
+
+comida_index_ready :-
+    current_predicate(comida_index_version/1),
+    comida_index_version(4).
+
+% Pares (Food, Cal) distintos con calorías en [Min, Max] según comida_by_calories/3
+% (solo recorre los rangos de 100 kcal necesarios)
+calorie_index_between(Min, Max, Food, Cal) :-
+    comida_calorie_buckets(Lowest, Highest),
+    From is max(Lowest, floor(Min) div 100),
+    To is min(Highest, floor(Max) div 100),
+    between(From, To, Bucket),
+    comida_by_calories(Bucket, Cal, Food),
+    Cal >= Min,
+    Cal =< Max.
+
+% Comidas con calorías en [Min, Max]: una solución por hecho comida/7, como
+% al recorrerlo (cada par del índice se cruza con comida/7 con el nombre
+% ligado), aunque ordenadas por rango de calorías
+comida_calories_between(Min, Max, Food, Cal) :-
+    comida_index_ready, number(Min), number(Max), !,
+    calorie_index_between(Min, Max, Food, Cal),
+    comida(Food, _, _, _, _, Cal, _).
+comida_calories_between(Min, Max, Food, Cal) :-
+    comida(Food, _, _, _, _, Cal, _),
+    Cal >= Min,
+    Cal =< Max.
+
+% Mantener índices y agregados al agregar o quitar comidas en tiempo de ejecución
+% (PrologEngine.assertz/retract usan add_comida/7 y retract_comida/7)
+add_comida(Food, Climate, State, TimeType, Category, Cal, FdcId) :-
+    assertz(comida(Food, Climate, State, TimeType, Category, Cal, FdcId)),
+    (   comida_index_ready
+    ->  index_comida(Food, Climate, State, TimeType, Cal),
+        assertz(comida_by_category(Category, Food)),
+        update_comida_stats(Category, Cal, 1)
+    ;   true
+    ).
+
+index_comida(Food, Climate, State, TimeType, Cal) :-
+    (   comida_by_ctx(Climate, State, TimeType, Food)
+    ->  true
+    ;   assertz(comida_by_ctx(Climate, State, TimeType, Food))
+    ),
+    (   number(Cal), \+ comida_by_calories(_, Cal, Food)
+    ->  Bucket is floor(Cal) div 100,
+        assertz(comida_by_calories(Bucket, Cal, Food)),
+        (   retract(comida_calorie_buckets(Lowest, Highest))
+        ->  NewLowest is min(Lowest, Bucket), NewHighest is max(Highest, Bucket)
+        ;   NewLowest = Bucket, NewHighest = Bucket
+        ),
+        assertz(comida_calorie_buckets(NewLowest, NewHighest))
+    ;   true
+    ).
+
+% Delta = 1 al agregar una comida, -1 al quitarla. CalCount y Total cuentan
+% y suman solo las comidas con calorías numéricas (la población del promedio)
+update_comida_stats(Category, Cal, Delta) :-
+    (   retract(comida_count(Count0)) -> true ; Count0 = 0 ),
+    Count is Count0 + Delta,
+    assertz(comida_count(Count)),
+    (   retract(comida_category_stats(Category, CatCount0, CalCount0, Total0))
+    ->  true
+    ;   CatCount0 = 0, CalCount0 = 0, Total0 = 0
+    ),
+    CatCount is CatCount0 + Delta,
+    (   number(Cal)
+    ->  CalCount is CalCount0 + Delta, Total is Total0 + Delta * Cal
+    ;   CalCount = CalCount0, Total = Total0
+    ),
+    (   CatCount > 0
+    ->  assertz(comida_category_stats(Category, CatCount, CalCount, Total))
+    ;   true
+    ).
+
+retract_comida(Food, Climate, State, TimeType, Category, Cal, FdcId) :-
+    retract(comida(Food, Climate, State, TimeType, Category, Cal, FdcId)),
+    (   comida_index_ready
+    ->  unindex_comida(Food, Climate, State, TimeType, Category, Cal)
+    ;   true
+    ).
+
+unindex_comida(Food, Climate, State, TimeType, Category, Cal) :-
+    (   comida(Food, Climate, State, TimeType, _, _, _)
+    ->  true
+    ;   retractall(comida_by_ctx(Climate, State, TimeType, Food))
+    ),
+    (   comida(Food, _, _, _, _, Cal, _)
+    ->  true
+    ;   retractall(comida_by_calories(_, Cal, Food))
+    ),
+    once(retract(comida_by_category(Category, Food))),
+    update_comida_stats(Category, Cal, -1).
+
+remove_comida(Food) :-
+    forall(
+        comida(Food, Climate, State, TimeType, Category, Cal, FdcId),
+        retract_comida(Food, Climate, State, TimeType, Category, Cal, FdcId)
+    ).
+
 % 1️⃣ Recomendación general
+recomendar(Climate, State, Time, Food) :-
+    comida_index_ready, !,
+    comida_by_ctx(Climate, State, TimeType, Food),
+    (Time =< 40 -> TimeType = quick ; TimeType \= quick).
 recomendar(Climate, State, Time, Food) :-
     comida(Food, Climate, State, TimeType, _, _, _),
     (Time =< 40 -> TimeType = quick ; TimeType \= quick).
@@ -21,10 +138,21 @@ recomendar_category(Climate, State, Category, Food) :-
     comida(Food, Climate, State, _, Category, _, _).
 
 % 3️⃣ Comidas saludables (bajas en calorías)
+% Con el índice, cada (Food, Cal) sale una vez de comida_by_calories/3 y
+% comida/7 (primer argumento ligado) da una solución por hecho, como antes
+recomendar_healthy(Climate, State, Food) :-
+    comida_index_ready, !,
+    calorie_index_between(0, 250, Food, Cal),
+    comida(Food, Climate, State, _, _, Cal, _).
 recomendar_healthy(Climate, State, Food) :-
     comida(Food, Climate, State, _, _, Cal, _),
     Cal =< 250.
 
+% Las reglas 4️⃣, 5️⃣, 6️⃣, 8️⃣ y 1️⃣1️⃣ necesitan las calorías de cada hecho: se
+% consulta comida/7 una sola vez con el argumento de contexto ligado
+% (SWI-Prolog crea un índice JIT sobre ese argumento). Pasar antes por
+% comida_by_ctx/4 repetiría cada comida por cada contexto en que aparece.
+
 % 4️⃣ Comidas de alta energía (para baja oxigenación)
 recomendar_energy(State, Food) :-
     State = low_oxygen,
@@ -58,9 +186,7 @@ recomendar_balanced(Food) :-
 
 % 9️⃣ Recomendación por rango de calorías
 recomendar_by_calories(MinCal, MaxCal, Food) :-
-    comida(Food, _, _, _, _, Cal, _),
-    Cal >= MinCal,
-    Cal =< MaxCal.
+    comida_calories_between(MinCal, MaxCal, Food, _).
 
 % 🔟 Comidas de categoría específica con tiempo rápido
 recomendar_quick_category(Category, Food) :-
@@ -73,8 +199,7 @@ recomendar_deportista(Food) :-
 
 % 1️⃣2️⃣ Comidas para perder peso (bajas calorías)
 recomendar_diet(Food) :-
-    comida(Food, _, _, _, _, Cal, _),
-    Cal =< 300.
+    comida_calories_between(0, 300, Food, _).
 
 /* ===========================================
    🔗 UTILIDADES
@@ -98,32 +223,69 @@ display_name(FoodName, DisplayName) :-
     (food_display_name(FoodName, DisplayName) -> true ; DisplayName = FoodName).
 
 % Listar todas las comidas de una categoría
+list_by_category(Category, Foods) :-
+    comida_index_ready, !,
+    findall(F, comida_by_category(Category, F), Foods).
 list_by_category(Category, Foods) :-
     findall(F, comida(F, _, _, _, Category, _, _), Foods).
 
 % Contar comidas totales
+count_foods(Count) :-
+    comida_index_ready, !,
+    (   comida_count(Count) -> true ; Count = 0 ).
 count_foods(Count) :-
     findall(F, comida(F, _, _, _, _, _, _), Foods),
     length(Foods, Count).
 
+% Contar comidas de una categoría
+count_by_category(Category, Count) :-
+    comida_index_ready, !,
+    (   comida_category_stats(Category, Count, _, _) -> true ; Count = 0 ).
+count_by_category(Category, Count) :-
+    aggregate_all(count, comida(_, _, _, _, Category, _, _), Count).
+
 /* ===========================================
    📊 ESTADÍSTICAS
+   Con los hechos índice, comida_count/1 y
+   comida_category_stats(Category, Count, CalorieCount, TotalCalories) vienen
+   materializados desde food_loader.py y se actualizan en add_comida/7 y
+   retract_comida/7, así que no hace falta recorrer todas las comidas.
    =========================================== */
 
 % Promedio de calorías por categoría
 average_calories_by_category(Category, Average) :-
-    findall(Cal, comida(_, _, _, _, Category, Cal, _), Calories),
+    comida_index_ready, !,
+    comida_category_stats(Category, _, Count, Total),
+    Count > 0,
+    Average is Total / Count.
+average_calories_by_category(Category, Average) :-
+    findall(Cal, (comida(_, _, _, _, Category, Cal, _), number(Cal)), Calories),
     sum_list(Calories, Total),
     length(Calories, Count),
     Count > 0,
     Average is Total / Count.
 
 % Comida con más calorías
+highest_calorie_food(Food, Calories) :-
+    comida_index_ready, !,
+    comida_calorie_buckets(Lowest, Highest),
+    between(Lowest, Highest, Offset),
+    Bucket is Highest + Lowest - Offset,       % del rango más alto al más bajo
+    aggregate_all(max(Cal), comida_by_calories(Bucket, Cal, _), Calories),
+    !,
+    comida_by_calories(Bucket, Calories, Food).
 highest_calorie_food(Food, Calories) :-
     comida(Food, _, _, _, _, Calories, _),
     \+ (comida(_, _, _, _, _, OtherCal, _), OtherCal > Calories).
 
 % Comida con menos calorías
+lowest_calorie_food(Food, Calories) :-
+    comida_index_ready, !,
+    comida_calorie_buckets(Lowest, Highest),
+    between(Lowest, Highest, Bucket),
+    aggregate_all(min(Cal), comida_by_calories(Bucket, Cal, _), Calories),
+    !,
+    comida_by_calories(Bucket, Calories, Food).
 lowest_calorie_food(Food, Calories) :-
     comida(Food, _, _, _, _, Calories, _),
     \+ (comida(_, _, _, _, _, OtherCal, _), OtherCal < Calories).
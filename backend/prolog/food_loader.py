@@ -9,38 +9,72 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from food_api.food_api import search_food
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-import json
+from catalog import CatalogWriter, LEGACY_CACHE_FILE, iter_catalog_foods
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Pattern
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import re
+
+
+def _compile_keywords(keywords: List[str]) -> Pattern:
+    """Una sola expresión regular que encuentra cualquiera de las palabras clave"""
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
 
 
 class FoodCategorizer:
-    """Categoriza comidas basándose en sus nutrientes"""
-    
-    @staticmethod
-    def categorize_meal_time(name: str, nutrients: dict) -> str:
+    """
+    Categoriza comidas basándose en sus nutrientes.
+
+    Las palabras clave se compilan en expresiones regulares al crear la
+    instancia (una vez por proceso en la carga en paralelo), en lugar de
+    recorrer las listas para cada comida.
+    """
+
+    # Palabras clave para categorías (en orden de prioridad)
+    BREAKFAST_KEYWORDS = ['oatmeal', 'cereal', 'egg', 'toast', 'pancake', 'waffle',
+                          'yogurt', 'fruit', 'smoothie', 'avena', 'huevo']
+    LUNCH_KEYWORDS = ['sandwich', 'salad', 'pasta', 'rice', 'chicken', 'fish',
+                      'ensalada', 'pollo', 'pescado', 'arroz']
+    DINNER_KEYWORDS = ['steak', 'soup', 'stew', 'roast', 'grilled', 'sopa',
+                       'asado', 'guiso']
+    SNACK_KEYWORDS = ['bar', 'nuts', 'cookie', 'chips', 'fruit', 'fruta',
+                      'galleta', 'barra']
+
+    # Comidas frías (para clima caliente)
+    HOT_CLIMATE_KEYWORDS = ['salad', 'cold', 'fresh', 'raw', 'smoothie',
+                            'ensalada', 'fresco', 'fría']
+    # Comidas calientes (para clima frío)
+    COLD_CLIMATE_KEYWORDS = ['soup', 'stew', 'hot', 'warm', 'roast', 'baked',
+                             'sopa', 'caliente', 'horneado']
+
+    QUICK_KEYWORDS = ['raw', 'fresh', 'simple', 'easy', 'bar', 'shake', 'smoothie']
+    LONG_KEYWORDS = ['roast', 'baked', 'stew', 'slow', 'braised', 'asado', 'horneado']
+
+    def __init__(self):
+        self._meal_rules = [
+            ('breakfast', _compile_keywords(self.BREAKFAST_KEYWORDS)),
+            ('snack', _compile_keywords(self.SNACK_KEYWORDS)),
+            ('dinner', _compile_keywords(self.DINNER_KEYWORDS)),
+            ('lunch', _compile_keywords(self.LUNCH_KEYWORDS)),
+        ]
+        self._climate_rules = [
+            ('hot', _compile_keywords(self.HOT_CLIMATE_KEYWORDS)),
+            ('cold', _compile_keywords(self.COLD_CLIMATE_KEYWORDS)),
+        ]
+        self._time_rules = [
+            ('quick', _compile_keywords(self.QUICK_KEYWORDS)),
+            ('long', _compile_keywords(self.LONG_KEYWORDS)),
+        ]
+
+    def categorize_meal_time(self, name: str, nutrients: dict) -> str:
         """Determina si es desayuno, almuerzo, cena o snack"""
         name_lower = name.lower()
         
-        # Palabras clave para categorías
-        breakfast_keywords = ['oatmeal', 'cereal', 'egg', 'toast', 'pancake', 'waffle', 
-                             'yogurt', 'fruit', 'smoothie', 'avena', 'huevo']
-        lunch_keywords = ['sandwich', 'salad', 'pasta', 'rice', 'chicken', 'fish',
-                         'ensalada', 'pollo', 'pescado', 'arroz']
-        dinner_keywords = ['steak', 'soup', 'stew', 'roast', 'grilled', 'sopa', 
-                          'asado', 'guiso']
-        snack_keywords = ['bar', 'nuts', 'cookie', 'chips', 'fruit', 'fruta', 
-                         'galleta', 'barra']
-        
         # Verificar palabras clave
-        if any(kw in name_lower for kw in breakfast_keywords):
-            return 'breakfast'
-        elif any(kw in name_lower for kw in snack_keywords):
-            return 'snack'
-        elif any(kw in name_lower for kw in dinner_keywords):
-            return 'dinner'
-        elif any(kw in name_lower for kw in lunch_keywords):
-            return 'lunch'
+        for category, pattern in self._meal_rules:
+            if pattern.search(name_lower):
+                return category
         
         # Basado en calorías
         calories = FoodCategorizer._extract_calories(nutrients)
@@ -53,40 +87,23 @@ class FoodCategorizer:
         else:
             return 'dinner'
     
-    @staticmethod
-    def categorize_climate(name: str, nutrients: dict) -> str:
+    def categorize_climate(self, name: str, nutrients: dict) -> str:
         """Determina si es para clima frío, caliente o templado"""
         name_lower = name.lower()
         
-        # Comidas frías (para clima caliente)
-        hot_climate_keywords = ['salad', 'cold', 'fresh', 'raw', 'smoothie', 
-                               'ensalada', 'fresco', 'fría']
-        
-        # Comidas calientes (para clima frío)
-        cold_climate_keywords = ['soup', 'stew', 'hot', 'warm', 'roast', 'baked',
-                                'sopa', 'caliente', 'horneado']
-        
-        if any(kw in name_lower for kw in hot_climate_keywords):
-            return 'hot'
-        elif any(kw in name_lower for kw in cold_climate_keywords):
-            return 'cold'
-        else:
-            return 'warm'
+        for climate, pattern in self._climate_rules:
+            if pattern.search(name_lower):
+                return climate
+        return 'warm'
     
-    @staticmethod
-    def categorize_preparation_time(name: str) -> str:
+    def categorize_preparation_time(self, name: str) -> str:
         """Determina tiempo de preparación basado en el nombre"""
         name_lower = name.lower()
         
-        quick_keywords = ['raw', 'fresh', 'simple', 'easy', 'bar', 'shake', 'smoothie']
-        long_keywords = ['roast', 'baked', 'stew', 'slow', 'braised', 'asado', 'horneado']
-        
-        if any(kw in name_lower for kw in quick_keywords):
-            return 'quick'
-        elif any(kw in name_lower for kw in long_keywords):
-            return 'long'
-        else:
-            return 'medium'
+        for prep_time, pattern in self._time_rules:
+            if pattern.search(name_lower):
+                return prep_time
+        return 'medium'
     
     @staticmethod
     def categorize_oxygen_state(nutrients: dict) -> str:
@@ -127,13 +144,86 @@ class FoodCategorizer:
         return None
 
 
+def process_food(food_data: dict, categorizer: FoodCategorizer) -> Optional[dict]:
+    """Procesa una comida de la API y la categoriza"""
+    try:
+        name = food_data['nombre']
+        nutrients = food_data.get('nutrientes', {})
+        fdc_id = food_data.get('fdcId')
+        
+        # Generar nombre Prolog (sin espacios, lowercase, underscore)
+        prolog_name = name.lower().replace(' ', '_').replace(',', '').replace('-', '_')
+        prolog_name = ''.join(c for c in prolog_name if c.isalnum() or c == '_')
+        prolog_name = prolog_name[:50]  # Limitar longitud
+        
+        # Categorizar
+        category = categorizer.categorize_meal_time(name, nutrients)
+        climate = categorizer.categorize_climate(name, nutrients)
+        state = categorizer.categorize_oxygen_state(nutrients)
+        prep_time = categorizer.categorize_preparation_time(name)
+        calories = int(categorizer._extract_calories(nutrients))
+        
+        return {
+            'prolog_name': prolog_name,
+            'display_name': name,
+            'fdc_id': fdc_id,
+            'climate': climate,
+            'state': state,
+            'prep_time': prep_time,
+            'category': category,
+            'calories': calories,
+            'nutrients': nutrients
+        }
+    except Exception as e:
+        print(f"⚠️  Error procesando {food_data.get('nombre', 'unknown')}: {e}")
+        return None
+
+
+# ============================================
+# ⚙️ PROCESAMIENTO EN PARALELO
+# ============================================
+
+# Comidas por bloque enviado a cada proceso
+PROCESS_CHUNK_SIZE = 2000
+
+# Categorizador de cada proceso (se crea una vez en _init_worker)
+_worker_categorizer: Optional[FoodCategorizer] = None
+
+
+def _init_worker():
+    """Inicializa el proceso: compila las reglas de categorización una sola vez"""
+    global _worker_categorizer
+    _worker_categorizer = FoodCategorizer()
+
+
+def _process_chunk(chunk: List[dict]) -> List[dict]:
+    """Procesa un bloque de comidas dentro de un proceso del pool"""
+    results = []
+    for food_data in chunk:
+        processed = process_food(food_data, _worker_categorizer)
+        if processed:
+            results.append(processed)
+    return results
+
+
+def _chunked(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """Agrupa un iterable en listas de como máximo size elementos"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 class FoodLoader:
     """Carga comidas desde FoodData Central y genera hechos Prolog"""
     
     def __init__(self, output_dir: str = "./prolog"):
         self.output_dir = Path(output_dir)
         self.comidas_file = self.output_dir / "comidas_dynamic.pl"
-        self.cache_file = self.output_dir / "food_cache.json"
+        self.cache_file = self.output_dir / "food_cache.jsonl"
+        self.manifest_file = self.output_dir / "food_cache.manifest.json"
         self.categorizer = FoodCategorizer()
         self.loaded_foods = []
     
@@ -166,125 +256,96 @@ class FoodLoader:
     
     def _process_food(self, food_data: dict) -> Optional[dict]:
         """Procesa una comida de la API y la categoriza"""
-        try:
-            name = food_data['nombre']
-            nutrients = food_data.get('nutrientes', {})
-            fdc_id = food_data.get('fdcId')
-            
-            # Generar nombre Prolog (sin espacios, lowercase, underscore)
-            prolog_name = name.lower().replace(' ', '_').replace(',', '').replace('-', '_')
-            prolog_name = ''.join(c for c in prolog_name if c.isalnum() or c == '_')
-            prolog_name = prolog_name[:50]  # Limitar longitud
-            
-            # Categorizar
-            category = self.categorizer.categorize_meal_time(name, nutrients)
-            climate = self.categorizer.categorize_climate(name, nutrients)
-            state = self.categorizer.categorize_oxygen_state(nutrients)
-            prep_time = self.categorizer.categorize_preparation_time(name)
-            calories = int(self.categorizer._extract_calories(nutrients))
-            
-            return {
-                'prolog_name': prolog_name,
-                'display_name': name,
-                'fdc_id': fdc_id,
-                'climate': climate,
-                'state': state,
-                'prep_time': prep_time,
-                'category': category,
-                'calories': calories,
-                'nutrients': nutrients
-            }
-        except Exception as e:
-            print(f"⚠️  Error procesando {food_data.get('nombre', 'unknown')}: {e}")
-            return None
+        return process_food(food_data, self.categorizer)
     
-    def generate_prolog_file(self):
-        """Genera el archivo .pl con todas las comidas cargadas"""
-        if not self.loaded_foods:
-            print("❌ No hay comidas cargadas")
+    def process_foods(
+        self,
+        foods: Iterable[dict],
+        workers: int = 1,
+        chunk_size: int = PROCESS_CHUNK_SIZE,
+    ) -> Iterator[dict]:
+        """
+        Procesa comidas en streaming, opcionalmente en varios procesos.
+
+        Las comidas se reparten en bloques de chunk_size entre los procesos
+        y los resultados se devuelven en el mismo orden de entrada a medida
+        que terminan, para poder escribirlos sin esperar al final.
+
+        Args:
+            foods: Comidas en el formato de search_food (puede ser un generador)
+            workers: Número de procesos (1 = en este mismo proceso)
+            chunk_size: Comidas por bloque enviado a cada proceso
+        """
+        valid = (f for f in foods if f.get('nombre') and f['nombre'] != "Error fetching data")
+
+        if workers <= 1:
+            for food_data in valid:
+                processed = self._process_food(food_data)
+                if processed:
+                    yield processed
             return
-        
-        with open(self.comidas_file, 'w', encoding='utf-8') as f:
-            # Header
-            f.write(f"/* {'='*60}\n")
-            f.write(f"   📘 comidas_dynamic.pl (AUTOGENERADO)\n")
-            f.write(f"   Generado desde FoodData Central API\n")
-            f.write(f"   Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"   Total de comidas: {len(self.loaded_foods)}\n")
-            f.write(f"   {'='*60} */\n\n")
-            
-            # Documentación
-            f.write("% comida(Name, Climate, State, TimeType, Category, Calories, FdcId)\n")
-            f.write("% Climate: cold | hot | warm\n")
-            f.write("% State: normal | low_oxygen\n")
-            f.write("% TimeType: quick | medium | long\n")
-            f.write("% Category: breakfast | lunch | dinner | snack\n\n")
-            
-            # Agrupar por categoría
-            by_category = {}
-            for food in self.loaded_foods:
-                cat = food['category']
-                if cat not in by_category:
-                    by_category[cat] = []
-                by_category[cat].append(food)
-            
-            # Escribir por categoría
-            for category in ['breakfast', 'lunch', 'dinner', 'snack']:
-                if category not in by_category:
-                    continue
-                
-                foods = by_category[category]
-                f.write(f"% --- {category.upper()} ({len(foods)}) ---\n")
-                
-                for food in foods:
-                    f.write(f"comida({food['prolog_name']}, ")
-                    f.write(f"{food['climate']}, ")
-                    f.write(f"{food['state']}, ")
-                    f.write(f"{food['prep_time']}, ")
-                    f.write(f"{food['category']}, ")
-                    f.write(f"{food['calories']}, ")
-                    f.write(f"'{food['fdc_id']}').\n")
-                
-                f.write("\n")
-            
-            # Mapeo de nombres para display
-            f.write("% Mapeo de nombres internos a nombres para mostrar\n")
-            for food in self.loaded_foods:
-                f.write(f"food_display_name({food['prolog_name']}, '{food['display_name']}').\n")
-            
-            f.write("\n")
-            
-            # Información nutricional completa
-            f.write("% Información nutricional completa\n")
-            for food in self.loaded_foods:
-                f.write(f"food_fdc_id({food['prolog_name']}, '{food['fdc_id']}').\n")
-        
-        print(f"✅ Archivo Prolog generado: {self.comidas_file}")
-        
-        # Guardar cache
-        self._save_cache()
-    
-    def _save_cache(self):
-        """Guardar cache de comidas en JSON"""
-        cache = {
-            'generated_at': datetime.now().isoformat(),
-            'total_foods': len(self.loaded_foods),
-            'foods': self.loaded_foods
-        }
-        
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache, f, indent=2, ensure_ascii=False)
-        
-        print(f"💾 Cache guardado: {self.cache_file}")
+
+        # Como máximo 2 bloques pendientes por proceso: la memoria no depende del total
+        max_pending = workers * 2
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = deque()
+            for chunk in _chunked(valid, chunk_size):
+                pending.append(pool.submit(_process_chunk, chunk))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def load_from_local_db(self, db_path: str, workers: int = 1):
+        """
+        Genera el catálogo con todos los alimentos de la base local de FDC.
+
+        Lectura, categorización y escritura van en streaming, así que sirve
+        para bases de cientos de miles de alimentos.
+        """
+        from food_api.fdc_local import LocalFoodData
+
+        print(f"💽 Procesando base local {db_path} con {workers} proceso(s)...")
+        self.loaded_foods = []
+        foods = self.process_foods(LocalFoodData(db_path).iter_foods(), workers=workers)
+        return self.generate_prolog_file(foods, source=f"FoodData Central (base local {Path(db_path).name})")
     
+    def generate_prolog_file(
+        self,
+        foods: Optional[Iterable[dict]] = None,
+        source: str = "FoodData Central API",
+    ):
+        """
+        Genera el archivo .pl y el cache JSON Lines con las comidas cargadas.
+
+        Args:
+            foods: Comidas ya procesadas a escribir (por defecto self.loaded_foods).
+                   Puede ser un generador: se escriben en streaming sin
+                   guardarlas en memoria.
+            source: Origen de los datos (se anota en la cabecera y el manifiesto)
+        """
+        if foods is None:
+            if not self.loaded_foods:
+                print("❌ No hay comidas cargadas")
+                return
+            foods = self.loaded_foods
+
+        with CatalogWriter(self.comidas_file, self.cache_file, self.manifest_file, source=source) as writer:
+            writer.add_all(foods)
+
+        print(f"✅ Archivo Prolog generado: {self.comidas_file}")
+        print(f"💾 Cache guardado: {self.cache_file} ({writer.total} comidas)")
+        return writer.manifest
+
+    def iter_cached_foods(self) -> Iterator[dict]:
+        """Recorre las comidas del cache (JSON Lines o formato anterior)"""
+        return iter_catalog_foods(self.cache_file)
+
     def load_from_cache(self) -> bool:
         """Cargar desde cache si existe"""
-        if self.cache_file.exists():
+        if self.cache_file.exists() or LEGACY_CACHE_FILE.exists():
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
-                
-                self.loaded_foods = cache.get('foods', [])
+                self.loaded_foods = list(self.iter_cached_foods())
                 print(f"✅ {len(self.loaded_foods)} comidas cargadas desde cache")
                 return True
             except Exception as e:
@@ -337,25 +398,35 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Cargar comidas desde FoodData Central')
     parser.add_argument('--refresh', action='store_true', help='Forzar recarga desde API')
     parser.add_argument('--max-per-query', type=int, default=3, help='Máximo de resultados por búsqueda')
+    parser.add_argument('--from-local-db', metavar='SQLITE',
+                        help='Generar el catálogo con todos los alimentos de la base local de FDC')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos para categorizar (útil con --from-local-db)')
     
     args = parser.parse_args()
     
     loader = FoodLoader()
     
-    # Intentar cargar desde cache
-    if not args.refresh and loader.load_from_cache():
-        print("📦 Usando comidas desde cache")
+    if args.from_local_db:
+        # Carga masiva: lectura, categorización y escritura en streaming
+        manifest = loader.load_from_local_db(args.from_local_db, workers=args.workers)
+        total_foods = manifest['total_foods'] if manifest else 0
     else:
-        # Cargar desde API
-        queries = get_default_food_queries()
-        loader.search_and_load_foods(queries, max_per_query=args.max_per_query)
-    
-    # Generar archivo Prolog
-    loader.generate_prolog_file()
+        # Intentar cargar desde cache
+        if not args.refresh and loader.load_from_cache():
+            print("📦 Usando comidas desde cache")
+        else:
+            # Cargar desde API
+            queries = get_default_food_queries()
+            loader.search_and_load_foods(queries, max_per_query=args.max_per_query)
+        
+        # Generar archivo Prolog
+        loader.generate_prolog_file()
+        total_foods = len(loader.loaded_foods)
     
     print("\n" + "="*60)
     print("✅ Proceso completado")
     print(f"📄 Archivo generado: {loader.comidas_file}")
     print(f"💾 Cache guardado: {loader.cache_file}")
-    print(f"🍽️  Total de comidas: {len(loader.loaded_foods)}")
+    print(f"🍽️  Total de comidas: {total_foods}")
     print("="*60)
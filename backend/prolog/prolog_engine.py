@@ -1,11 +1,48 @@
 from pyswip import Prolog
+import logging
 import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from metrics import PROLOG_CONSULT_SECONDS, PROLOG_QUERY_SECONDS
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["breakfast", "lunch", "dinner", "snack"]
+
+
+def predicate_of(query_string: str) -> str:
+    """Nombre del predicado principal de una consulta (etiqueta de las métricas)"""
+    return query_string.split("(", 1)[0].strip() or "unknown"
+
+
+@dataclass
+class CategoryStats:
+    """Aggregate statistics for one food category."""
+    category: str
+    count: int
+    average_calories: Optional[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "average_calories": round(self.average_calories, 1) if self.average_calories is not None else None,
+        }
 
 
 class PrologEngine:
+    # pyswip usa una única instancia de Prolog por proceso: todas las
+    # instancias de PrologEngine comparten el lock
+    _lock = threading.RLock()
+
     def __init__(self):
         self.prolog = Prolog()
+        # Resultados de los agregados; se invalidan al cambiar comida/7
+        self._memo: Dict[Hashable, Any] = {}
+        self.consulted_version: Optional[str] = None
         # 1. Obtiene la ruta del directorio donde se encuentra este archivo (prolog_engine.py)
         self.base_dir = Path(__file__).parent
 
@@ -13,46 +50,125 @@ class PrologEngine:
         self.comidas_dynamic = str(self.base_dir / "comidas_dynamic.pl")
         self.comidas_static = str(self.base_dir / "comidas.pl")
         self.comidas_rules = str(self.base_dir / "comidas_rules.pl")
-        
-        # 3. Archivos de usuarios
-        self.usuarios_file = str(self.base_dir / "usuarios.pl")
-        self.usuarios_data_file = str(self.base_dir / "usuarios_data.pl")
+        # Los perfiles de usuario viven en users.py (SQLite), no en Prolog
 
     def consult(self):
         """Load a Prolog file."""
         # This method needs to be updated to load the new file paths.
         # For now, it will attempt to load the dynamic food data if it exists,
         # otherwise it will fall back to the static food data.
-        # It also loads the rules and user data.
+        # It also loads the rules.
         
-        # Load rules first as they might define predicates used by data files
-        self.prolog.consult(self.comidas_rules)
-        
-        # Prioritize dynamic food data
-        if Path(self.comidas_dynamic).exists():
-            self.prolog.consult(self.comidas_dynamic)
-        else:
-            self.prolog.consult(self.comidas_static)
+        with span("prolog.consult"), self._lock, PROLOG_CONSULT_SECONDS.time():
+            # Load rules first as they might define predicates used by data files
+            self.prolog.consult(self.comidas_rules)
+            
+            # Prioritize dynamic food data
+            if Path(self.comidas_dynamic).exists():
+                self.prolog.consult(self.comidas_dynamic)
+            else:
+                self.prolog.consult(self.comidas_static)
 
-        # Load user-related data
-        if Path(self.usuarios_file).exists():
-            self.prolog.consult(self.usuarios_file)
-        if Path(self.usuarios_data_file).exists():
-            self.prolog.consult(self.usuarios_data_file)
+            self._memo.clear()
 
+    def ensure_consulted(self, version: str):
+        """Consult the files again only if the catalog version changed."""
+        with self._lock:
+            if self.consulted_version != version:
+                self.consult()
+                self.consulted_version = version
 
     def query(self, query_string):
         """Execute a Prolog query and return the results."""
-        print("Query string:", query_string)
-        return list(self.prolog.query(query_string))
+        logger.debug(f"Prolog query: {query_string}")
+        # El span incluye la espera por el lock; la métrica, solo la consulta
+        with span("prolog.query", predicate=predicate_of(query_string)), self._lock:
+            # Solo el tiempo de la consulta, sin la espera por el lock
+            with PROLOG_QUERY_SECONDS.labels(predicate=predicate_of(query_string)).time():
+                return list(self.prolog.query(query_string))
 
     def assertz(self, fact):
         """Add a fact to the Prolog database."""
-        self.prolog.assertz(fact)
+        fact = fact.strip().rstrip(".")
+        with self._lock:
+            if fact.startswith("comida("):
+                # add_comida/7 también actualiza los hechos índice y los agregados
+                list(self.prolog.query(f"add_{fact}"))
+                self._memo.clear()
+            else:
+                self.prolog.assertz(fact)
 
     def retract(self, fact):
         """Remove a fact from the Prolog database."""
-        self.prolog.retract(fact)
+        fact = fact.strip().rstrip(".")
+        with self._lock:
+            if fact.startswith("comida("):
+                list(self.prolog.query(f"retract_{fact}"))
+                self._memo.clear()
+            else:
+                self.prolog.retract(fact)
+
+    # ------------------------------------------
+    # Typed wrappers for aggregate predicates (memoized)
+    # ------------------------------------------
+
+    def _memoized(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    def _first(self, query_string: str) -> Optional[Dict[str, Any]]:
+        with span("prolog.query", predicate=predicate_of(query_string)), self._lock:
+            with PROLOG_QUERY_SECONDS.labels(predicate=predicate_of(query_string)).time():
+                results = list(self.prolog.query(query_string, maxresult=1))
+        return results[0] if results else None
+
+    def count_foods(self) -> int:
+        """Total number of comida/7 facts."""
+        def compute():
+            result = self._first("count_foods(Count)")
+            return int(result["Count"]) if result else 0
+        return self._memoized("count_foods", compute)
+
+    def list_by_category(self, category: str) -> List[str]:
+        """Food names of a category (one entry per comida/7 fact)."""
+        def compute():
+            result = self._first(f"list_by_category({category}, Foods)")
+            return tuple(str(food) for food in result["Foods"]) if result else ()
+        return list(self._memoized(("list_by_category", category), compute))
+
+    def count_by_category(self, category: str) -> int:
+        """Number of comida/7 facts in a category (read from the materialized stats)."""
+        def compute():
+            result = self._first(f"count_by_category({category}, Count)")
+            return int(result["Count"]) if result else 0
+        return self._memoized(("count_by_category", category), compute)
+
+    def average_calories_by_category(self, category: str) -> Optional[float]:
+        """Average calories of a category (foods with numeric calories), or None if it has none."""
+        def compute():
+            result = self._first(f"average_calories_by_category({category}, Average)")
+            return float(result["Average"]) if result else None
+        return self._memoized(("average_calories_by_category", category), compute)
+
+    def calorie_extremes(self) -> Dict[str, Optional[Tuple[str, int]]]:
+        """Highest and lowest calorie foods as (name, calories)."""
+        def compute():
+            extremes = {}
+            for key, predicate in (("highest", "highest_calorie_food"), ("lowest", "lowest_calorie_food")):
+                result = self._first(f"{predicate}(Food, Calories)")
+                extremes[key] = (str(result["Food"]), int(result["Calories"])) if result else None
+            return extremes
+        return dict(self._memoized("calorie_extremes", compute))
+
+    def category_stats(self) -> Dict[str, CategoryStats]:
+        """Count and average calories for every category."""
+        stats = {}
+        for category in CATEGORIES:
+            count = self.count_by_category(category)
+            stats[category] = CategoryStats(category, count, self.average_calories_by_category(category))
+        return stats
 
     def food_recommendation(self, weather: str, state: str, time: int = 40):
         query = f"recomendar({weather}, {state}, {time}, Comida)"
@@ -0,0 +1,192 @@
+"""
+🪣 ratelimit.py
+Limitación de tasa con token buckets, en el proceso.
+
+- Peticiones: un bucket por usuario (user_id de la ruta o del cuerpo; si
+  no hay, la IP del cliente) y por tipo de petición. /sensors tiene su
+  propio límite porque lo llaman dispositivos en bucle.
+- Servicios externos: antes de cada llamada real a FoodData Central se
+  consume un token del bucket global del servicio (cuota de la API key) y
+  otro del bucket del usuario que originó la petición; el del usuario se
+  cobra antes de entrar al single-flight, así que quien se une a una
+  llamada en curso también paga la suya. Las respuestas servidas desde
+  cache o la base local no consumen nada.
+
+Cada bucket se llena a `rate` tokens por segundo hasta `burst`; una
+petición que no encuentra token se rechaza con el tiempo que falta para el
+siguiente (Retry-After). El estado es un par de floats por clave en un
+diccionario LRU acotado, así que se puede poner delante de cada petición.
+
+Los límites son por worker: con N workers el límite efectivo es N veces
+el configurado.
+
+Configuración (formato "tokens_por_segundo:ráfaga", 0 = sin límite):
+RATE_LIMIT_ENABLED, RATE_LIMIT_API, RATE_LIMIT_SENSORS, RATE_LIMIT_FDC,
+RATE_LIMIT_FDC_USER.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import RATE_LIMITED
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Claves (usuarios o IPs) con bucket en memoria por limitador
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+def parse_limit(spec: str) -> Tuple[float, float]:
+    """'5:20' -> (5.0, 20.0); '0' -> sin límite"""
+    rate, _, burst = spec.partition(":")
+    rate = float(rate)
+    return rate, float(burst) if burst else max(1.0, rate)
+
+
+# La API de FDC permite 1000 peticiones por hora por API key
+LIMITS = {
+    "api": parse_limit(os.getenv("RATE_LIMIT_API", "5:20")),
+    "sensors": parse_limit(os.getenv("RATE_LIMIT_SENSORS", "2:10")),
+    "fdc": parse_limit(os.getenv("RATE_LIMIT_FDC", "0.27:100")),
+    "fdc_user": parse_limit(os.getenv("RATE_LIMIT_FDC_USER", "0.05:10")),
+}
+
+# Usuario de la petición en curso (lo fija el middleware; se propaga a los
+# hilos de asyncio.to_thread) para cobrarle las llamadas a servicios externos
+current_user: ContextVar[Optional[str]] = ContextVar("rate_limit_user", default=None)
+
+
+class RateLimited(RuntimeError):
+    """Se agotaron los tokens del bucket"""
+
+    def __init__(self, limiter: str, retry_after: float):
+        super().__init__(f"Límite de tasa '{limiter}' alcanzado; reintentar en {retry_after:.1f}s")
+        self.limiter = limiter
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Segundos enteros para la cabecera Retry-After (al menos 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimiter:
+    """
+    Token buckets por clave.
+
+    Args:
+        name: Nombre del limitador (métricas y errores)
+        rate: Tokens que se recuperan por segundo (0 = sin límite)
+        burst: Tokens como máximo (ráfaga permitida)
+        max_keys: Buckets en memoria; se olvida el menos usado (equivale a
+            darle un bucket lleno, lo más permisivo)
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # clave -> [tokens, último relleno (monotonic)]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: str = "", cost: float = 1.0) -> float:
+        """
+        Consume `cost` tokens del bucket de `key`.
+
+        Returns:
+            0.0 si se permitió; si no, segundos hasta tener tokens suficientes
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return 0.0
+            self.limited += 1
+            missing = cost - bucket[0]
+        RATE_LIMITED.labels(limiter=self.name).inc()
+        return missing / self.rate
+
+    def check(self, key: str = "", cost: float = 1.0):
+        """Como acquire(), pero lanza RateLimited si no hay tokens"""
+        retry_after = self.acquire(key, cost)
+        if retry_after:
+            raise RateLimited(self.name, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """Limitador configurado en LIMITS (se crea bajo demanda)"""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                rate, burst = LIMITS[name] if RATE_LIMIT_ENABLED else (0.0, 0.0)
+                limiter = _limiters[name] = RateLimiter(name, rate, burst)
+    return limiter
+
+
+def check_upstream(service: str):
+    """
+    Cobra una llamada real a un servicio externo en el bucket global del
+    servicio (cuota de la API key).
+
+    Se llama justo antes de la llamada, también dentro de un single-flight:
+    el rechazo vale igual para todos los que esperan esa respuesta.
+
+    Raises:
+        RateLimited: Si el bucket está agotado
+    """
+    get_limiter(service).check()
+
+
+def check_upstream_user(service: str):
+    """
+    Cobra una llamada a un servicio externo en el bucket del usuario de la
+    petición en curso (si se conoce).
+
+    Se llama antes de unirse a un single-flight, porque la clave del flight
+    no incluye al usuario: el límite de uno no debe llegar a los demás.
+
+    Raises:
+        RateLimited: Si el bucket del usuario está agotado
+    """
+    user_id = current_user.get()
+    if user_id is not None:
+        get_limiter(f"{service}_user").check(user_id)
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": RATE_LIMIT_ENABLED, **{name: limiter.stats() for name, limiter in _limiters.items()}}
@@ -0,0 +1,499 @@
+"""
+🍽️ recommender.py
+Motor de recomendaciones compartido por /recommend_food y /api/chat.
+
+Flujo:
+1. El contexto (clima, estado, tiempo) se calcula a partir de los sensores
+2. Los candidatos de cada contexto se piden a Prolog (recomendar/4) una sola
+   vez por versión del catálogo y se guardan ya puntuados y ordenados
+3. En cada petición solo se aplican los ajustes del usuario (exclusiones,
+   favoritas) y se devuelven los k mejores con su explicación
+
+Las preferencias del usuario llegan como bitsets (enteros de Python) sobre
+las posiciones de las comidas en el catálogo: filtrar un contexto es un AND
+entre dos enteros, sin importar cuántos usuarios haya.
+"""
+
+import heapq
+import logging
+import statistics
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from catalog import NUTRIENT_KEYS, catalog_version, load_catalog_foods, parse_amount
+from food_api.singleflight import SingleFlight
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# recomendar/4 solo distingue Time =< 40 (comidas rápidas) del resto
+QUICK_TIME_LIMIT = 40
+BUCKET_TIMES = {"quick": QUICK_TIME_LIMIT, "extended": QUICK_TIME_LIMIT + 1}
+
+# Bonificación para comidas favoritas del usuario
+FAVORITE_BOOST = 1.0
+
+# Penalización para comidas servidas hace poco (la más reciente recibe la
+# penalización completa y decrece linealmente con la antigüedad)
+REPEAT_PENALTY = 1.5
+
+# Pesos del modelo lineal por estado y por clima (sobre valores normalizados)
+STATE_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "low_oxygen": {"iron": 1.0, "protein": 0.8, "calories": 0.2, "sugar": -0.3, "sodium": -0.2},
+    "normal": {"fiber": 0.8, "protein": 0.4, "sugar": -0.6, "sodium": -0.4},
+}
+CLIMATE_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "cold": {"calories": 0.4},
+    "hot": {"calories": -0.4},
+}
+
+FEATURES = ["calories"] + list(NUTRIENT_KEYS.keys())
+
+# Textos de explicación según el signo del valor normalizado
+FEATURE_LABELS: Dict[Tuple[str, bool], str] = {
+    ("calories", True): "energética",
+    ("calories", False): "ligera",
+    ("protein", True): "alta en proteína",
+    ("fiber", True): "alta en fibra",
+    ("iron", True): "rica en hierro",
+    ("sugar", False): "baja en azúcar",
+    ("sodium", False): "baja en sodio",
+    ("fat", False): "baja en grasa",
+    ("carbs", True): "rica en carbohidratos",
+}
+
+
+def get_sensor_context(data: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Calcula el contexto de Prolog a partir de los datos de sensores.
+
+    Returns:
+        Tupla (weather, state) con los átomos que espera recomendar/4
+    """
+    state = "low_oxygen" if data.get("oxygen_level", 100) < 94 else "normal"
+    weather = "cold" if data.get("temperature", 25) < 20 else "hot"
+    return weather, state
+
+
+def repeat_penalties(recent: Sequence[str]) -> Dict[str, float]:
+    """Penalización por comida según lo reciente que se sirvió"""
+    penalties: Dict[str, float] = {}
+    for age, name in enumerate(recent):
+        penalties.setdefault(name, REPEAT_PENALTY * (1 - age / len(recent)))
+    return penalties
+
+
+def time_bucket(prep_time: int) -> str:
+    """Agrupa el tiempo disponible según lo distingue recomendar/4"""
+    return "quick" if prep_time <= QUICK_TIME_LIMIT else "extended"
+
+
+def bit_positions(mask: int) -> Set[int]:
+    """Posiciones de los bits encendidos (pensado para máscaras con pocos bits)"""
+    positions = set()
+    while mask:
+        low = mask & -mask
+        positions.add(low.bit_length() - 1)
+        mask ^= low
+    return positions
+
+
+@dataclass
+class UserContext:
+    """
+    Preferencias del usuario que ajustan el ranking en cada petición.
+
+    Las máscaras usan las posiciones de Recommender.food_bit() y solo son
+    válidas para la versión del catálogo con la que se construyeron.
+    `recent` son las comidas servidas hace poco, de la más nueva a la más
+    vieja (ver history.py).
+    """
+    excluded_mask: int = 0
+    favorite_mask: int = 0
+    recent: Tuple[str, ...] = ()
+
+
+@dataclass
+class Candidate:
+    """Comida candidata ya puntuada para un contexto"""
+    comida: str
+    display_name: str
+    fdc_id: Optional[int]
+    category: Optional[str]
+    calories: Optional[float]
+    score: float
+    explanation: List[str]
+    bit: int = -1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "comida": self.comida,
+            "display_name": self.display_name,
+            "fdc_id": self.fdc_id,
+            "category": self.category,
+            "calories": self.calories,
+            "score": round(self.score, 4),
+            "explanation": self.explanation,
+        }
+
+
+@dataclass
+class RecommendationResult:
+    """Resultado de una recomendación"""
+    weather: str
+    state: str
+    prep_time: int
+    recommendations: List[Candidate]
+
+    @property
+    def names(self) -> List[str]:
+        return [candidate.comida for candidate in self.recommendations]
+
+
+_prolog_engine = None
+
+
+def get_prolog_engine():
+    """
+    Motor Prolog compartido, consultado con la versión actual del catálogo.
+
+    pyswip usa una sola instancia de Prolog por proceso; PrologEngine
+    serializa el acceso con un lock propio.
+    """
+    global _prolog_engine
+    from prolog.prolog_engine import PrologEngine
+
+    if _prolog_engine is None:
+        _prolog_engine = PrologEngine()
+    _prolog_engine.ensure_consulted(catalog_version())
+    return _prolog_engine
+
+
+def prolog_candidate_source() -> Callable[[str, str, int], List[str]]:
+    """Fuente de candidatos por defecto: la regla recomendar/4 de Prolog"""
+
+    def source(weather: str, state: str, prep_time: int) -> List[str]:
+        engine = get_prolog_engine()
+        return engine.food_recommendation(weather=weather, state=state, time=prep_time)
+
+    return source
+
+
+class Recommender:
+    """
+    Recomendador con candidatos precalculados por contexto.
+
+    Args:
+        candidate_source: Función (weather, state, time) -> nombres Prolog
+        catalog_loader: Función que devuelve las comidas del catálogo
+        version_fn: Función que devuelve la versión actual del catálogo
+    """
+
+    def __init__(
+        self,
+        candidate_source: Optional[Callable[[str, str, int], List[str]]] = None,
+        catalog_loader: Callable[[], List[Dict[str, Any]]] = load_catalog_foods,
+        version_fn: Callable[[], str] = catalog_version,
+    ):
+        self._candidate_source = candidate_source
+        self._catalog_loader = catalog_loader
+        self._version_fn = version_fn
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._foods: Dict[str, Dict[str, Any]] = {}
+        self._bits: Dict[str, int] = {}
+        self._context_masks: Dict[Tuple[str, str, str], int] = {}
+        self._normalized: Dict[str, Dict[str, float]] = {}
+        self._contexts: Dict[Tuple[str, str, str], List[Candidate]] = {}
+        self._flight = SingleFlight("prolog_recommendation")
+        self.context_builds = 0
+
+    # ------------------------------------------
+    # Construcción de features y candidatos
+    # ------------------------------------------
+
+    def _ensure_fresh(self):
+        """Descarta los candidatos si el catálogo cambió"""
+        version = self._version_fn()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            self._load_features()
+            self._contexts = {}
+            self._context_masks = {}
+            self._version = version
+            logger.info(f"Recomendador: catálogo {version} con {len(self._foods)} comidas")
+
+    def _load_features(self):
+        """Extrae y normaliza (z-score) las features de cada comida del catálogo"""
+        foods: Dict[str, Dict[str, Any]] = {}
+        for food in self._catalog_loader():
+            name = food.get("prolog_name")
+            if not name or name in foods:
+                continue
+            nutrients = food.get("nutrients", {})
+            values = {"calories": parse_amount(food.get("calories"))}
+            for key, fdc_name in NUTRIENT_KEYS.items():
+                values[key] = parse_amount(nutrients.get(fdc_name))
+            foods[name] = {"food": food, "values": values}
+
+        # Estadísticas por columna para normalizar
+        normalized: Dict[str, Dict[str, float]] = {name: {} for name in foods}
+        for feature in FEATURES:
+            column = [entry["values"][feature] for entry in foods.values()
+                      if entry["values"][feature] is not None]
+            if len(column) < 2:
+                continue
+            mean = statistics.fmean(column)
+            stdev = statistics.pstdev(column) or 1.0
+            for name, entry in foods.items():
+                value = entry["values"][feature]
+                # Valor ausente = media del catálogo (z = 0)
+                normalized[name][feature] = 0.0 if value is None else (value - mean) / stdev
+
+        self._foods = foods
+        self._bits = {name: bit for bit, name in enumerate(foods)}
+        self._normalized = normalized
+
+    def _source(self) -> Callable[[str, str, int], List[str]]:
+        if self._candidate_source is None:
+            self._candidate_source = prolog_candidate_source()
+        return self._candidate_source
+
+    def _build_context(self, weather: str, state: str, bucket: str) -> List[Candidate]:
+        """Pide candidatos a Prolog y los puntúa con el modelo lineal"""
+        names = list(dict.fromkeys(self._source()(weather, state, BUCKET_TIMES[bucket])))
+
+        weights = dict(STATE_WEIGHTS.get(state, {}))
+        for feature, weight in CLIMATE_WEIGHTS.get(weather, {}).items():
+            weights[feature] = weights.get(feature, 0.0) + weight
+
+        # Puntuación por columnas: score = Σ w_j * z_ij
+        rows = [self._normalized.get(name, {}) for name in names]
+        scores = [0.0] * len(names)
+        contributions: List[List[Tuple[float, str, bool]]] = [[] for _ in names]
+        for feature, weight in weights.items():
+            column = [row.get(feature, 0.0) for row in rows]
+            scores = [s + weight * z for s, z in zip(scores, column)]
+            for i, z in enumerate(column):
+                contribution = weight * z
+                if contribution > 0:
+                    contributions[i].append((contribution, feature, z > 0))
+
+        candidates = []
+        for name, score, contrib in zip(names, scores, contributions):
+            food = self._foods.get(name, {}).get("food", {})
+            explanation = []
+            for _, feature, positive in sorted(contrib, reverse=True)[:2]:
+                label = FEATURE_LABELS.get((feature, positive))
+                if label:
+                    explanation.append(label)
+            candidates.append(Candidate(
+                comida=name,
+                display_name=name.replace("_", " ").title(),
+                fdc_id=food.get("fdc_id"),
+                category=food.get("category"),
+                calories=parse_amount(food.get("calories")),
+                score=score,
+                explanation=explanation,
+                bit=self.food_bit(name),
+            ))
+
+        candidates.sort(key=lambda c: c.score, reverse=True)
+        self.context_builds += 1
+        return candidates
+
+    def candidates_for(self, weather: str, state: str, prep_time: int) -> List[Candidate]:
+        """Candidatos puntuados y ordenados para un contexto (precalculados)"""
+        self._ensure_fresh()
+        version = self._version
+        key = (weather, state, time_bucket(prep_time))
+        candidates = self._contexts.get(key)
+        if candidates is None:
+            # Peticiones simultáneas del mismo contexto comparten una consulta a Prolog
+            with span("recommender.build_context", weather=weather, state=state, prep_time=key[2]):
+                candidates = self._flight.do((version, *key), self._build_context, *key)
+            with self._lock:
+                # Si el catálogo cambió mientras tanto, estos candidatos usan las posiciones viejas
+                if self._version == version:
+                    self._contexts[key] = candidates
+        return candidates
+
+    def _context_mask(self, key: Tuple[str, str, str], candidates: List[Candidate]) -> int:
+        # Solo se usa y se guarda la máscara de los candidatos vigentes: los
+        # construidos con un catálogo ya reemplazado usan posiciones viejas
+        current = self._contexts.get(key) is candidates
+        mask = self._context_masks.get(key) if current else None
+        if mask is None:
+            mask = 0
+            for candidate in candidates:
+                mask |= 1 << candidate.bit
+            if current:
+                with self._lock:
+                    if self._contexts.get(key) is candidates:
+                        self._context_masks[key] = mask
+        return mask
+
+    # ------------------------------------------
+    # Bitsets sobre el catálogo
+    # ------------------------------------------
+
+    @property
+    def version(self) -> Optional[str]:
+        """Versión del catálogo con la que se asignaron las posiciones"""
+        self._ensure_fresh()
+        return self._version
+
+    def food_bit(self, name: str) -> int:
+        """
+        Posición de una comida en los bitsets de usuario.
+
+        Las comidas que Prolog conoce pero no están en el cache (comidas.pl
+        estático) reciben una posición nueva al final.
+        """
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.setdefault(name, len(self._bits))
+        return bit
+
+    def mask_of(self, names: Iterable[str]) -> int:
+        """Bitset con las comidas indicadas por nombre Prolog"""
+        self._ensure_fresh()
+        mask = 0
+        for name in names:
+            mask |= 1 << self.food_bit(name)
+        return mask
+
+    def mask_where(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """Bitset con las comidas del catálogo que cumplen el predicado"""
+        self._ensure_fresh()
+        mask = 0
+        for name, entry in self._foods.items():
+            if predicate(entry["food"]):
+                mask |= 1 << self._bits[name]
+        return mask
+
+    def user_context(self, excluded: Iterable[str] = (), favorites: Iterable[str] = ()) -> UserContext:
+        """UserContext a partir de nombres Prolog (para pocas comidas)"""
+        return UserContext(excluded_mask=self.mask_of(excluded), favorite_mask=self.mask_of(favorites))
+
+    def warm_up(self):
+        """Precalcula todos los contextos posibles"""
+        for weather in CLIMATE_WEIGHTS:
+            for state in STATE_WEIGHTS:
+                for prep_time in BUCKET_TIMES.values():
+                    self.candidates_for(weather, state, prep_time)
+
+    # ------------------------------------------
+    # Punto de entrada
+    # ------------------------------------------
+
+    def recommend(
+        self,
+        sensor_data: Dict[str, Any],
+        prep_time: int = QUICK_TIME_LIMIT,
+        user_context: Optional[UserContext] = None,
+        k: int = 3,
+    ) -> RecommendationResult:
+        """
+        Devuelve las k mejores recomendaciones para los datos de sensores.
+
+        Args:
+            sensor_data: Últimos datos de sensores del usuario
+            prep_time: Tiempo disponible para preparar la comida (minutos)
+            user_context: Exclusiones y favoritas del usuario (opcional)
+            k: Número de recomendaciones a devolver
+        """
+        weather, state = get_sensor_context(sensor_data)
+        return self.recommend_for(weather, state, prep_time, user_context, k)
+
+    def recommend_for(
+        self,
+        weather: str,
+        state: str,
+        prep_time: int = QUICK_TIME_LIMIT,
+        user_context: Optional[UserContext] = None,
+        k: int = 3,
+    ) -> RecommendationResult:
+        """Igual que recommend() pero con el contexto (clima, estado) ya resuelto"""
+        with span("recommender.recommend", weather=weather, state=state, prep_time=prep_time, k=k):
+            candidates = self.candidates_for(weather, state, prep_time)
+
+            if user_context is None:
+                selected = candidates[:k]
+            else:
+                # Solo importan los bits que caen dentro de este contexto: un AND
+                # entre enteros y luego un recorrido por los pocos bits que quedan
+                context_mask = self._context_mask((weather, state, time_bucket(prep_time)), candidates)
+                blocked = bit_positions(user_context.excluded_mask & context_mask)
+                favorites = bit_positions(user_context.favorite_mask & context_mask)
+                selected = self._select(candidates, blocked, favorites, k, repeat_penalties(user_context.recent))
+
+        return RecommendationResult(
+            weather=weather,
+            state=state,
+            prep_time=prep_time,
+            recommendations=selected,
+        )
+
+    @staticmethod
+    def _select(
+        candidates: List[Candidate],
+        blocked: Set[int],
+        favorites: Set[int],
+        k: int,
+        penalties: Dict[str, float],
+    ) -> List[Candidate]:
+        # Con r comidas recientes basta mirar los k + r mejores: como mucho r
+        # bajan de puesto, y las k restantes siguen por encima del resto
+        n = k + len(penalties)
+
+        if not favorites:
+            # Los candidatos ya están ordenados: basta recorrerlos hasta tener n
+            selected = []
+            for candidate in candidates:
+                if candidate.bit not in blocked:
+                    selected.append(candidate)
+                    if len(selected) == n:
+                        break
+            if penalties:
+                selected.sort(key=lambda c: c.score - penalties.get(c.comida, 0.0), reverse=True)
+            return selected[:k]
+
+        def boosted(c: Candidate) -> float:
+            return c.score + (FAVORITE_BOOST if c.bit in favorites else 0.0)
+
+        selected = heapq.nlargest(n, (c for c in candidates if c.bit not in blocked), key=boosted)
+        if penalties:
+            selected.sort(key=lambda c: boosted(c) - penalties.get(c.comida, 0.0), reverse=True)
+        return [
+            Candidate(**{**c.__dict__, "explanation": ["favorita"] + c.explanation})
+            if c.bit in favorites else c
+            for c in selected[:k]
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del recomendador (para administración y benchmarks)"""
+        return {
+            "catalog_version": self._version,
+            "foods": len(self._foods),
+            "contexts": {"/".join(key): len(value) for key, value in self._contexts.items()},
+            "context_builds": self.context_builds,
+            "singleflight": self._flight.stats(),
+        }
+
+
+# Instancia global (se crea bajo demanda)
+_recommender: Optional[Recommender] = None
+
+
+def get_recommender() -> Recommender:
+    """Obtiene o crea el recomendador compartido por los endpoints"""
+    global _recommender
+    if _recommender is None:
+        _recommender = Recommender()
+    return _recommender
@@ -0,0 +1,350 @@
+"""
+🔍 search_index.py
+Índice de búsqueda en memoria sobre el catálogo de comidas.
+
+Permite resolver nombres (incluidos los átomos de Prolog como
+`scrambled_eggs`) a fdc_ids sin llamar a la API de FoodData Central:
+
+- BM25 sobre palabras normalizadas (sin acentos ni mayúsculas, español e inglés)
+- Autocompletado por prefijo sobre el vocabulario ordenado
+- Coincidencia aproximada por trigramas cuando una palabra no existe (errores de tipeo)
+
+El índice se actualiza de forma incremental cuando cambia el catálogo:
+solo se reindexan las comidas nuevas o modificadas.
+"""
+
+import bisect
+import heapq
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from catalog import catalog_version, load_catalog_foods
+
+# Parámetros de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Peso de las coincidencias por prefijo y aproximadas frente a las exactas
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.7
+FUZZY_MIN_SIMILARITY = 0.4
+MAX_EXPANSIONS = 20
+
+# Candidatos que revisa resolve() antes de rendirse
+RESOLVE_CANDIDATES = 5
+
+
+def fold(text: str) -> str:
+    """Normaliza texto: sin acentos, minúsculas y solo letras/números"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return "".join(c if c.isalnum() else " " for c in without_accents.casefold())
+
+
+def tokenize(text: str) -> List[str]:
+    """Separa texto normalizado en palabras"""
+    return fold(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    """Trigramas de una palabra con marcas de inicio y fin"""
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Similitud de Jaccard entre los trigramas de dos palabras"""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _same_words(query: List[str], name: List[str]) -> bool:
+    """
+    True si la consulta nombra exactamente esas palabras (en cualquier
+    orden, con errores de tipeo): cada palabra de un lado tiene su pareja
+    en el otro. "pizza" no es "dessert pizza"; "oatmel" sí es "oatmeal".
+    """
+    def matches(token: str, term: str) -> bool:
+        return token == term or similarity(token, term) >= FUZZY_MIN_SIMILARITY
+
+    if not name:
+        return False
+    return (all(any(matches(token, term) for token in query) for term in name)
+            and all(any(matches(token, term) for term in name) for token in query))
+
+
+@dataclass
+class _Doc:
+    fdc_id: int
+    prolog_name: str
+    display_name: str
+    signature: str
+    length: int
+    terms: Counter
+    food: Dict[str, Any]
+
+
+@dataclass
+class SearchHit:
+    """Resultado de una búsqueda en el índice"""
+    fdc_id: int
+    prolog_name: str
+    display_name: str
+    score: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fdcId": self.fdc_id,
+            "comida": self.prolog_name,
+            "display_name": self.display_name,
+            "score": round(self.score, 4),
+        }
+
+
+class FoodSearchIndex:
+    """Índice invertido BM25 + trigramas sobre nombres de comidas"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[int, _Doc] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._by_prolog_name: Dict[str, List[int]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._total_length = 0
+
+    # ------------------------------------------
+    # Indexación
+    # ------------------------------------------
+
+    @staticmethod
+    def _doc_text(food: Dict[str, Any]) -> Tuple[str, str, str]:
+        prolog_name = food.get("prolog_name", "")
+        display_name = food.get("display_name", "") or prolog_name.replace("_", " ")
+        return prolog_name, display_name, f"{prolog_name.replace('_', ' ')} {display_name}"
+
+    def _add(self, fdc_id: int, food: Dict[str, Any], signature: str):
+        prolog_name, display_name, text = self._doc_text(food)
+        terms = Counter(tokenize(text))
+        doc = _Doc(fdc_id, prolog_name, display_name, signature, sum(terms.values()), terms, food)
+        self._docs[fdc_id] = doc
+        self._total_length += doc.length
+        self._by_prolog_name.setdefault(prolog_name, []).append(fdc_id)
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for gram in trigrams(term):
+                    self._trigram_index.setdefault(gram, set()).add(term)
+                self._vocabulary_dirty = True
+            postings[fdc_id] = tf
+
+    def _remove(self, fdc_id: int):
+        doc = self._docs.pop(fdc_id)
+        self._total_length -= doc.length
+        ids = self._by_prolog_name.get(doc.prolog_name, [])
+        if fdc_id in ids:
+            ids.remove(fdc_id)
+        if not ids:
+            self._by_prolog_name.pop(doc.prolog_name, None)
+
+        for term in doc.terms:
+            postings = self._postings.get(term, {})
+            postings.pop(fdc_id, None)
+            if not postings:
+                self._postings.pop(term, None)
+                for gram in trigrams(term):
+                    words = self._trigram_index.get(gram)
+                    if words is not None:
+                        words.discard(term)
+                        if not words:
+                            del self._trigram_index[gram]
+                self._vocabulary_dirty = True
+
+    def update(self, foods: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Sincroniza el índice con el catálogo de forma incremental.
+
+        Returns:
+            Número de comidas añadidas, eliminadas y sin cambios
+        """
+        incoming: Dict[int, Tuple[Dict[str, Any], str]] = {}
+        for food in foods:
+            fdc_id = food.get("fdc_id")
+            if fdc_id is None:
+                continue
+            fdc_id = int(fdc_id)
+            if fdc_id not in incoming:
+                # La firma cubre toda la entrada: si cambian nombres o nutrientes se reindexa
+                incoming[fdc_id] = (food, json.dumps(food, sort_keys=True, default=str))
+
+        with self._lock:
+            removed = [fdc_id for fdc_id, doc in self._docs.items()
+                       if fdc_id not in incoming or incoming[fdc_id][1] != doc.signature]
+            for fdc_id in removed:
+                self._remove(fdc_id)
+
+            added = 0
+            for fdc_id, (food, signature) in incoming.items():
+                if fdc_id not in self._docs:
+                    self._add(fdc_id, food, signature)
+                    added += 1
+
+        return {"added": added, "removed": len(removed), "unchanged": len(incoming) - added}
+
+    def _sorted_vocabulary(self) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        return self._vocabulary
+
+    # ------------------------------------------
+    # Consultas
+    # ------------------------------------------
+
+    def _prefix_terms(self, prefix: str, limit: int = MAX_EXPANSIONS) -> List[str]:
+        vocabulary = self._sorted_vocabulary()
+        start = bisect.bisect_left(vocabulary, prefix)
+        terms = []
+        for term in vocabulary[start:]:
+            if not term.startswith(prefix) or len(terms) >= limit:
+                break
+            terms.append(term)
+        return terms
+
+    def _fuzzy_terms(self, token: str) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        overlap: Counter = Counter()
+        for gram in grams:
+            for term in self._trigram_index.get(gram, ()):
+                overlap[term] += 1
+        matches = []
+        for term, shared in overlap.items():
+            score = shared / len(grams | trigrams(term))
+            if score >= FUZZY_MIN_SIMILARITY:
+                matches.append((term, score))
+        matches.sort(key=lambda item: item[1], reverse=True)
+        return matches[:MAX_EXPANSIONS]
+
+    def _expand(self, token: str, is_last: bool) -> List[Tuple[str, float]]:
+        """Palabras del índice que corresponden a una palabra de la consulta"""
+        expansions = []
+        if token in self._postings:
+            expansions.append((token, 1.0))
+        if is_last:
+            expansions.extend((term, PREFIX_WEIGHT) for term in self._prefix_terms(token) if term != token)
+        if not expansions:
+            expansions = [(term, score * FUZZY_WEIGHT) for term, score in self._fuzzy_terms(token)]
+        return expansions
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """Búsqueda ordenada por BM25 (con prefijo en la última palabra y trigramas)"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores: Dict[int, float] = {}
+            for i, token in enumerate(tokens):
+                for term, weight in self._expand(token, is_last=(i == len(tokens) - 1)):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for fdc_id, tf in postings.items():
+                        length = self._docs[fdc_id].length
+                        norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                        scores[fdc_id] = scores.get(fdc_id, 0.0) + weight * idf * norm
+
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], self._docs[item[0]].length))
+            return [
+                SearchHit(fdc_id, self._docs[fdc_id].prolog_name, self._docs[fdc_id].display_name, score)
+                for fdc_id, score in best
+            ]
+
+    def lookup(self, prolog_name: str) -> Optional[SearchHit]:
+        """Alimento del catálogo con ese átomo de Prolog exacto (sin buscar)"""
+        with self._lock:
+            ids = self._by_prolog_name.get(prolog_name)
+            if not ids:
+                return None
+            doc = self._docs[ids[0]]
+            return SearchHit(doc.fdc_id, doc.prolog_name, doc.display_name, float("inf"))
+
+    def resolve(self, name: str) -> Optional[SearchHit]:
+        """
+        Resuelve un nombre escrito por el usuario a un alimento del catálogo.
+
+        Además del átomo exacto, acepta el mismo nombre sin importar
+        mayúsculas, acentos, orden de las palabras o errores de tipeo, pero
+        no una coincidencia parcial: "pizza" no se resuelve a "dessert
+        pizza" (devuelve None).
+        """
+        hit = self.lookup(name)
+        if hit is not None:
+            return hit
+        tokens = tokenize(name)
+        for hit in self.search(" ".join(tokens), limit=RESOLVE_CANDIDATES):
+            if _same_words(tokens, tokenize(hit.prolog_name)) or _same_words(tokens, tokenize(hit.display_name)):
+                return hit
+        return None
+
+    def get_food(self, fdc_id: int) -> Optional[Dict[str, Any]]:
+        """Entrada del catálogo indexada con ese fdc_id"""
+        doc = self._docs.get(fdc_id)
+        return doc.food if doc else None
+
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[SearchHit]:
+        """
+        Sugerencias para lo que el usuario está escribiendo, una por nombre
+        (el catálogo puede tener varios fdc_id con el mismo nombre).
+        """
+        fetch = limit * 2
+        while True:
+            hits = self.search(prefix, limit=fetch)
+            unique: Dict[str, SearchHit] = {}
+            for hit in hits:
+                unique.setdefault(fold(hit.display_name).strip(), hit)
+                if len(unique) == limit:
+                    return list(unique.values())
+            if len(hits) < fetch:
+                return list(unique.values())
+            fetch *= 2
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._docs),
+            "terms": len(self._postings),
+            "trigrams": len(self._trigram_index),
+        }
+
+
+# ============================================
+# Instancia global sincronizada con el catálogo
+# ============================================
+
+_index = FoodSearchIndex()
+_index_version: Optional[str] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> FoodSearchIndex:
+    """Devuelve el índice global, actualizándolo si el catálogo cambió"""
+    global _index_version
+    version = catalog_version()
+    if version != _index_version:
+        with _index_lock:
+            if version != _index_version:
+                _index.update(load_catalog_foods())
+                _index_version = version
+    return _index
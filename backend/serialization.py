@@ -0,0 +1,88 @@
+"""
+Serialización JSON rápida para las respuestas de la API.
+
+Usa `orjson` (dependencia del proyecto) para todas las respuestas; si no
+está instalado, se usa `json` de la librería estándar en modo compacto.
+
+También permite insertar fragmentos JSON ya serializados (RawJSON) dentro
+de una respuesta, para no volver a serializar registros que no cambian
+(por ejemplo la información nutricional de una comida).
+"""
+
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson  # Si falta: json de la librería estándar
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que no son JSON nativo (modelos Pydantic, etc.)"""
+    return jsonable_encoder(obj)
+
+
+if orjson is not None:
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto en UTF-8"""
+        return orjson.dumps(content, default=_default)
+else:
+    def dumps(content: Any) -> bytes:
+        """Serializa a JSON compacto en UTF-8"""
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=_default,
+        ).encode("utf-8")
+
+
+class RawJSON:
+    """Fragmento JSON ya serializado que se inserta tal cual en la respuesta"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    @classmethod
+    def of(cls, content: Any) -> "RawJSON":
+        """Serializa el contenido una vez y lo guarda como fragmento"""
+        return cls(dumps(content))
+
+
+def dumps_spliced(content: Any) -> bytes:
+    """
+    Serializa un dict/list que puede contener fragmentos RawJSON.
+
+    Solo se recorren en Python los niveles que rodean a los fragmentos;
+    el resto de valores se serializan directamente con `dumps`.
+    """
+    if isinstance(content, RawJSON):
+        return content.data
+    if isinstance(content, dict):
+        return b"{" + b",".join(
+            dumps(str(key)) + b":" + dumps_spliced(value)
+            for key, value in content.items()
+        ) + b"}"
+    if isinstance(content, (list, tuple)):
+        return b"[" + b",".join(dumps_spliced(item) for item in content) + b"]"
+    return dumps(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON que usa orjson si está disponible (clase por defecto de la app)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class SplicedJSONResponse(FastJSONResponse):
+    """Respuesta JSON cuyo contenido puede incluir fragmentos RawJSON"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_spliced(content)
@@ -0,0 +1,136 @@
+"""
+🚀 startup.py
+Arranque del proceso de la API: variables de entorno y calentamiento.
+
+- load_environment(): carga el .env una sola vez por proceso. Se llama
+  antes de importar los módulos que leen su configuración con os.getenv.
+- warm_up(): hace por adelantado lo que antes pagaba la primera petición
+  (crear el motor Prolog y consultar los archivos, cargar el catálogo,
+  precalcular los contextos del recomendador, construir el índice de
+  búsqueda, abrir la base de usuarios y las conexiones a FoodData Central).
+  Cada paso se mide y sus errores no detienen a los siguientes.
+- readiness(): estado para /ready; la API solo se anuncia lista cuando el
+  calentamiento terminó.
+
+Las importaciones pesadas se hacen dentro de cada paso, así importar este
+módulo no cuesta nada. Con STARTUP_WARMUP=0 no se calienta nada (la API
+queda lista de inmediato y todo se inicializa bajo demanda).
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_environment_loaded = False
+
+
+def load_environment():
+    """Carga el archivo .env (solo la primera vez que se llama)"""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    _environment_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def _warm_catalog():
+    from search_index import get_search_index
+
+    get_search_index()
+
+
+def _warm_prolog():
+    from recommender import get_prolog_engine
+
+    get_prolog_engine()
+
+
+def _warm_recommender():
+    from recommender import get_recommender
+
+    get_recommender().warm_up()
+
+
+def _warm_meal_planner():
+    from meal_plan import get_meal_planner
+
+    get_meal_planner()._ensure_fresh()
+
+
+def _warm_users():
+    from history import get_history_log
+    from users import get_user_store
+
+    get_user_store().list_users()
+    get_history_log()
+
+
+def _warm_food_api():
+    from food_api.food_api import prime_connections
+
+    prime_connections()
+
+
+def _warm_dialogflow():
+    from dialogflow_integration import get_dialogflow_client
+
+    get_dialogflow_client()
+
+
+# (nombre, función) en orden: Prolog antes que el recomendador, que lo usa
+WARM_UP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("catalog", _warm_catalog),
+    ("prolog", _warm_prolog),
+    ("recommender", _warm_recommender),
+    ("meal_planner", _warm_meal_planner),
+    ("users", _warm_users),
+    ("food_api", _warm_food_api),
+    ("dialogflow", _warm_dialogflow),
+]
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+_ready = threading.Event()
+_steps: Dict[str, Dict[str, Any]] = {}
+_started_at = time.monotonic()
+_ready_after: float = 0.0
+
+
+def warm_up():
+    """Ejecuta los pasos de calentamiento y marca la API como lista"""
+    global _ready_after
+    if STARTUP_WARMUP:
+        for name, step in WARM_UP_STEPS:
+            start = time.perf_counter()
+            try:
+                step()
+                _steps[name] = {"ok": True}
+            except Exception as e:
+                logger.warning(f"Calentamiento '{name}' falló: {e}")
+                _steps[name] = {"ok": False, "error": str(e)}
+            _steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    _ready_after = time.monotonic() - _started_at
+    _ready.set()
+    logger.info(f"API lista en {_ready_after:.2f}s desde la importación")
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def readiness() -> Dict[str, Any]:
+    """Estado del calentamiento (para /ready)"""
+    return {
+        "ready": _ready.is_set(),
+        "warm_up": STARTUP_WARMUP,
+        "ready_after_s": round(_ready_after, 3) if _ready.is_set() else None,
+        "steps": dict(_steps),
+    }
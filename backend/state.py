@@ -0,0 +1,325 @@
+"""
+🗄️ state.py
+Estado compartido entre workers (lecturas de sensores, ventanas del
+historial, versiones de perfiles) detrás de una interfaz clave-valor.
+
+Backends (STATE_BACKEND):
+- memory (default): diccionario del proceso. Con un solo worker es lo más
+  rápido; con varios, cada worker ve solo su propio estado.
+- sqlite:///ruta/estado.sqlite3: archivo SQLite en modo WAL compartido por
+  todos los workers de la misma máquina.
+- redis://host:puerto/db: cualquier servidor que hable el protocolo de
+  Redis (RESP), para varios nodos. Cliente mínimo sin dependencias; en
+  pruebas lo sustituye el stand-in de benchmarks/stub_servers.py.
+
+Los valores se guardan como JSON, así que deben ser serializables. Cada
+módulo usa su propio espacio de nombres:
+
+    sensors = get_state_backend().namespace("sensors")
+    sensors.set(user_id, lectura)
+    sensors.get(user_id)
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+
+# Cada cuántas escrituras se borran las claves vencidas (SQLite)
+PURGE_EVERY = 1000
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class StateBackend:
+    """Almacén clave-valor por espacio de nombres con caducidad opcional"""
+    name = ""
+    # True si varios procesos ven el mismo estado
+    shared = False
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "shared": self.shared}
+
+    def namespace(self, name: str, ttl: Optional[float] = None) -> "Namespace":
+        return Namespace(self, name, ttl)
+
+
+class Namespace:
+    """Vista de un backend limitada a un espacio de nombres"""
+
+    def __init__(self, backend: StateBackend, name: str, ttl: Optional[float] = None):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.backend.get(self.name, key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.backend.set(self.name, key, value, ttl if ttl is not None else self.ttl)
+
+    def delete(self, key: str):
+        self.backend.delete(self.name, key)
+
+
+# ============================================
+# Memoria del proceso
+# ============================================
+
+class MemoryBackend(StateBackend):
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._data.get((namespace, key))
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            with self._lock:
+                self._data.pop((namespace, key), None)
+            return None
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[(namespace, key)] = (value, expires_at)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "keys": len(self._data)}
+
+
+# ============================================
+# SQLite (WAL) compartido por los workers de una máquina
+# ============================================
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Estado en un archivo SQLite; cada hilo usa su propia conexión y el modo
+    WAL deja leer mientras otro worker escribe.
+    """
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, _dumps(value), expires_at),
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def delete(self, namespace: str, key: str):
+        self._conn().execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def stats(self) -> Dict[str, Any]:
+        keys = self._conn().execute("SELECT COUNT(*) FROM state").fetchone()[0]
+        return {**super().stats(), "path": self.path, "keys": keys}
+
+
+# ============================================
+# Protocolo de Redis (RESP)
+# ============================================
+
+class RedisError(RuntimeError):
+    """Respuesta de error del servidor (-ERR ...)"""
+
+
+class RedisBackend(StateBackend):
+    """
+    Cliente RESP mínimo: GET / SET PX / DEL sobre claves `namespace:key`.
+    Una conexión por hilo; si se cae se reintenta una vez.
+    """
+    name = "redis"
+    shared = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 2.0):
+        self.host, self.port, self.db = host, port, db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+        self.command("PING")
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._roundtrip(("AUTH", self.password))
+        if self.db:
+            self._roundtrip(("SELECT", str(self.db)))
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    @staticmethod
+    def _encode(args: Tuple[Any, ...]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Conexión cerrada por el servidor")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Respuesta RESP inesperada: {line!r}")
+
+    def _roundtrip(self, args: Tuple[Any, ...]) -> Any:
+        self._local.sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def command(self, *args: Any) -> Any:
+        for attempt in (1, 2):
+            if getattr(self._local, "sock", None) is None:
+                self._connect()
+            try:
+                return self._roundtrip(args)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt == 2:
+                    raise
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        data = self.command("GET", f"{namespace}:{key}")
+        return json.loads(data) if data is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        args = ["SET", f"{namespace}:{key}", _dumps(value)]
+        if ttl:
+            args += ["PX", str(int(ttl * 1000))]
+        self.command(*args)
+
+    def delete(self, namespace: str, key: str):
+        self.command("DEL", f"{namespace}:{key}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "address": f"{self.host}:{self.port}/{self.db}"}
+
+
+# ============================================
+# Backend global
+# ============================================
+
+def create_backend(url: str) -> StateBackend:
+    """Crea el backend a partir de STATE_BACKEND (memory, sqlite:///ruta, redis://host:puerto/db)"""
+    if url in ("", "memory"):
+        return MemoryBackend()
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # sqlite:///ruta/relativa.sqlite3 o sqlite:////ruta/absoluta.sqlite3
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            password=parsed.password,
+        )
+    raise ValueError(f"STATE_BACKEND no soportado: {url}")
+
+
+_state_backend: Optional[StateBackend] = None
+_state_lock = threading.Lock()
+
+
+def get_state_backend() -> StateBackend:
+    """Obtiene o crea el backend de estado configurado en STATE_BACKEND"""
+    global _state_backend
+    if _state_backend is None:
+        with _state_lock:
+            if _state_backend is None:
+                _state_backend = create_backend(STATE_BACKEND)
+                logger.info(f"Estado compartido: {_state_backend.name}")
+    return _state_backend
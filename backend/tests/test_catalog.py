@@ -0,0 +1,118 @@
+"""
+Pruebas del escritor del catálogo (hechos índice de comidas_dynamic.pl) y
+de la versión del catálogo por petición.
+"""
+
+import re
+
+import catalog
+from catalog import CatalogWriter, catalog_version, catalog_version_scope
+
+
+def _food(name, climate="cold", state="normal", prep_time="quick", category="breakfast", calories=150, fdc_id=1):
+    return {
+        "prolog_name": name,
+        "display_name": name.replace("_", " ").title(),
+        "climate": climate,
+        "state": state,
+        "prep_time": prep_time,
+        "category": category,
+        "calories": calories,
+        "fdc_id": fdc_id,
+    }
+
+
+def _write(tmp_path, foods):
+    with CatalogWriter(tmp_path / "comidas.pl", tmp_path / "cache.jsonl", tmp_path / "manifest.json") as writer:
+        writer.add_all(foods)
+    return (tmp_path / "comidas.pl").read_text(encoding="utf-8"), writer
+
+
+def _facts(text, functor):
+    return [line for line in text.splitlines() if line.startswith(f"{functor}(")]
+
+
+def test_index_facts_are_unique(tmp_path, monkeypatch):
+    # Tramos de 3 líneas: obliga a mezclar varios archivos ordenados
+    monkeypatch.setattr(catalog, "SORT_CHUNK_LINES", 3)
+    foods = [
+        _food("oatmeal", fdc_id=1),
+        _food("oatmeal", fdc_id=2),
+        _food("oatmeal", climate="warm", fdc_id=3),
+        _food("soup", climate="cold", category="lunch", calories=80, fdc_id=4),
+        _food("soup", climate="cold", category="lunch", calories=80, fdc_id=5),
+        _food("salad", climate="hot", category="lunch", calories=250, fdc_id=6),
+        _food("oatmeal", fdc_id=7),
+    ]
+    text, writer = _write(tmp_path, foods)
+
+    assert len(_facts(text, "comida")) == 7
+    by_ctx = _facts(text, "comida_by_ctx")
+    assert by_ctx == sorted(set(by_ctx))
+    assert by_ctx == [
+        "comida_by_ctx(cold, normal, quick, oatmeal).",
+        "comida_by_ctx(cold, normal, quick, soup).",
+        "comida_by_ctx(hot, normal, quick, salad).",
+        "comida_by_ctx(warm, normal, quick, oatmeal).",
+    ]
+    assert sorted(_facts(text, "comida_by_calories")) == [
+        "comida_by_calories(0, 80, soup).",
+        "comida_by_calories(1, 150, oatmeal).",
+        "comida_by_calories(2, 250, salad).",
+    ]
+    assert "comida_calorie_buckets(0, 2)." in text
+    assert writer.manifest["total_foods"] == 7
+
+
+def test_catalog_version_is_computed_once_per_scope(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog, "_compute_catalog_version", lambda: calls.append(1) or f"v{len(calls)}")
+
+    assert catalog_version() == "v1"
+    assert catalog_version() == "v2"
+    with catalog_version_scope():
+        assert catalog_version() == "v3"
+        assert catalog_version() == "v3"
+        with catalog_version_scope():
+            assert catalog_version() == "v4"
+        assert catalog_version() == "v3"
+    assert len(calls) == 4
+
+
+def test_catalog_version_is_stable():
+    version = catalog._compute_catalog_version()
+    assert re.fullmatch(r"[0-9a-f]{16}", version)
+    assert catalog._compute_catalog_version() == version
+
+
+def test_category_stats_use_one_population(tmp_path):
+    foods = [
+        _food("oatmeal", category="breakfast", calories=100),
+        _food("pancakes", category="breakfast", calories=301.5),
+        _food("mystery", category="breakfast", calories=None),
+        _food("soup", category="lunch", calories=80),
+    ]
+    text, writer = _write(tmp_path, foods)
+
+    # Count incluye todas las comidas; el promedio usa CalorieCount / TotalCalories
+    assert "comida_category_stats(breakfast, 3, 2, 401.5)." in text
+    assert "comida_category_stats(lunch, 1, 1, 80)." in text
+    assert "comida_count(4)." in text
+    assert f"comida_index_version({catalog.PROLOG_INDEX_VERSION})." in text
+
+
+def test_calorie_index_includes_decimal_calories(tmp_path):
+    foods = [
+        _food("carrots", calories=38, fdc_id=1),
+        _food("carrots", climate="hot", calories=38, fdc_id=2),
+        _food("yogurt", calories=99.5, fdc_id=3),
+        _food("mystery", calories=None, fdc_id=4),
+    ]
+    text, _ = _write(tmp_path, foods)
+
+    # Un hecho índice por (Food, Cal); las reglas lo cruzan con comida/7
+    assert sorted(_facts(text, "comida_by_calories")) == [
+        "comida_by_calories(0, 38, carrots).",
+        "comida_by_calories(0, 99.5, yogurt).",
+    ]
+    assert "comida_calorie_buckets(0, 0)." in text
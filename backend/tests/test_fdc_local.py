@@ -0,0 +1,97 @@
+"""
+Pruebas de la base local de FoodData Central con el dataset de ejemplo
+(food_api/fixtures/fdc_sample).
+"""
+
+from pathlib import Path
+
+import pytest
+
+from food_api.fdc_local import LocalFoodData, import_fdc_csv, open_local_db
+
+FIXTURE_DIR = Path(__file__).resolve().parent.parent / "food_api" / "fixtures" / "fdc_sample"
+
+
+@pytest.fixture(scope="module")
+def imported(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("fdc") / "fdc_local.sqlite3"
+    counts = import_fdc_csv(str(FIXTURE_DIR), str(db_path), batch_size=7)
+    return db_path, counts
+
+
+@pytest.fixture(scope="module")
+def db(imported):
+    return LocalFoodData(str(imported[0]))
+
+
+def test_import_counts(imported, db):
+    db_path, counts = imported
+    assert counts == {"nutrient": 10, "food": 13, "branded_food": 1, "food_nutrient": 130}
+    assert not Path(f"{db_path}.tmp").exists()
+
+    stats = db.stats()
+    assert stats["foods"] == 13
+    assert stats["nutrients"] == 10
+    assert "imported_at" in stats
+
+
+def test_import_requires_core_files(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        import_fdc_csv(str(tmp_path), str(tmp_path / "empty.sqlite3"))
+
+
+def test_open_local_db(imported, tmp_path):
+    assert isinstance(open_local_db(str(imported[0])), LocalFoodData)
+    assert open_local_db(str(tmp_path / "missing.sqlite3")) is None
+    assert open_local_db(None) is None
+
+
+def test_search_maps_nutrients(db):
+    results = db.search("egg raw", max_results=5)
+    assert [item["fdcId"] for item in results] == [171287]
+
+    egg = results[0]
+    assert egg["nombre"] == "Egg, whole, raw, fresh"
+    assert len(egg["nutrientes"]) == 10
+    assert egg["nutrientes"]["Energy"] == "143 KCAL"
+    assert egg["nutrientes"]["Protein"] == "12.56 G"
+    assert egg["nutrientes"]["Sodium, Na"] == "142 MG"
+
+
+def test_search_prefers_generic_foods(db):
+    results = db.search("oat", max_results=5)
+    # Foundation antes que SR Legacy, y los productos de marca al final
+    assert [item["fdcId"] for item in results] == [2346396, 173904, 2503998]
+
+
+def test_search_falls_back_to_any_word(db):
+    # Ningún alimento tiene las dos palabras: se acepta cualquiera
+    results = db.search("salmon spinach", max_results=5)
+    assert {item["fdcId"] for item in results} == {175167, 168462}
+
+
+def test_search_without_matches(db):
+    assert db.search("pizza") == []
+    assert db.search("!!!") == []
+
+
+def test_get_raw(db):
+    raw = db.get_raw(2503998)
+    assert raw["description"] == "OATMEAL"
+    assert raw["dataType"] == "branded_food"
+    assert raw["brandOwner"] == "Quaker Oats Company"
+    assert raw["ingredients"] == "WHOLE GRAIN ROLLED OATS."
+
+    nutrients = {n["nutrient"]["name"]: n for n in raw["foodNutrients"]}
+    assert len(nutrients) == 10
+    assert nutrients["Energy"]["amount"] == 378
+    assert nutrients["Energy"]["nutrient"] == {"id": 1008, "name": "Energy", "unitName": "KCAL"}
+
+    assert db.get_raw(999) is None
+
+
+def test_iter_foods(db):
+    foods = list(db.iter_foods())
+    assert len(foods) == 13
+    assert [food["fdcId"] for food in foods] == sorted(food["fdcId"] for food in foods)
+    assert all(len(food["nutrientes"]) == 10 for food in foods)
@@ -0,0 +1,86 @@
+"""
+Pruebas de los límites de FoodData Central alrededor del single-flight,
+con la llamada HTTP reemplazada por una función local.
+"""
+
+import threading
+import time
+
+import pytest
+
+import ratelimit
+from food_api import food_api
+from food_api.singleflight import SingleFlight
+from ratelimit import RateLimited, RateLimiter
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Sin base local, con límites nuevos y un FDC falso que espera a `release`"""
+    monkeypatch.setattr(food_api, "_local_db", None)
+    monkeypatch.setattr(food_api, "FDC_LOCAL_ONLY", False)
+    monkeypatch.setattr(food_api, "_search_flight", SingleFlight("search_food"))
+    monkeypatch.setattr(ratelimit, "_limiters", {
+        "fdc": RateLimiter("fdc", 0, 0),
+        "fdc_user": RateLimiter("fdc_user", 0.001, 1),
+    })
+
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fake_get(endpoint, url, params, timeout):
+        ratelimit.check_upstream("fdc")
+        calls.append(endpoint)
+        started.set()
+        release.wait(5)
+        return _Response({"foods": [{"description": "Oats", "fdcId": 1, "foodNutrients": []}]})
+
+    monkeypatch.setattr(food_api, "_fdc_get", fake_get)
+    return calls, started, release
+
+
+def _search_as(user_id, results, errors):
+    token = ratelimit.current_user.set(user_id)
+    try:
+        results.append(food_api.search_food("oats"))
+    except RateLimited as e:
+        errors.append((user_id, e))
+    finally:
+        ratelimit.current_user.reset(token)
+
+
+def test_user_limit_is_charged_before_joining_the_flight(upstream):
+    calls, started, release = upstream
+    results, errors = [], []
+
+    # "ana" gasta su único token en la llamada en curso
+    leader = threading.Thread(target=_search_as, args=("ana", results, errors))
+    leader.start()
+    assert started.wait(5)
+
+    # Su siguiente búsqueda se rechaza sin afectar a "luis", que se une a la llamada
+    _search_as("ana", results, errors)
+    follower = threading.Thread(target=_search_as, args=("luis", results, errors))
+    follower.start()
+    call = food_api._search_flight._calls[("oats", 2)]
+    deadline = time.monotonic() + 5
+    while call.waiters == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert [user for user, _ in errors] == ["ana"]
+    assert len(results) == 2
+    assert all(result[0]["fdcId"] == 1 for result in results)
+    assert calls == ["search"]
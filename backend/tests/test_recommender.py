@@ -0,0 +1,76 @@
+"""
+Pruebas del recomendador (candidatos precalculados y posiciones de los
+bitsets) con un catálogo y una fuente de candidatos hechos a mano.
+"""
+
+import threading
+
+from recommender import Recommender
+
+
+def _food(prolog_name):
+    return {"prolog_name": prolog_name, "display_name": prolog_name.title(), "nutrients": {}}
+
+
+def test_candidates_from_an_old_catalog_are_not_kept():
+    current = {"version": "v1"}
+
+    def source(weather, state, prep_time):
+        # Otra petición ve un catálogo nuevo mientras se consulta a Prolog
+        if current["version"] == "v1":
+            current["version"] = "v2"
+            recommender.version
+        return ["oatmeal"]
+
+    recommender = Recommender(candidate_source=source, catalog_loader=lambda: [_food("oatmeal")],
+                              version_fn=lambda: current["version"])
+    recommender.candidates_for("cold", "normal", 30)
+    assert recommender._contexts == {}
+
+    recommender.candidates_for("cold", "normal", 30)
+    assert recommender.context_builds == 2
+    assert list(recommender._contexts) == [("cold", "normal", "quick")]
+
+
+def test_context_mask_ignores_candidates_from_an_old_catalog():
+    current = {"version": "v1", "foods": ["oatmeal", "salad"]}
+
+    def source(weather, state, prep_time):
+        # La primera consulta termina después de que cambie el catálogo
+        if current["version"] == "v1":
+            current["version"], current["foods"] = "v2", ["pancakes", "oatmeal", "salad"]
+            recommender.version
+        return ["salad"]
+
+    recommender = Recommender(candidate_source=source,
+                              catalog_loader=lambda: [_food(name) for name in current["foods"]],
+                              version_fn=lambda: current["version"])
+    user = recommender.user_context(excluded=["pancakes"])
+    assert recommender.recommend_for("cold", "normal", 30, user) is not None
+    assert recommender._context_masks == {}
+
+    # Con el catálogo nuevo, "pancakes" ocupa la posición que tenía "salad"
+    user = recommender.user_context(excluded=["pancakes"])
+    result = recommender.recommend_for("cold", "normal", 30, user)
+    assert [c.comida for c in result.recommendations] == ["salad"]
+    assert recommender._context_masks == {("cold", "normal", "quick"): 1 << recommender.food_bit("salad")}
+
+
+def test_food_bit_is_unique_across_threads():
+    recommender = Recommender(candidate_source=lambda *_: [], catalog_loader=lambda: [_food("oatmeal")],
+                              version_fn=lambda: "v1")
+    recommender.version
+    names = [f"extra_{i}" for i in range(200)]
+
+    def assign():
+        for name in names:
+            recommender.food_bit(name)
+
+    threads = [threading.Thread(target=assign) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    bits = [recommender.food_bit(name) for name in ["oatmeal", *names]]
+    assert sorted(bits) == list(range(len(bits)))
@@ -0,0 +1,57 @@
+"""
+Pruebas del índice de búsqueda del catálogo (resolución de nombres y
+autocompletado) con un catálogo pequeño hecho a mano.
+"""
+
+import pytest
+
+from search_index import FoodSearchIndex
+
+
+def _food(fdc_id, prolog_name, display_name):
+    return {"fdc_id": fdc_id, "prolog_name": prolog_name, "display_name": display_name, "nutrients": {}}
+
+
+@pytest.fixture
+def index():
+    index = FoodSearchIndex()
+    index.update([
+        _food(1, "pancakes", "PANCAKES"),
+        _food(2, "pancakes", "PANCAKES"),
+        _food(3, "dessert_pizza", "Dessert pizza"),
+        _food(4, "mexican_pizza", "Mexican pizza"),
+        _food(5, "chicken_chicken_roll_roasted", "Chicken, chicken roll, roasted"),
+        _food(6, "scrambled_eggs", "SCRAMBLED EGGS"),
+        _food(7, "oatmeal", "OATMEAL"),
+        _food(8, "salmon", "Salmón"),
+    ])
+    return index
+
+
+def test_lookup_is_exact(index):
+    assert index.lookup("oatmeal").fdc_id == 7
+    assert index.lookup("pizza") is None
+    assert index.lookup("Oatmeal") is None
+
+
+@pytest.mark.parametrize("name, prolog_name", [
+    ("scrambled_eggs", "scrambled_eggs"),
+    ("Scrambled Eggs", "scrambled_eggs"),
+    ("eggs scrambled", "scrambled_eggs"),
+    ("oatmel", "oatmeal"),
+    ("salmon", "salmon"),
+    ("dessert pizza", "dessert_pizza"),
+])
+def test_resolve_full_names(index, name, prolog_name):
+    assert index.resolve(name).prolog_name == prolog_name
+
+
+@pytest.mark.parametrize("name", ["pizza", "chick", "chicken", "eggs", "chicken soup", ""])
+def test_resolve_rejects_partial_matches(index, name):
+    assert index.resolve(name) is None
+
+
+def test_autocomplete_one_suggestion_per_name(index):
+    assert [hit.prolog_name for hit in index.autocomplete("panc")] == ["pancakes"]
+    assert {hit.prolog_name for hit in index.autocomplete("pizz")} == {"dessert_pizza", "mexican_pizza"}
+    assert len(index.autocomplete("p", limit=2)) == 2
@@ -0,0 +1,73 @@
+"""
+Pruebas de los perfiles de usuario (preferencias y alérgenos) sobre una
+base SQLite temporal y un catálogo pequeño hecho a mano.
+"""
+
+import pytest
+
+from recommender import Recommender
+from users import UserStore, allergy_mask
+
+
+def _food(prolog_name, display_name):
+    return {"prolog_name": prolog_name, "display_name": display_name, "nutrients": {}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = UserStore(db_path=str(tmp_path / "usuarios.sqlite3"))
+    store.create_user("alumno_123", nombre="Ana")
+    return store
+
+
+@pytest.fixture
+def recommender():
+    foods = [
+        _food("scrambled_eggs", "SCRAMBLED EGGS"),
+        _food("eggplant_parmesan", "Eggplant parmesan"),
+        _food("peanut_butter", "Peanut butter"),
+        _food("salad", "Salad"),
+    ]
+    return Recommender(candidate_source=lambda *_: [], catalog_loader=lambda: foods, version_fn=lambda: "v1")
+
+
+def test_update_and_clear_preferences(store):
+    profile = store.update_preferences("alumno_123", clima="cold", estado="low_oxygen",
+                                       alergias=["huevo", "lacteos"], excluidas=["salad"])
+    assert (profile.clima, profile.estado) == ("cold", "low_oxygen")
+    assert profile.allergies == allergy_mask(["huevo", "lacteos"])
+    assert profile.excluded == {"salad"}
+
+    # None = sin cambios
+    assert store.update_preferences("alumno_123").clima == "cold"
+
+    # "" borra clima/estado y [] deja al usuario sin alergias ni exclusiones
+    profile = store.update_preferences("alumno_123", clima="", estado="", alergias=[], excluidas=[])
+    assert (profile.clima, profile.estado) == (None, None)
+    assert profile.allergies == 0
+    assert profile.excluded == set()
+
+
+def test_update_preferences_validation(store):
+    with pytest.raises(ValueError):
+        store.update_preferences("alumno_123", clima="rainy")
+    with pytest.raises(ValueError):
+        store.update_preferences("alumno_123", alergias=["polen"])
+    assert store.update_preferences("nadie", clima="cold") is None
+
+
+def test_allergens_match_whole_words(store, recommender):
+    profile = store.update_preferences("alumno_123", alergias=["huevo"])
+    context = store.user_context(profile, recommender)
+
+    excluded = {name for name in ("scrambled_eggs", "eggplant_parmesan", "peanut_butter", "salad")
+                if context.excluded_mask >> recommender.food_bit(name) & 1}
+    assert excluded == {"scrambled_eggs"}
+
+
+def test_profile_cache_stats(store):
+    store.get_user("alumno_123")
+    store.get_user("alumno_123")
+    stats = store.profile_cache_stats()
+    assert stats["hits"] >= 1
+    assert store.stats()["profile_cache"]["size"] == stats["size"] == 1
@@ -0,0 +1,327 @@
+"""
+🧵 tracing.py
+Trazas por petición (spans) exportadas en formato OpenTelemetry (OTLP/JSON).
+
+- Cada petición HTTP abre un span raíz; las etapas (Dialogflow, consult(),
+  consultas Prolog, llamadas a FoodData Central, enriquecimiento) abren
+  spans hijos con `span("nombre", atributo=valor)`.
+- El span actual vive en un ContextVar, así que se propaga solo por los
+  `await` y por los saltos a hilos de asyncio.to_thread / run_in_threadpool
+  (ambos copian el contexto). Para otros ejecutores usar `wrap(fn)`.
+- El muestreo se decide en la raíz (TRACE_SAMPLE_RATIO) y lo heredan los
+  hijos; si llega un `traceparent` (W3C) se respeta su decisión. Los spans
+  no muestreados no se registran: solo cuestan un ContextVar.set().
+- Los spans terminados se encolan y un hilo en segundo plano los exporta
+  por lotes, a un archivo JSON Lines (una ExportTraceServiceRequest por
+  línea) o por HTTP a un colector OTLP local (/v1/traces).
+
+Configuración:
+    TRACE_SAMPLE_RATIO   Fracción de peticiones que se trazan (0.0 - 1.0, default 0)
+    TRACE_EXPORT_FILE    Archivo JSON Lines donde escribir las trazas
+    TRACE_OTLP_ENDPOINT  URL del colector, ej. http://localhost:4318/v1/traces
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "food-recommendation-api")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0"))
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+
+# Cabeceras de la respuesta con el id de la traza
+TRACE_ID_HEADER = "X-Trace-Id"
+TRACEPARENT_HEADER = "traceparent"
+
+# Exportación por lotes
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 512
+# Spans pendientes como máximo; si se llena se descartan (no se bloquea la petición)
+QUEUE_MAX_SIZE = 10000
+
+# SpanKind y StatusCode de OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    """Una etapa medida dentro de una traza"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = ""
+    sampled: bool = True
+    kind: int = KIND_INTERNAL
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_ns: int = 0
+    end_ns: int = 0
+    error: str = ""
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """Cabecera W3C traceparent para propagar la traza"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _random_id(n_bytes: int) -> str:
+    return f"{random.getrandbits(n_bytes * 8):0{n_bytes * 2}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Span]:
+    """Span remoto a partir de una cabecera traceparent (None si no es válida)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        sampled = bool(int(parts[3][:2], 16) & 1)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return Span(name="remote", trace_id=parts[1], span_id=parts[2], sampled=sampled)
+
+
+# ============================================
+# Exportador
+# ============================================
+
+class SpanExporter:
+    """
+    Exporta spans terminados por lotes desde un hilo en segundo plano.
+
+    Args:
+        path: Archivo JSON Lines de salida (opcional)
+        endpoint: URL OTLP/HTTP del colector (opcional)
+    """
+
+    def __init__(self, path: str = "", endpoint: str = ""):
+        self.path = path
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._writer = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._writer.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            span = self._queue.get()
+            batch = [span]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while span is not None and len(batch) < BATCH_SIZE:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(span)
+
+            spans = [s for s in batch if s is not None]
+            try:
+                if spans:
+                    self._write(spans)
+                    self.exported += len(spans)
+            except Exception as e:
+                self.failed += len(spans)
+                logger.error(f"No se pudieron exportar {len(spans)} spans: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(spans) < len(batch):
+                return
+
+    def _write(self, spans: List[Span]):
+        payload = json.dumps(otlp_request(spans), separators=(",", ":"))
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload + "\n")
+        if self.endpoint:
+            request = urllib.request.Request(
+                self.endpoint,
+                data=payload.encode(),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+
+    def flush(self):
+        """Espera a que todos los spans encolados estén exportados"""
+        self._queue.join()
+
+    def close(self):
+        """Exporta lo pendiente y detiene el hilo"""
+        self._queue.put(None)
+        self._writer.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.path or None,
+            "endpoint": self.endpoint or None,
+            "pending": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    """ExportTraceServiceRequest de OTLP/JSON con los spans dados"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "food_recommendation.tracing"},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+# ============================================
+# API de spans
+# ============================================
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# Configuración activa (se puede cambiar con configure())
+_sample_ratio = TRACE_SAMPLE_RATIO
+_exporter: Optional[SpanExporter] = None
+if TRACE_EXPORT_FILE or TRACE_OTLP_ENDPOINT:
+    _exporter = SpanExporter(TRACE_EXPORT_FILE, TRACE_OTLP_ENDPOINT)
+
+
+def configure(sample_ratio: Optional[float] = None, exporter: Optional[SpanExporter] = None):
+    """Cambia el muestreo y/o el exportador (útil en benchmarks y scripts)"""
+    global _sample_ratio, _exporter
+    if sample_ratio is not None:
+        _sample_ratio = min(1.0, max(0.0, sample_ratio))
+    if exporter is not None:
+        _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+    """
+    Mide un bloque como span hijo del span actual (o como raíz de una traza nueva).
+
+    Args:
+        name: Nombre de la etapa (ej. "prolog.query")
+        kind: SpanKind de OTLP (KIND_SERVER para la raíz HTTP, KIND_CLIENT para llamadas salientes)
+        parent: Span padre explícito (ej. el remoto de un traceparent)
+        **attributes: Atributos del span
+    """
+    parent = parent if parent is not None else _current_span.get()
+    if parent is None:
+        # Raíz: se decide aquí si la traza se muestrea
+        sampled = _exporter is not None and random.random() < _sample_ratio
+        current = Span(name, _random_id(16), _random_id(8), sampled=sampled, kind=kind)
+    else:
+        current = Span(name, parent.trace_id, _random_id(8), parent.span_id,
+                       sampled=parent.sampled and _exporter is not None, kind=kind)
+
+    token = _current_span.set(current)
+    if not current.sampled:
+        try:
+            yield current
+        finally:
+            _current_span.reset(token)
+        return
+
+    current.attributes.update(attributes)
+    current.start_ns = time.time_ns()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if _exporter is not None:
+            _exporter.export(current)
+
+
+def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Función que se ejecuta con el contexto actual (para ejecutores que no lo copian)"""
+    context = copy_context()
+    # Una copia por llamada: un mismo Context no se puede usar en dos hilos a la vez
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def shutdown():
+    """Exporta los spans pendientes (al apagar la API)"""
+    if _exporter is not None:
+        _exporter.close()
+
+
+def stats() -> Dict[str, Any]:
+    """Estado del trazado (para endpoints de administración)"""
+    return {
+        "sample_ratio": _sample_ratio,
+        "exporter": _exporter.stats() if _exporter is not None else None,
+    }
@@ -0,0 +1,367 @@
+"""
+👤 users.py
+Perfiles de usuario persistentes (SQLite) para las recomendaciones personalizadas.
+
+- Cada perfil guarda datos básicos, preferencias de contexto (clima/estado),
+  alergias como bitset sobre ALLERGENS, y las comidas excluidas y favoritas.
+- Los perfiles más usados se mantienen en memoria (LRU); escribir en un
+  perfil lo expulsa del cache para que la siguiente lectura vea la base.
+  Con un STATE_BACKEND compartido (varios workers) cada escritura publica
+  además una versión del perfil, y los demás workers descartan su copia en
+  cuanto la versión no coincide.
+- Para recomendar, el perfil se compila una vez por versión del catálogo a
+  un UserContext (bitsets sobre las posiciones de Recommender), así que el
+  filtrado por usuario es una operación entre enteros y no hechos en Prolog.
+
+La base se configura con USER_DB (por defecto usuarios.sqlite3 junto a este
+archivo) y el tamaño del cache con USER_CACHE_SIZE.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from food_api.cache import TTLCache
+from recommender import Recommender, UserContext
+from search_index import fold
+from state import Namespace, get_state_backend
+
+USER_DB = os.getenv("USER_DB", str(Path(__file__).parent / "usuarios.sqlite3"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Con varios workers sobre la misma base, cuánto puede tardar en verse un cambio
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+CLIMATES = ("cold", "hot", "warm")
+STATES = ("normal", "low_oxygen")
+
+# Alérgenos → palabras clave (en nombres del catálogo, sin acentos).
+# El orden define la posición de cada alérgeno en el bitset guardado: solo
+# se pueden agregar al final.
+ALLERGENS: Dict[str, List[str]] = {
+    "gluten": ["bread", "toast", "pasta", "spaghetti", "wheat", "bagel", "pancake", "waffle",
+               "cracker", "pizza", "tortilla", "burrito", "sandwich", "muffin", "cereal", "pan", "trigo"],
+    "lacteos": ["milk", "cheese", "yogurt", "cream", "butter", "leche", "queso", "yogur", "crema"],
+    "huevo": ["egg", "omelet", "huevo"],
+    "frutos_secos": ["almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "almendra", "nuez"],
+    "cacahuate": ["peanut", "cacahuate", "mani"],
+    "pescado": ["fish", "salmon", "tuna", "cod", "tilapia", "sardine", "pescado", "atun"],
+    "mariscos": ["shrimp", "crab", "lobster", "clam", "oyster", "mussel", "camaron"],
+    "soya": ["soy", "tofu", "edamame", "soya"],
+}
+ALLERGEN_BITS = {name: 1 << i for i, name in enumerate(ALLERGENS)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    nombre TEXT,
+    edad INTEGER,
+    clima TEXT,
+    estado TEXT,
+    allergies INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_foods (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    comida TEXT NOT NULL,
+    PRIMARY KEY (user_id, kind, comida)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_history (
+    user_id TEXT NOT NULL,
+    comida TEXT NOT NULL,
+    eaten_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS user_history_by_user ON user_history (user_id, eaten_at);
+"""
+
+FAVORITE = "favorite"
+EXCLUDED = "excluded"
+
+
+def allergy_mask(names: Iterable[str]) -> int:
+    """Bitset de alérgenos; lanza ValueError con los nombres desconocidos"""
+    unknown = [name for name in names if name not in ALLERGEN_BITS]
+    if unknown:
+        raise ValueError(f"Alérgenos desconocidos: {', '.join(unknown)} (válidos: {', '.join(ALLERGENS)})")
+    mask = 0
+    for name in names:
+        mask |= ALLERGEN_BITS[name]
+    return mask
+
+
+def allergy_names(mask: int) -> List[str]:
+    return [name for name, bit in ALLERGEN_BITS.items() if mask & bit]
+
+
+@dataclass
+class UserProfile:
+    """Perfil de un usuario tal como está en la base"""
+    user_id: str
+    nombre: Optional[str] = None
+    edad: Optional[int] = None
+    clima: Optional[str] = None
+    estado: Optional[str] = None
+    allergies: int = 0
+    excluded: Set[str] = field(default_factory=set)
+    favorites: Set[str] = field(default_factory=set)
+    created_at: str = ""
+    # (versión del catálogo, UserContext compilado para esa versión)
+    _compiled: Optional[Tuple[str, UserContext]] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user_id": self.user_id,
+            "nombre": self.nombre,
+            "edad": self.edad,
+            "preferences": {
+                "clima": self.clima,
+                "estado": self.estado,
+                "alergias": allergy_names(self.allergies),
+                "excluidas": sorted(self.excluded),
+            },
+            "favoritas": sorted(self.favorites),
+            "created_at": self.created_at,
+        }
+
+
+class UserStore:
+    """
+    Perfiles de usuario sobre SQLite con un LRU de perfiles en memoria.
+
+    Cada hilo usa su propia conexión (sqlite3 no comparte conexiones entre
+    hilos); la base usa WAL para que las lecturas no esperen a las escrituras.
+    """
+
+    def __init__(
+        self,
+        db_path: str = USER_DB,
+        cache_size: int = USER_CACHE_SIZE,
+        cache_ttl: float = USER_CACHE_TTL,
+        versions: Optional[Namespace] = None,
+    ):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        # (versión publicada al leer, perfil)
+        self._profiles = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        # Versión de cada perfil compartida entre workers (None con un solo proceso)
+        self._versions = versions
+        # (versión del catálogo, bitset de comidas por alérgeno)
+        self._allergen_masks: Optional[Tuple[str, Dict[str, int]]] = None
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------
+    # Lectura
+    # ------------------------------------------
+
+    def get_user(self, user_id: str) -> Optional[UserProfile]:
+        """Perfil del usuario (desde el cache si está), o None si no existe"""
+        cached = self._profiles.get(user_id)
+        # La versión se lee antes que la base: si cambia en medio, la próxima lectura recarga
+        version = self._versions.get(user_id) if self._versions is not None else None
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT nombre, edad, clima, estado, allergies, created_at FROM users WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        nombre, edad, clima, estado, allergies, created_at = row
+        profile = UserProfile(user_id, nombre, edad, clima, estado, allergies, created_at=created_at)
+        for kind, comida in conn.execute("SELECT kind, comida FROM user_foods WHERE user_id = ?", (user_id,)):
+            (profile.favorites if kind == FAVORITE else profile.excluded).add(comida)
+
+        self._profiles.set(user_id, (version, profile))
+        return profile
+
+    def _invalidate(self, user_id: str):
+        """Expulsa el perfil del cache local y, si hay varios workers, del de los demás"""
+        self._profiles.delete(user_id)
+        if self._versions is not None:
+            self._versions.set(user_id, time.time_ns())
+
+    def list_users(self, offset: int = 0, limit: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """Página de usuarios (datos básicos) y el total"""
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        rows = conn.execute(
+            "SELECT user_id, nombre, edad FROM users ORDER BY user_id LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [{"user_id": u, "nombre": n, "edad": e} for u, n, e in rows], total
+
+    def recent_history(self, user_id: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Últimas comidas registradas por el usuario (más reciente primero)"""
+        rows = self._conn().execute(
+            "SELECT comida, eaten_at FROM user_history WHERE user_id = ? ORDER BY eaten_at DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+        return [{"comida": comida, "fecha": eaten_at} for comida, eaten_at in rows]
+
+    # ------------------------------------------
+    # Escritura (cada escritura expulsa el perfil del cache)
+    # ------------------------------------------
+
+    def create_user(self, user_id: str, nombre: Optional[str] = None, edad: Optional[int] = None) -> Optional[UserProfile]:
+        """Crea el usuario; devuelve None si ya existía"""
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (user_id, nombre, edad, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, nombre, edad, datetime.now().isoformat(timespec="seconds")),
+            )
+        if cursor.rowcount == 0:
+            return None
+        self._invalidate(user_id)
+        return self.get_user(user_id)
+
+    def update_preferences(
+        self,
+        user_id: str,
+        clima: Optional[str] = None,
+        estado: Optional[str] = None,
+        alergias: Optional[List[str]] = None,
+        excluidas: Optional[List[str]] = None,
+    ) -> Optional[UserProfile]:
+        """
+        Actualiza las preferencias indicadas (None = sin cambios, "" = borrar
+        clima/estado). `excluidas` reemplaza la lista completa.
+
+        Raises:
+            ValueError: Si clima, estado o algún alérgeno no son válidos
+        """
+        if clima and clima not in CLIMATES:
+            raise ValueError(f"clima debe ser uno de: {', '.join(CLIMATES)}")
+        if estado and estado not in STATES:
+            raise ValueError(f"estado debe ser uno de: {', '.join(STATES)}")
+        allergies = allergy_mask(alergias) if alergias is not None else None
+
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None:
+                return None
+            for column, value in (("clima", clima), ("estado", estado), ("allergies", allergies)):
+                if value is None:
+                    continue
+                # "" borra clima/estado (NULL); las alergias se guardan tal cual (0 = ninguna)
+                if value == "":
+                    value = None
+                conn.execute(f"UPDATE users SET {column} = ? WHERE user_id = ?", (value, user_id))
+            if excluidas is not None:
+                conn.execute("DELETE FROM user_foods WHERE user_id = ? AND kind = ?", (user_id, EXCLUDED))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO user_foods (user_id, kind, comida) VALUES (?, ?, ?)",
+                    [(user_id, EXCLUDED, comida) for comida in excluidas],
+                )
+        self._invalidate(user_id)
+        return self.get_user(user_id)
+
+    def add_favorite(self, user_id: str, comida: str) -> Optional[UserProfile]:
+        """Agrega una comida (nombre Prolog) a las favoritas del usuario"""
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None:
+                return None
+            conn.execute(
+                "INSERT OR IGNORE INTO user_foods (user_id, kind, comida) VALUES (?, ?, ?)",
+                (user_id, FAVORITE, comida),
+            )
+        self._invalidate(user_id)
+        return self.get_user(user_id)
+
+    def add_history(self, user_id: str, comida: str) -> bool:
+        """Registra que el usuario comió algo; False si el usuario no existe"""
+        with self._conn() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None:
+                return False
+            conn.execute(
+                "INSERT INTO user_history (user_id, comida, eaten_at) VALUES (?, ?, ?)",
+                (user_id, comida, datetime.now().isoformat(timespec="seconds")),
+            )
+        return True
+
+    # ------------------------------------------
+    # Bitsets para el recomendador
+    # ------------------------------------------
+
+    def _allergen_food_masks(self, recommender: Recommender) -> Dict[str, int]:
+        """Bitset de comidas del catálogo que contienen cada alérgeno"""
+        version = recommender.version
+        cached = self._allergen_masks
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        masks = {}
+        for allergen, keywords in ALLERGENS.items():
+            # Palabras completas (con plural): "egg" y "eggs", pero no "eggplant"
+            pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")(?:e?s)?\b")
+            masks[allergen] = recommender.mask_where(
+                lambda food: bool(pattern.search(
+                    fold(f"{food.get('display_name', '')} {food.get('prolog_name', '').replace('_', ' ')}")
+                ))
+            )
+        self._allergen_masks = (version, masks)
+        return masks
+
+    def user_context(self, profile: UserProfile, recommender: Recommender) -> UserContext:
+        """
+        Compila el perfil a bitsets sobre el catálogo actual.
+
+        El resultado se guarda en el perfil y se reutiliza hasta que cambie
+        la versión del catálogo (o el perfil, que al escribirse se recarga).
+        """
+        version = recommender.version
+        compiled = profile._compiled
+        if compiled is not None and compiled[0] == version:
+            return compiled[1]
+
+        excluded_mask = recommender.mask_of(profile.excluded)
+        allergen_masks = self._allergen_food_masks(recommender)
+        for allergen in allergy_names(profile.allergies):
+            excluded_mask |= allergen_masks[allergen]
+
+        context = UserContext(excluded_mask=excluded_mask, favorite_mask=recommender.mask_of(profile.favorites))
+        profile._compiled = (version, context)
+        return context
+
+    def profile_cache_stats(self) -> Dict[str, Any]:
+        """Aciertos y fallos del cache de perfiles (sin tocar la base)"""
+        return self._profiles.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado de la base y del cache de perfiles"""
+        return {
+            "db_path": self.db_path,
+            "users": self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            "profile_cache": self.profile_cache_stats(),
+        }
+
+
+# Instancia global (se crea bajo demanda)
+_user_store: Optional[UserStore] = None
+
+
+def get_user_store() -> UserStore:
+    """Obtiene o crea el almacén de perfiles compartido por los endpoints"""
+    global _user_store
+    if _user_store is None:
+        backend = get_state_backend()
+        _user_store = UserStore(versions=backend.namespace("user_versions") if backend.shared else None)
+    return _user_store
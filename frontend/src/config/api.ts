@@ -11,6 +11,7 @@ export const API_BASE_URL = isDev ? '' : (import.meta.env.VITE_API_URL || '');
 // Endpoints
 export const API_ENDPOINTS = {
   chat: `${API_BASE_URL}/api/chat`,
+  chatStream: `${API_BASE_URL}/api/chat/stream`,
   sensors: `${API_BASE_URL}/sensors`,
   recommendFood: (userId: string) => `${API_BASE_URL}/recommend_food/${userId}`,
   foodDetails: (fdcId: number) => `${API_BASE_URL}/api/food/${fdcId}`,
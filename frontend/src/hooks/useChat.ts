@@ -2,20 +2,113 @@ import { useCallback } from 'react';
 import axios from 'axios';
 import { useStore } from '../store/useStore';
 import { API_ENDPOINTS, API_CONFIG } from '../config/api';
-import type { ChatRequest, ChatResponse, ChatMessage } from '../types';
+import type {
+  ChatRequest,
+  ChatResponse,
+  ChatMessage,
+  ChatStreamRecommendationEvent,
+  ChatStreamUpdateEvent,
+  FoodRecommendation,
+} from '../types';
+
+// Parse a raw SSE block ("event: x\ndata: {...}") into its name and payload
+function parseSseBlock(block: string): { event: string; data: string } | null {
+  let event = 'message';
+  const dataLines: string[] = [];
+  for (const line of block.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trim());
+    }
+  }
+  if (dataLines.length === 0) return null;
+  return { event, data: dataLines.join('\n') };
+}
 
 export function useChat() {
-  const { 
-    userId, 
-    messages, 
-    isLoading, 
+  const {
+    userId,
+    messages,
+    isLoading,
     prepTime,
-    addMessage, 
-    setLoading, 
+    addMessage,
+    updateMessage,
+    setLoading,
     clearMessages,
-    setRecommendations 
+    setRecommendations
   } = useStore();
 
+  // Streaming request: shows the agent text as soon as Prolog answers and
+  // fills in each recommendation's nutrients as they arrive. Returns null
+  // only when nothing was received (the caller may then retry on /api/chat);
+  // once an event arrived, a broken stream keeps what was already shown.
+  const streamMessage = useCallback(async (request: ChatRequest): Promise<ChatResponse | null> => {
+    const response = await fetch(API_ENDPOINTS.chatStream, {
+      method: 'POST',
+      headers: API_CONFIG.headers,
+      body: JSON.stringify(request),
+    });
+    if (!response.ok || !response.body) return null;
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const agentMessageId = `msg_${Date.now()}_agent`;
+    let buffer = '';
+    let result: ChatResponse | null = null;
+    let recommendations: FoodRecommendation[] = [];
+
+    for (;;) {
+      let chunk: ReadableStreamReadResult<Uint8Array>;
+      try {
+        chunk = await reader.read();
+      } catch (error) {
+        if (!result) throw error;
+        console.warn('Chat stream interrupted, keeping partial response:', error);
+        break;
+      }
+      const { done, value } = chunk;
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let separator = buffer.indexOf('\n\n');
+      while (separator !== -1) {
+        const parsed = parseSseBlock(buffer.slice(0, separator));
+        buffer = buffer.slice(separator + 2);
+        separator = buffer.indexOf('\n\n');
+        if (!parsed) continue;
+
+        if (parsed.event === 'message') {
+          result = JSON.parse(parsed.data) as ChatResponse;
+          recommendations = result.recommendations ?? [];
+          addMessage({
+            id: agentMessageId,
+            role: 'agent',
+            content: result.agent_response,
+            timestamp: new Date(),
+            intent: result.intent,
+            recommendations: result.recommendations ?? undefined,
+          });
+          if (recommendations.length > 0) {
+            setRecommendations(recommendations);
+          }
+        } else if (parsed.event === 'recommendation' && result) {
+          const { index, ...recommendation } = JSON.parse(parsed.data) as ChatStreamRecommendationEvent;
+          recommendations = recommendations.map((rec, i) => (i === index ? recommendation : rec));
+          result = { ...result, recommendations };
+          updateMessage(agentMessageId, { recommendations });
+          setRecommendations(recommendations);
+        } else if (parsed.event === 'update' && result) {
+          const { agent_response } = JSON.parse(parsed.data) as ChatStreamUpdateEvent;
+          result = { ...result, agent_response };
+          updateMessage(agentMessageId, { content: agent_response });
+        }
+      }
+    }
+
+    return result;
+  }, [addMessage, updateMessage, setRecommendations]);
+
   const sendMessage = useCallback(async (messageText: string): Promise<ChatResponse | null> => {
     if (!messageText.trim() || isLoading) return null;
 
@@ -30,15 +123,22 @@ export function useChat() {
     };
     addMessage(userMessage);
 
+    const request: ChatRequest = {
+      user_id: userId,
+      message: messageText,
+      prep_time_available: prepTime,
+    };
+
     try {
-      const request: ChatRequest = {
-        user_id: userId,
-        message: messageText,
-        prep_time_available: prepTime,
-      };
+      try {
+        const streamed = await streamMessage(request);
+        if (streamed) return streamed;
+      } catch (error) {
+        console.warn('Streaming chat unavailable, falling back to /api/chat:', error);
+      }
 
       const response = await axios.post<ChatResponse>(
-        API_ENDPOINTS.chat, 
+        API_ENDPOINTS.chat,
         request,
         API_CONFIG
       );
@@ -63,7 +163,7 @@ export function useChat() {
       return data;
     } catch (error) {
       console.error('Error sending message:', error);
-      
+
       // Add error message
       const errorMessage: ChatMessage = {
         id: `msg_${Date.now()}_error`,
@@ -72,12 +172,12 @@ export function useChat() {
         timestamp: new Date(),
       };
       addMessage(errorMessage);
-      
+
       return null;
     } finally {
       setLoading(false);
     }
-  }, [userId, prepTime, isLoading, addMessage, setLoading, setRecommendations]);
+  }, [userId, prepTime, isLoading, addMessage, setLoading, setRecommendations, streamMessage]);
 
   const resetChat = useCallback(() => {
     clearMessages();
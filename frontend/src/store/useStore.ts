@@ -19,6 +19,10 @@ export const useStore = create<AppState>()(
         set((state) => ({ 
           messages: [...state.messages, message] 
         })),
+      updateMessage: (id: string, patch: Partial<ChatMessage>) =>
+        set((state) => ({
+          messages: state.messages.map((m) => (m.id === id ? { ...m, ...patch } : m)),
+        })),
       setLoading: (loading: boolean) => set({ isLoading: loading }),
       clearMessages: () => set({ messages: [] }),
 
@@ -24,6 +24,15 @@ export interface ChatResponse {
   recommendations: FoodRecommendation[] | null;
 }
 
+// Streaming chat events (POST /api/chat/stream)
+export interface ChatStreamRecommendationEvent extends FoodRecommendation {
+  index: number;
+}
+
+export interface ChatStreamUpdateEvent {
+  agent_response: string;
+}
+
 // Food Recommendation Types
 export interface FoodRecommendation {
   comida: string;
@@ -85,6 +94,7 @@ export interface AppState {
   messages: ChatMessage[];
   isLoading: boolean;
   addMessage: (message: ChatMessage) => void;
+  updateMessage: (id: string, patch: Partial<ChatMessage>) => void;
   setLoading: (loading: boolean) => void;
   clearMessages: () => void;
   